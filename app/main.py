@@ -2,15 +2,8 @@
 Streamlit App: Optimize Stocks with GenAI
 Main application file
 """
-# #region agent log
-import json, time; _log_path = r"c:\Users\ohada\OneDrive\Desktop\Gen AI for Stock Analysis (2)\Gen AI for Stock Analysis\.cursor\debug.log"; _log_write = lambda d: open(_log_path, 'a', encoding='utf-8').write(json.dumps(d, ensure_ascii=False) + '\n')
-_log_write({"id": "log_entry_point", "timestamp": int(time.time() * 1000), "location": "app/main.py:7", "message": "Script entry point reached", "data": {"hypothesisId": "A"}, "sessionId": "debug-session", "runId": "run1"})
-# #endregion
 import streamlit as st
 import streamlit.components.v1 as components
-# #region agent log
-_log_write({"id": "log_streamlit_imported", "timestamp": int(time.time() * 1000), "location": "app/main.py:10", "message": "Streamlit imported successfully", "data": {"hypothesisId": "A"}, "sessionId": "debug-session", "runId": "run1"})
-# #endregion
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -18,16 +11,13 @@ import sys
 import os
 from pathlib import Path
 import html
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add parent directory to path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
-# #region agent log
-_log_write({"id": "log_path_modified", "timestamp": int(time.time() * 1000), "location": "app/main.py:24", "message": "Sys path modified", "data": {"parentDir": parent_dir, "hypothesisId": "C"}, "sessionId": "debug-session", "runId": "run1"})
-# #endregion
 
-# #region agent log
+from utils import tracing
+
 try:
     from utils.llm_utils import initialize_llm, get_llm_response
     from utils.date_utils import calculate_date_range
@@ -37,6 +27,9 @@ try:
             optimize_portfolio_mpt,
             optimize_portfolio_black_litterman,
             optimize_portfolio_risk_parity,
+            optimize_portfolio_hrp,
+            compute_efficient_frontier,
+            compute_random_portfolios,
         )
         PORTFOLIO_OPT_AVAILABLE = True
     except ImportError:
@@ -44,36 +37,29 @@ try:
         optimize_portfolio_mpt = None
         optimize_portfolio_black_litterman = None
         optimize_portfolio_risk_parity = None
+        optimize_portfolio_hrp = None
+        compute_efficient_frontier = None
+        compute_random_portfolios = None
     from utils.visualizations import (
         plot_rsi, plot_bollinger_bands, plot_pe_ratios, 
         plot_beta_comparison, plot_macd
     )
+    from utils.indicators import ChartState
     from config.settings import (
         DEFAULT_YEARS, DEFAULT_ASSETS, DEFAULT_RISK_FREE_RATE_MPT, 
         DEFAULT_RISK_FREE_RATE_BL, OPENAI_API_KEY
 )
-    # #region agent log
-    _log_write({"id": "log_utils_imported", "timestamp": int(time.time() * 1000), "location": "app/main.py:43", "message": "All utility modules imported successfully", "data": {"hypothesisId": "A"}, "sessionId": "debug-session", "runId": "run1"})
-    # #endregion
     import yfinance as yf
     import matplotlib.pyplot as plt
     import plotly.graph_objects as go
     import plotly.express as px
     from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout, RequestException
-    from utils.data_cache import get_ticker_history, get_ticker_info as get_ticker_info_cached
-    # #region agent log
-    _log_write({"id": "log_all_imports_done", "timestamp": int(time.time() * 1000), "location": "app/main.py:50", "message": "All imports completed successfully", "data": {"hypothesisId": "A"}, "sessionId": "debug-session", "runId": "run1"})
-    # #endregion
-# #region agent log
+    from utils.data_cache import get_ticker_history, get_ticker_info as get_ticker_info_cached, get_ticker_info_bulk, get_price_panel
 except Exception as e:
-    _log_write({"id": "log_import_error", "timestamp": int(time.time() * 1000), "location": "app/main.py:53", "message": "Import error occurred", "data": {"error": str(e), "errorType": type(e).__name__, "hypothesisId": "A"}, "sessionId": "debug-session", "runId": "run1"})
+    tracing.event('app.import_error', error=f"{type(e).__name__}: {e}")
     raise
-# #endregion
 
 # Page configuration
-# #region agent log
-_log_write({"id": "log_before_page_config", "timestamp": int(time.time() * 1000), "location": "app/main.py:57", "message": "Before Streamlit page config", "data": {"hypothesisId": "D"}, "sessionId": "debug-session", "runId": "run1"})
-# #endregion
 try:
     # Load logo for favicon
     from PIL import Image
@@ -89,13 +75,8 @@ try:
         layout="wide",
         initial_sidebar_state="expanded"
     )
-    # #region agent log
-    _log_write({"id": "log_page_config_success", "timestamp": int(time.time() * 1000), "location": "app/main.py:65", "message": "Streamlit page config successful", "data": {"hypothesisId": "D"}, "sessionId": "debug-session", "runId": "run1"})
-    # #endregion
 except Exception as e:
-    # #region agent log
-    _log_write({"id": "log_page_config_error", "timestamp": int(time.time() * 1000), "location": "app/main.py:67", "message": "Streamlit page config error", "data": {"error": str(e), "errorType": type(e).__name__, "hypothesisId": "D"}, "sessionId": "debug-session", "runId": "run1"})
-    # #endregion
+    tracing.event('app.page_config_error', error=f"{type(e).__name__}: {e}")
     raise
 
 # Custom CSS - Modern Stock Market Design
@@ -1028,6 +1009,7 @@ def download_ticker_data(ticker, start_date, end_date):
         return pd.DataFrame()
 
 
+@tracing.traced('app.preload_ticker_data')
 def _preload_ticker_data(tickers, start_date, end_date):
     """
     Pre-load ticker data in background to populate cache using parallel processing.
@@ -1053,23 +1035,12 @@ def _preload_ticker_data(tickers, start_date, end_date):
     try:
         # Use get_multiple_tickers_history_cached() - it already does parallel downloads!
         # This is MUCH faster than downloading each ticker separately (batch download)
-        from utils.data_cache import get_multiple_tickers_history_cached
+        from utils.data_cache import get_multiple_tickers_history as get_multiple_tickers_history_cached
         get_multiple_tickers_history_cached(tickers, start_date, end_date)
         
-        # Pre-load ticker info in parallel (company names, etc.)
-        # This is separate from history download and can run in parallel
-        max_workers = min(10, len(tickers))  # Increased from 5 to 10 for better performance
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_ticker = {
-                executor.submit(get_ticker_info_cached, ticker, 'longName'): ticker 
-                for ticker in tickers
-            }
-            # Wait for all to complete (we don't need the results, just populate cache)
-            for future in as_completed(future_to_ticker):
-                try:
-                    future.result()  # Just wait for completion to populate cache
-                except Exception:
-                    pass  # Silently continue on errors - individual failures shouldn't block others
+        # Pre-load ticker info (company names, EPS, beta, market cap) in one bulk call
+        # This fetches each ticker's info once and serves every later field lookup
+        get_ticker_info_bulk(tickers)
     except Exception as e:
         # Log error but don't fail completely - some tickers might still work
         print(f"Warning: Error in preload: {str(e)}")
@@ -1078,6 +1049,36 @@ def _preload_ticker_data(tickers, start_date, end_date):
     # This makes preload much faster - we only load the raw data here
     # KPIs calculation is deferred to when the user actually needs them
 
+
+def _get_chart_state(ticker, data):
+    """
+    Indicator state for a ticker's charts, kept in the session across reruns.
+    
+    The state is seeded from the full history once; on later reruns only the
+    bars added since (and a changed latest bar) are applied to it. It is
+    re-seeded when the history no longer extends the stored one (new date
+    range or corrected data).
+    
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    data (DataFrame): Price history with a 'Close' column.
+    
+    Returns:
+    ChartState: Indicator state covering data.
+    """
+    if 'chart_states' not in st.session_state:
+        st.session_state.chart_states = {}
+    chart_states = st.session_state.chart_states
+    close = data['Close']
+    state = chart_states.get(ticker)
+    if state is not None and state.continues(close):
+        tracing.count('app.chart_state.bars_appended', state.extend(close))
+    else:
+        state = ChartState.from_history(close)
+        chart_states[ticker] = state
+        tracing.count('app.chart_state.seeded')
+    return state
+
 # Auto-initialize LLM if API key is available
 # Check Streamlit Secrets first (for Streamlit Cloud), then fallback to config
 _api_key = None
@@ -1100,10 +1101,6 @@ if _api_key and st.session_state.llm is None:
         pass
 
 def main():
-    # #region agent log
-    _log_write({"id": "log_main_entry", "timestamp": int(time.time() * 1000), "location": "app/main.py:694", "message": "Main function entered", "data": {"hypothesisId": "E"}, "sessionId": "debug-session", "runId": "run1"})
-    # #endregion
-    
     # Initialize home page state early
     if 'show_home' not in st.session_state:
         st.session_state.show_home = True
@@ -1117,9 +1114,7 @@ def main():
     # Auto-load API key from config (reads from env, .env, or api_key.txt)
     from config.settings import OPENAI_API_KEY as CONFIG_API_KEY
     api_key = CONFIG_API_KEY if CONFIG_API_KEY else ""
-    # #region agent log
-    _log_write({"id": "log_api_key_loaded", "timestamp": int(time.time() * 1000), "location": "app/main.py:717", "message": "API key loaded from config", "data": {"hasKey": bool(api_key), "keyLength": len(api_key) if api_key else 0, "hypothesisId": "B"}, "sessionId": "debug-session", "runId": "run1"})
-    # #endregion
+    tracing.event('app.api_key_loaded', has_key=bool(api_key))
     
     # Fallback: Try to load directly from api_key.txt if not found in config
     if not api_key:
@@ -1731,21 +1726,12 @@ def main():
         btn_col1, btn_col2, spacer = st.columns([1, 1, 3])
         with btn_col1:
             if st.button("✅ Select All", key="select_all_btn", use_container_width=True):
-                # #region agent log
-                import json as json_debug_sel
-                log_path_sel = r"c:\Users\ohada\OneDrive\Desktop\Gen AI for Stock Analysis (2)\Gen AI for Stock Analysis\.cursor\debug.log"
-                with open(log_path_sel, "a") as f:
-                    f.write(json_debug_sel.dumps({"location": "main.py:SELECT_ALL", "message": "Select All clicked", "data": {"hypothesisId": "F", "before_temp": list(st.session_state.selected_tickers_temp), "available_keys": list(available_tickers.keys())}, "timestamp": __import__('time').time(), "sessionId": "debug-session"}) + "\n")
-                # #endregion
                 st.session_state.selected_tickers_temp = list(available_tickers.keys())
                 # Increment input_version to force text input refresh (FIX for sync issue)
                 if 'input_version' not in st.session_state:
                     st.session_state.input_version = 0
                 st.session_state.input_version += 1
-                # #region agent log
-                with open(log_path_sel, "a") as f:
-                    f.write(json_debug_sel.dumps({"location": "main.py:SELECT_ALL_AFTER", "message": "Select All completed", "data": {"hypothesisId": "F", "after_temp": list(st.session_state.selected_tickers_temp), "input_version": st.session_state.input_version}, "timestamp": __import__('time').time(), "sessionId": "debug-session"}) + "\n")
-                # #endregion
+                tracing.count('app.select_all')
                 st.rerun()
         with btn_col2:
             if st.button("❌ Deselect All", key="deselect_all_btn", use_container_width=True):
@@ -1872,14 +1858,7 @@ def main():
         submitted = st.button("🚀 Extract Tickers with GenAI", type="primary", use_container_width=True)
         
         if submitted:
-            # #region agent log
-            import json as json_debug
-            import time as time_module
-            log_path = r"c:\Users\ohada\OneDrive\Desktop\Gen AI for Stock Analysis (2)\Gen AI for Stock Analysis\.cursor\debug.log"
-            extract_start_time = time_module.time()
-            with open(log_path, "a") as f:
-                f.write(json_debug.dumps({"location": "main.py:EXTRACT_START", "message": "Extract button clicked - starting", "data": {"hypothesisId": "A,B,C,D", "timestamp": extract_start_time, "has_llm": "llm" in st.session_state and st.session_state.llm is not None}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-            # #endregion
+            tracing.event('app.extract_tickers', manual=bool(manual_tickers and manual_tickers.strip()), n_selected=len(selected_tickers) if selected_tickers else 0)
             
             # Show immediate loading indicator
             loading_placeholder = st.empty()
@@ -1891,37 +1870,18 @@ def main():
             years = st.session_state.get('years', DEFAULT_YEARS)
             start_date, end_date = calculate_date_range(years)
             
-            # #region agent log
-            with open(log_path, "a") as f:
-                f.write(json_debug.dumps({"location": "main.py:EXTRACT_DATE_CALCULATED", "message": "Date range calculated", "data": {"hypothesisId": "A", "start_date": str(start_date), "end_date": str(end_date), "elapsed": time_module.time() - extract_start_time}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-            # #endregion
             # Check if manual tickers were entered
             if manual_tickers and manual_tickers.strip():
-                # #region agent log
-                with open(log_path, "a") as f:
-                    f.write(json_debug.dumps({"location": "main.py:MANUAL_BRANCH", "message": "Using manual tickers branch", "data": {"hypothesisId": "H", "manual_tickers": manual_tickers}, "timestamp": __import__('time').time(), "sessionId": "debug-session"}) + "\n")
-                # #endregion
                 manual_tickers_list = [t.strip().upper() for t in manual_tickers.split(",") if t.strip()]
                 if manual_tickers_list:
                     st.session_state.tickers = manual_tickers_list
                     st.session_state.selected_tickers_temp = manual_tickers_list.copy()
                     
-                    # #region agent log
-                    preload_start = time_module.time()
-                    with open(log_path, "a") as f:
-                        f.write(json_debug.dumps({"location": "main.py:PRELOAD_START_MANUAL", "message": "Starting data preload (manual)", "data": {"hypothesisId": "D", "tickers": manual_tickers_list, "num_tickers": len(manual_tickers_list)}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                    # #endregion
-                    
                     # Pre-load data in background for all tickers with loading indicator
                     with loading_placeholder.container():
                         with st.spinner(f"📥 Loading data for {len(manual_tickers_list)} ticker(s)... This may take a moment."):
                             _preload_ticker_data(manual_tickers_list, start_date, end_date)
                     
-                    # #region agent log
-                    with open(log_path, "a") as f:
-                        f.write(json_debug.dumps({"location": "main.py:PRELOAD_SUCCESS_MANUAL", "message": "Data preload completed (manual)", "data": {"hypothesisId": "D", "elapsed": time_module.time() - preload_start, "total_elapsed": time_module.time() - extract_start_time}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                    # #endregion
-                    
                     loading_placeholder.empty()
                     st.success(f"✅ Successfully loaded {len(manual_tickers_list)} ticker(s) from manual input!")
                     st.rerun()
@@ -1959,26 +1919,13 @@ def main():
                 else:
                     # Initialize LLM if needed
                     if not st.session_state.llm:
-                        # #region agent log
-                        llm_init_start = time_module.time()
-                        with open(log_path, "a") as f:
-                            f.write(json_debug.dumps({"location": "main.py:LLM_INIT_START", "message": "Starting LLM initialization", "data": {"hypothesisId": "B", "timestamp": llm_init_start}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                        # #endregion
-                        
                         with loading_placeholder.container():
                             with st.spinner("🤖 Initializing AI model... This may take a moment on first use."):
                                 try:
                                     st.session_state.llm = initialize_llm(api_key)
-                                    # #region agent log
-                                    with open(log_path, "a") as f:
-                                        f.write(json_debug.dumps({"location": "main.py:LLM_INIT_SUCCESS", "message": "LLM initialized successfully", "data": {"hypothesisId": "B", "elapsed": time_module.time() - llm_init_start}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                                    # #endregion
                                 except Exception as e:
                                     loading_placeholder.empty()
-                                    # #region agent log
-                                    with open(log_path, "a") as f:
-                                        f.write(json_debug.dumps({"location": "main.py:LLM_INIT_ERROR", "message": "LLM initialization failed", "data": {"hypothesisId": "B", "error": str(e), "elapsed": time_module.time() - llm_init_start}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                                    # #endregion
+                                    tracing.event('app.llm_init_error', error=str(e))
                                     st.error(f"⚠️ Failed to initialize AI: {str(e)}")
                                     return
                     
@@ -2006,30 +1953,14 @@ def main():
                             skeleton_placeholder.empty()  # Clear skeleton
                             extracted_tickers = selected_tickers
                             
-                            # #region agent log
-                            with open(log_path, "a") as f:
-                                f.write(json_debug.dumps({"location": "main.py:SKIP_LLM_USE_SELECTED", "message": "Using selected tickers directly (skipping LLM call)", "data": {"hypothesisId": "C", "num_tickers": len(extracted_tickers), "tickers": extracted_tickers}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                            # #endregion
-                            
                             if extracted_tickers:
                                 st.session_state.tickers = extracted_tickers
                                 st.session_state.selected_tickers_temp = extracted_tickers.copy()
                                 
-                                # #region agent log
-                                preload_start = time_module.time()
-                                with open(log_path, "a") as f:
-                                    f.write(json_debug.dumps({"location": "main.py:PRELOAD_START", "message": "Starting data preload", "data": {"hypothesisId": "D", "tickers": extracted_tickers, "num_tickers": len(extracted_tickers)}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                                # #endregion
-                                
                                 # Pre-load data in background for all tickers with loading indicator
                                 with st.spinner(f"📥 Loading data for {len(extracted_tickers)} ticker(s)... This may take a moment."):
                                     _preload_ticker_data(extracted_tickers, start_date, end_date)
                                 
-                                # #region agent log
-                                with open(log_path, "a") as f:
-                                    f.write(json_debug.dumps({"location": "main.py:PRELOAD_SUCCESS", "message": "Data preload completed", "data": {"hypothesisId": "D", "elapsed": time_module.time() - preload_start, "total_elapsed": time_module.time() - extract_start_time}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                                # #endregion
-                                
                                 st.success(f"✅ Successfully extracted and loaded {len(extracted_tickers)} ticker(s) with GenAI: {', '.join(extracted_tickers)}")
                                 st.rerun()
                             else:
@@ -2037,30 +1968,15 @@ def main():
                                 st.session_state.tickers = selected_tickers
                                 st.session_state.selected_tickers_temp = selected_tickers.copy()
                                 
-                                # #region agent log
-                                preload_start = time_module.time()
-                                with open(log_path, "a") as f:
-                                    f.write(json_debug.dumps({"location": "main.py:PRELOAD_START_FALLBACK", "message": "Starting data preload (fallback)", "data": {"hypothesisId": "D", "tickers": selected_tickers, "num_tickers": len(selected_tickers)}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                                # #endregion
-                                
                                 # Pre-load data in background for all tickers with loading indicator
                                 with st.spinner(f"📥 Loading data for {len(selected_tickers)} ticker(s)... This may take a moment."):
                                     _preload_ticker_data(selected_tickers, start_date, end_date)
                                 
-                                # #region agent log
-                                with open(log_path, "a") as f:
-                                    f.write(json_debug.dumps({"location": "main.py:PRELOAD_SUCCESS_FALLBACK", "message": "Data preload completed (fallback)", "data": {"hypothesisId": "D", "elapsed": time_module.time() - preload_start, "total_elapsed": time_module.time() - extract_start_time}, "sessionId": "debug-session", "runId": "run1"}) + "\n")
-                                # #endregion
-                                
                                 st.rerun()
                     except Exception as e:
                         skeleton_placeholder.empty()
                         st.error(f"❌ Error extracting tickers: {str(e)}")
             else:
-                # #region agent log
-                with open(log_path, "a") as f:
-                    f.write(json_debug.dumps({"location": "main.py:ELSE_WARNING", "message": "Both manual_tickers and selected_tickers are empty/falsy", "data": {"hypothesisId": "I", "manual_tickers_bool": bool(manual_tickers), "manual_tickers_strip_bool": bool(manual_tickers.strip()) if manual_tickers else False, "selected_tickers_bool": bool(selected_tickers), "selected_tickers_len": len(selected_tickers) if selected_tickers else 0}, "timestamp": __import__('time').time(), "sessionId": "debug-session"}) + "\n")
-                # #endregion
                 st.warning("⚠️ Please select at least one ticker or enter tickers manually.")
     
     with tab1:
@@ -2269,22 +2185,10 @@ def main():
         </div>
         """, unsafe_allow_html=True)
         
-        # #region agent log
-        import json as json_tab2
-        log_path_tab2 = r"c:\Users\ohada\OneDrive\Desktop\Gen AI for Stock Analysis (2)\Gen AI for Stock Analysis\.cursor\debug.log"
-        with open(log_path_tab2, "a") as f:
-            f.write(json_tab2.dumps({"location": "main.py:TAB2_CHECK", "message": "Tab2 ticker check", "data": {"tickers": list(st.session_state.tickers) if st.session_state.tickers else [], "tickers_bool": bool(st.session_state.tickers), "not_tickers": not st.session_state.tickers}, "timestamp": __import__('time').time(), "sessionId": "debug-session"}) + "\n")
-        # #endregion
-        
         # Check if tickers are selected
         if not st.session_state.tickers or len(st.session_state.tickers) == 0:
             st.stop()
         
-        # #region agent log
-        with open(log_path_tab2, "a") as f:
-            f.write(json_tab2.dumps({"location": "main.py:TAB2_CONTINUE", "message": "Tab2 continuing - tickers exist", "data": {"tickers": list(st.session_state.tickers)}, "timestamp": __import__('time').time(), "sessionId": "debug-session"}) + "\n")
-        # #endregion
-        
         # Add expandable explanations
         with st.expander("📚 Learn about Technical Indicators"):
             st.markdown("""
@@ -2350,8 +2254,8 @@ def main():
                     """, unsafe_allow_html=True)
                 
                 try:
-                    # Download data once for all indicators (cached)
-                    data = download_ticker_data(ticker, start_date, end_date)
+                    # Take the ticker's prices from the shared price panel (cached)
+                    data = get_price_panel(st.session_state.tickers, start_date, end_date).close_frame(ticker)
                     skeleton_placeholder.empty()  # Clear skeleton
                     
                     if data.empty:
@@ -2403,6 +2307,9 @@ def main():
                         elif 'Close' not in data.columns:
                             st.error(f"Missing 'Close' column in processed data for {ticker}.")
                         else:
+                            # Indicator traces come from the session's incremental state
+                            chart_state = _get_chart_state(ticker, data)
+                            
                             # Display all indicators in columns
                             col1, col2 = st.columns(2)
                             
@@ -2411,7 +2318,7 @@ def main():
                                 st.subheader("📊 RSI (Relative Strength Index)")
                                 if len(data) >= 14:
                                     try:
-                                        fig = plot_rsi(data, ticker)
+                                        fig = plot_rsi(data, ticker, state=chart_state)
                                         if fig:
                                             st.pyplot(fig)
                                             plt.close(fig)
@@ -2425,7 +2332,7 @@ def main():
                                 st.subheader("📈 Bollinger Bands")
                                 if len(data) >= 20:
                                     try:
-                                        fig = plot_bollinger_bands(data, ticker)
+                                        fig = plot_bollinger_bands(data, ticker, state=chart_state)
                                         if fig:
                                             st.pyplot(fig)
                                             plt.close(fig)
@@ -2454,7 +2361,7 @@ def main():
                                 st.subheader("📉 MACD")
                                 if len(data) >= 26:
                                     try:
-                                        fig = plot_macd(data, ticker)
+                                        fig = plot_macd(data, ticker, state=chart_state)
                                         if fig:
                                             st.pyplot(fig)
                                             plt.close(fig)
@@ -2534,6 +2441,11 @@ def main():
             Focuses on balancing the risk contribution of each asset in the portfolio. Instead of maximizing return, 
             the goal is that each asset contributes an equal share of the overall portfolio risk. This often leads to 
             more diversified and stable portfolios, especially when assets have very different volatilities.
+
+            **Hierarchical Risk Parity:**
+            Groups assets into a tree of clusters by how correlated they are, then splits capital down the tree so 
+            that each cluster gets less weight the riskier it is. It never inverts the covariance matrix, so it stays 
+            stable for large universes and highly correlated assets.
             """)
         
         if not PORTFOLIO_OPT_AVAILABLE:
@@ -2548,7 +2460,7 @@ def main():
         
         optimization_method = st.radio(
             "Select Optimization Method",
-            ["Black-Litterman Model", "Risk Parity"],
+            ["Black-Litterman Model", "Risk Parity", "Hierarchical Risk Parity"],
             horizontal=True,
             disabled=not PORTFOLIO_OPT_AVAILABLE
         )
@@ -2562,6 +2474,8 @@ def main():
         if 'risk_free_rate_rp' not in st.session_state:
             # Use the same default as MPT for reporting Sharpe
             st.session_state.risk_free_rate_rp = DEFAULT_RISK_FREE_RATE_MPT
+        if 'risk_free_rate_hrp' not in st.session_state:
+            st.session_state.risk_free_rate_hrp = DEFAULT_RISK_FREE_RATE_MPT
         
         # Use form to prevent automatic reruns on input changes
         with st.form("portfolio_optimization_form", clear_on_submit=False):
@@ -2588,6 +2502,17 @@ def main():
                     format="%.3f",
                     key="rp_risk_free_rate_input"
                 )
+            elif optimization_method == "Hierarchical Risk Parity":
+                st.subheader("HRP Risk-Free Rate (for Sharpe calculation only)")
+                temp_risk_free_rate_hrp = st.number_input(
+                    "HRP Risk-Free Rate",
+                    min_value=0.0,
+                    max_value=0.2,
+                    value=st.session_state.risk_free_rate_hrp,
+                    step=0.001,
+                    format="%.3f",
+                    key="hrp_risk_free_rate_input"
+                )
             
             # Optimize only when user clicks the submit button
             submitted = st.form_submit_button("Optimize Portfolio", type="primary", disabled=not PORTFOLIO_OPT_AVAILABLE)
@@ -2605,29 +2530,12 @@ def main():
             elif optimization_method == "Risk Parity":
                 st.session_state.risk_free_rate_rp = temp_risk_free_rate_rp
                 risk_free_rate_rp = st.session_state.risk_free_rate_rp
+            elif optimization_method == "Hierarchical Risk Parity":
+                st.session_state.risk_free_rate_hrp = temp_risk_free_rate_hrp
+                risk_free_rate_hrp = st.session_state.risk_free_rate_hrp
             
             try:
                 if optimization_method == "Black-Litterman Model":
-                    # #region agent log
-                    try:
-                        log_entry = {
-                            'sessionId': 'debug-session',
-                            'runId': 'run1',
-                            'hypothesisId': 'E',
-                            'location': 'main.py:1516',
-                            'message': 'About to call optimize_portfolio_black_litterman',
-                            'data': {
-                                'tickers': st.session_state.tickers,
-                                'start_date': str(start_date),
-                                'end_date': str(end_date),
-                                'risk_free_rate': float(risk_free_rate_bl)
-                            },
-                            'timestamp': int(time.time() * 1000)
-                        }
-                        _log_write(log_entry)
-                    except Exception:
-                        pass
-                    # #endregion
                     try:
                         with st.spinner("Optimizing portfolio with Black-Litterman model..."):
                             result = optimize_portfolio_black_litterman(
@@ -2637,23 +2545,7 @@ def main():
                                 risk_free_rate_bl
                             )
                     except Exception as bl_err:
-                        # #region agent log
-                        try:
-                            _log_write({
-                                'sessionId': 'debug-session',
-                                'runId': 'run1',
-                                'hypothesisId': 'E',
-                                'location': 'main.py:BL_EXCEPTION',
-                                'message': 'optimize_portfolio_black_litterman exception caught',
-                                'data': {
-                                    'error_type': type(bl_err).__name__,
-                                    'error_message': str(bl_err)
-                                },
-                                'timestamp': int(time.time() * 1000)
-                            })
-                        except Exception:
-                            pass
-                        # #endregion
+                        tracing.event('app.black_litterman_error', error_type=type(bl_err).__name__, error=str(bl_err))
                         st.error(f"❌ Black-Litterman optimization failed: {bl_err}")
                         return
                 elif optimization_method == "Risk Parity":
@@ -2663,6 +2555,13 @@ def main():
                         end_date,
                         risk_free_rate_rp
                     )
+                elif optimization_method == "Hierarchical Risk Parity":
+                    result = optimize_portfolio_hrp(
+                        st.session_state.tickers,
+                        start_date,
+                        end_date,
+                        risk_free_rate_hrp
+                    )
                 
                 st.success("✅ Portfolio optimized successfully!")
                 
@@ -2758,6 +2657,85 @@ def main():
                     # Display the chart
                     st.plotly_chart(fig, use_container_width=True)
                 
+                # Efficient frontier (historical estimates) with the optimized portfolio marked
+                try:
+                    frontier_rf = {
+                        "Black-Litterman Model": st.session_state.risk_free_rate_bl,
+                        "Risk Parity": st.session_state.risk_free_rate_rp,
+                        "Hierarchical Risk Parity": st.session_state.risk_free_rate_hrp
+                    }[optimization_method]
+                    frontier = compute_efficient_frontier(
+                        st.session_state.tickers,
+                        start_date,
+                        end_date,
+                        100,
+                        frontier_rf
+                    )
+                    best = frontier.max_sharpe_index()
+                    frontier_fig = go.Figure()
+                    # Random long-only portfolios behind the frontier, colored by Sharpe ratio
+                    cloud = compute_random_portfolios(
+                        st.session_state.tickers,
+                        start_date,
+                        end_date,
+                        5000,
+                        frontier_rf
+                    )
+                    frontier_fig.add_trace(go.Scattergl(
+                        x=cloud['Volatility'] * 100,
+                        y=cloud['Return'] * 100,
+                        mode='markers',
+                        name='Random portfolios',
+                        marker=dict(
+                            size=4,
+                            opacity=0.5,
+                            color=cloud['Sharpe Ratio'],
+                            colorscale='Viridis',
+                            colorbar=dict(title='Sharpe')
+                        ),
+                        hoverinfo='skip'
+                    ))
+                    frontier_fig.add_trace(go.Scatter(
+                        x=frontier.volatilities * 100,
+                        y=frontier.returns * 100,
+                        mode='lines',
+                        name='Efficient Frontier',
+                        line=dict(color='#667eea', width=3),
+                        customdata=frontier.sharpe_ratios,
+                        hovertemplate='Volatility: %{x:.2f}%<br>Return: %{y:.2f}%<br>Sharpe: %{customdata:.2f}<extra></extra>'
+                    ))
+                    frontier_fig.add_trace(go.Scatter(
+                        x=[frontier.volatilities[best] * 100],
+                        y=[frontier.returns[best] * 100],
+                        mode='markers',
+                        name='Max Sharpe (historical)',
+                        marker=dict(color='#f5576c', size=12, symbol='star')
+                    ))
+                    frontier_fig.add_trace(go.Scatter(
+                        x=[result['volatility'] * 100],
+                        y=[result['expected_return'] * 100],
+                        mode='markers',
+                        name=f'{optimization_method} portfolio',
+                        marker=dict(color='#1a1a2e', size=11, symbol='diamond')
+                    ))
+                    frontier_fig.update_layout(
+                        title={
+                            'text': 'Efficient Frontier',
+                            'x': 0.5,
+                            'xanchor': 'center',
+                            'font': {'size': 18, 'family': 'Inter', 'color': '#667eea'}
+                        },
+                        xaxis_title='Annual Volatility (%)',
+                        yaxis_title='Expected Annual Return (%)',
+                        height=450,
+                        margin=dict(l=20, r=20, t=60, b=20),
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)'
+                    )
+                    st.plotly_chart(frontier_fig, use_container_width=True)
+                except Exception as frontier_err:
+                    st.info(f"Efficient frontier unavailable: {frontier_err}")
+                
             except (RequestsConnectionError, Timeout, RequestException) as e:
                 st.error(
                     f"🔌 Connection Error: {str(e)}\n\n"
@@ -3605,10 +3583,6 @@ def main():
                     
                     return ", ".join(ticker_html)
                 
-                # #region agent log
-                _log_write({"id": "log_risk_assessment_rendering_start", "timestamp": int(time.time() * 1000), "location": "app/main.py:2475", "message": "Starting risk assessment rendering", "data": {"lowRiskCount": len(low_risk_tickers), "moderateRiskCount": len(moderate_risk_tickers), "highRiskCount": len(high_risk_tickers), "hypothesisId": "A"}, "sessionId": "debug-session", "runId": "run1"})
-                # #endregion
-                
                 # Add CSS for styling risk ticker buttons
                 st.markdown("""
                 <style>
@@ -4657,18 +4631,5 @@ def main():
                     st.rerun()
 
 if __name__ == "__main__":
-    # #region agent log
-    try:
-        _log_write({"id": "log_main_call_start", "timestamp": int(time.time() * 1000), "location": "app/main.py:2414", "message": "About to call main()", "data": {"hypothesisId": "E"}, "sessionId": "debug-session", "runId": "run1"})
-        # #endregion
+    with tracing.span('app.run'):
         main()
-        # #region agent log
-        _log_write({"id": "log_main_call_success", "timestamp": int(time.time() * 1000), "location": "app/main.py:2418", "message": "Main function completed successfully", "data": {"hypothesisId": "E"}, "sessionId": "debug-session", "runId": "run1"})
-        # #endregion
-    except Exception as e:
-        # #region agent log
-        _log_write({"id": "log_main_call_error", "timestamp": int(time.time() * 1000), "location": "app/main.py:2422", "message": "Error in main() execution", "data": {"error": str(e), "errorType": type(e).__name__, "hypothesisId": "E"}, "sessionId": "debug-session", "runId": "run1"})
-        # #endregion
-        raise
-    # #endregion
-
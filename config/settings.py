@@ -51,3 +51,82 @@ if not OPENAI_API_KEY:
         except Exception:
             pass
 
+
+# Persistent on-disk price store (shared by all processes on the host).
+# Histories downloaded from the market data source are kept here so restarts,
+# redeploys and cache TTL expiries do not re-download multi-year histories.
+PRICE_STORE_ENABLED = os.getenv("PRICE_STORE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+PRICE_STORE_DIR = os.getenv(
+    "PRICE_STORE_DIR",
+    str(Path(__file__).parent.parent / ".cache" / "prices")
+)
+
+# How stale stored histories are refreshed:
+# "incremental" downloads only the bars missing before/after the stored range,
+# "full" re-downloads the whole requested range.
+PRICE_REFRESH_MODE = os.getenv("PRICE_REFRESH_MODE", "incremental").strip().lower()
+
+# Multi-ticker downloads: tickers without a stored history are requested in
+# chunks of this many symbols per yfinance call; symbols missing from a chunk
+# fall back to per-ticker downloads with retries.
+BATCH_DOWNLOAD_ENABLED = os.getenv("BATCH_DOWNLOAD_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+BATCH_DOWNLOAD_CHUNK_SIZE = int(os.getenv("BATCH_DOWNLOAD_CHUNK_SIZE", "100"))
+
+# Market data source: "yfinance" (live), "local" (recorded histories in
+# MARKET_DATA_DIR, one <TICKER>.csv per ticker) or "synthetic" (deterministic
+# generated prices for benchmarks and air-gapped runs).
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance").strip().lower()
+MARKET_DATA_DIR = os.getenv(
+    "MARKET_DATA_DIR",
+    str(Path(__file__).parent.parent / "data" / "fixtures")
+)
+
+# Ticker info (company name, EPS, beta, market cap) changes slowly, so the
+# projected fields below are cached far longer than price histories.
+INFO_FIELDS = ('longName', 'shortName', 'trailingEps', 'beta', 'marketCap')
+INFO_CACHE_TTL = int(os.getenv("INFO_CACHE_TTL", str(24 * 3600)))
+
+# Number of (price panel, estimator settings) return/covariance estimates kept
+# in memory and shared by all optimizers and risk-free rates.
+ESTIMATE_CACHE_SIZE = int(os.getenv("ESTIMATE_CACHE_SIZE", "32"))
+
+# Covariance estimator used by the optimizers: "sample", "ledoit_wolf", "oas",
+# "ewma" (exponentially weighted) or "pca" (statistical factor model).
+# Shrinkage or factor estimators keep large universes well conditioned.
+COVARIANCE_METHOD = os.getenv("COVARIANCE_METHOD", "sample").strip().lower()
+COVARIANCE_EWMA_HALFLIFE = float(os.getenv("COVARIANCE_EWMA_HALFLIFE", "63"))
+COVARIANCE_PCA_FACTORS = int(os.getenv("COVARIANCE_PCA_FACTORS", "5"))
+
+# Number of Black-Litterman posteriors (prior, covariance, views) kept in
+# memory; changing only the risk-free rate reuses a cached posterior.
+BL_POSTERIOR_CACHE_SIZE = int(os.getenv("BL_POSTERIOR_CACHE_SIZE", "32"))
+
+# Walk-forward backtests (utils/backtest.py): estimation window in trading days,
+# rebalance frequency ("W", "M", "Q", "A" or a number of trading days) and the
+# number of worker processes used across windows (0 or 1 = run in-process).
+BACKTEST_LOOKBACK_DAYS = int(os.getenv("BACKTEST_LOOKBACK_DAYS", "252"))
+BACKTEST_REBALANCE = os.getenv("BACKTEST_REBALANCE", "M").strip().upper()
+BACKTEST_MAX_WORKERS = int(os.getenv("BACKTEST_MAX_WORKERS", "0"))
+
+# Resampled (bootstrap) max-Sharpe optimizer (utils/resampling.py): number of
+# resamples and worker processes (0 or 1 = solve in-process).
+RESAMPLE_COUNT = int(os.getenv("RESAMPLE_COUNT", "500"))
+RESAMPLE_MAX_WORKERS = int(os.getenv("RESAMPLE_MAX_WORKERS", "0"))
+
+# CVaR (expected shortfall) optimizer: confidence level of the historical CVaR
+# computed on daily return scenarios (0.95 = mean loss of the worst 5% of days).
+CVAR_CONFIDENCE = float(os.getenv("CVAR_CONFIDENCE", "0.95"))
+
+# Tracing (utils/tracing.py): spans, events and counters from the optimizers
+# and the app. Disabled by default; when enabled, records are buffered in
+# memory and appended as JSON lines to TRACE_PATH by a background thread.
+# TRACE_SAMPLE_RATE is the fraction of top-level spans (with their children)
+# that are recorded; counters are always exact.
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+TRACE_PATH = os.getenv(
+    "TRACE_PATH",
+    str(Path(__file__).parent.parent / ".cache" / "trace.jsonl")
+)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "2.0"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "10000"))
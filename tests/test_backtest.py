@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from utils.backtest import backtest_panel
+from utils.black_litterman import BlackLittermanViews
+from utils.price_panel import PricePanel
+
+TICKERS = ['AAA', 'BBB', 'CCC', 'LATE']
+LISTING_ROW = 400
+LOOKBACK = 126
+
+
+def _prices(seed=3, n_rows=900):
+    rng = np.random.default_rng(seed)
+    prices = 50.0 * np.exp(np.cumsum(rng.normal(0.0004, 0.015, size=(n_rows, len(TICKERS))), axis=0))
+    prices[:LISTING_ROW, 3] = np.nan
+    return prices
+
+
+def _dates(n_rows):
+    return pd.bdate_range('2019-01-01', periods=n_rows)
+
+
+def _run(prices):
+    panel = PricePanel(prices, _dates(len(prices)), TICKERS)
+    views = BlackLittermanViews().relative('LATE', 'AAA', 0.05)
+    return backtest_panel(panel, TICKERS, lookback=LOOKBACK, rebalance='M', views=views, max_workers=1)
+
+
+def test_late_listing_has_no_look_ahead():
+    prices = _prices()
+    results = _run(prices)
+
+    # Rewrite the late ticker's history after a cut-off; nothing chosen before it may change
+    cut = 700
+    altered = prices.copy()
+    altered[cut:, 3] *= np.exp(np.linspace(0.0, 1.0, len(prices) - cut))
+    altered_results = _run(altered)
+
+    dates = _dates(len(prices))
+    for method, result in results.items():
+        # Return row r is the move into price row r + 1
+        rows = np.searchsorted(dates[1:], result.rebalance_dates)
+        late = result.weights[:, 3]
+        assert np.all(late[rows < LISTING_ROW + LOOKBACK] == 0.0), method
+        assert np.any(late > 0.0), method
+        before = rows < cut - 1
+        np.testing.assert_allclose(altered_results[method].weights[before], result.weights[before], err_msg=method)
+        unchanged = result.dates < dates[cut]
+        np.testing.assert_allclose(altered_results[method].returns[unchanged], result.returns[unchanged], err_msg=method)
+        assert np.all(np.isfinite(result.returns)), method
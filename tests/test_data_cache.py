@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from utils import data_cache, market_data, price_store
+
+
+@pytest.fixture
+def synthetic_store(tmp_path, monkeypatch):
+    """An enabled, empty price store in tmp_path with the synthetic provider active."""
+    store_dir = tmp_path / 'price_store'
+    monkeypatch.setattr(price_store, 'PRICE_STORE_DIR', str(store_dir))
+    monkeypatch.setattr(price_store, 'PRICE_STORE_ENABLED', True)
+    monkeypatch.setattr(data_cache, 'BATCH_DOWNLOAD_ENABLED', True)
+    previous = market_data._provider
+    market_data.set_provider('synthetic')
+    yield store_dir
+    market_data._provider = previous
+
+
+def test_offline_provider_is_not_persisted(synthetic_store):
+    tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN']
+    data = data_cache.get_multiple_tickers_history(tickers, '2022-01-03', '2023-01-03')
+
+    assert set(data.columns) == set(tickers)
+    assert not synthetic_store.exists() or not os.listdir(synthetic_store)
+
+
+def test_needs_full_download_reads_meta_only(synthetic_store, monkeypatch):
+    monkeypatch.setattr(market_data, '_provider', type('Stored', (market_data.SyntheticProvider,), {'use_price_store': True})())
+    hist = market_data.get_provider().history('AAPL', '2022-01-03', '2023-01-03')
+    price_store.save('AAPL', hist, '2022-01-03', '2023-01-03')
+
+    def fail_load(ticker):
+        raise AssertionError("full history loaded")
+
+    monkeypatch.setattr(price_store, 'load', fail_load)
+    assert not data_cache._needs_full_download('AAPL', '2022-01-03', '2023-01-03')
+    assert data_cache._needs_full_download('MSFT', '2022-01-03', '2023-01-03')
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.indicators import ChartState, bollinger_series, macd_series, rsi_series
+
+
+def _close(n_rows=300, seed=5):
+    rng = np.random.default_rng(seed)
+    prices = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.015, n_rows)))
+    return pd.Series(prices, index=pd.bdate_range('2022-01-03', periods=n_rows), name='Close')
+
+
+def _assert_matches_series(frame, close):
+    middle, upper, lower = bollinger_series(close)
+    macd, signal = macd_series(close)
+    expected = {'RSI': rsi_series(close), 'Middle Band': middle, 'Upper Band': upper, 'Lower Band': lower,
+                'MACD': macd, 'Signal Line': signal}
+    for name, series in expected.items():
+        np.testing.assert_allclose(frame[name].to_numpy(), series.to_numpy(), rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def test_chart_state_extends_to_full_series():
+    close = _close()
+    state = ChartState.from_history(close.iloc[:250])
+
+    # An intraday revision of the latest bar, then the final close and new bars
+    partial = close.iloc[:250].copy()
+    partial.iloc[-1] *= 1.01
+    assert state.continues(partial)
+    assert state.extend(partial) == 0
+    assert state.continues(close)
+    assert state.extend(close) == 50
+
+    _assert_matches_series(state.frame(), close)
+    assert not state.continues(close.iloc[5:])
+
+
+def test_plots_accept_chart_state():
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    from utils.visualizations import plot_bollinger_bands, plot_macd, plot_rsi
+
+    close = _close()
+    state = ChartState.from_history(close)
+    data = close.to_frame()
+    for plot in (plot_rsi, plot_bollinger_bands, plot_macd):
+        fig = plot(data, 'TEST', state=state)
+        assert fig.axes and fig.axes[0].lines
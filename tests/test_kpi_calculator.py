@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from utils.kpi_calculator import KPI_TABLE_COLUMNS, compute_kpi_table
+from utils.price_panel import PricePanel
+
+
+def _panel():
+    rng = np.random.default_rng(7)
+    n_rows = 1500
+    prices = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, size=(n_rows, 3)), axis=0))
+    prices[-200:, 1] = np.nan                      # stale ticker
+    prices[rng.choice(np.arange(n_rows - 400, n_rows), 150, replace=False), 2] = np.nan  # gappy tail
+    dates = pd.bdate_range('2018-01-01', periods=n_rows)
+    return PricePanel(prices, dates, ['FRESH', 'STALE', 'GAPPY'])
+
+
+def test_latest_only_matches_full_path_for_stale_tickers():
+    panel = _panel()
+    full = compute_kpi_table(panel)
+    fast = compute_kpi_table(panel, latest_only=True)
+
+    for name in KPI_TABLE_COLUMNS:
+        np.testing.assert_allclose(fast[name].to_numpy(), full[name].to_numpy(), rtol=1e-7, atol=1e-9, err_msg=name)
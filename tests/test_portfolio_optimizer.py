@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from utils import market_data
+from utils.constraints import PortfolioConstraints
+from utils.portfolio_optimizer import optimize_portfolio_risk_parity
+
+TICKERS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'JPM', 'XOM', 'JNJ']
+
+
+@pytest.fixture(autouse=True)
+def synthetic_provider():
+    previous = market_data._provider
+    market_data.set_provider('synthetic')
+    yield
+    market_data._provider = previous
+
+
+@pytest.mark.parametrize('min_position, max_positions', [(0.1, None), (None, 3), (0.12, 5)])
+def test_risk_parity_position_limits(min_position, max_positions):
+    constraints = PortfolioConstraints(min_position=min_position, max_positions=max_positions)
+    result = optimize_portfolio_risk_parity(TICKERS, '2021-01-01', '2024-01-01', constraints=constraints)
+
+    weights = np.array(list(result['weights'].values()))
+    held = weights[weights > 1e-6]
+    assert abs(weights.sum() - 1.0) < 1e-6
+    assert len(held) > 1
+    if max_positions is not None:
+        assert len(held) <= max_positions
+    if min_position is not None:
+        assert np.all(held >= min_position - 1e-6)
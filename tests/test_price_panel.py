@@ -0,0 +1,32 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.price_panel import SELECT_CACHE_SIZE, PricePanel
+
+
+def _panel(n_tickers=40):
+    rng = np.random.default_rng(1)
+    prices = 10.0 + rng.random((50, n_tickers))
+    return PricePanel(prices, pd.bdate_range('2020-01-01', periods=50), [f'T{i}' for i in range(n_tickers)])
+
+
+def test_select_cache_is_bounded():
+    panel = _panel()
+    first = panel.select(['T0', 'T1'])
+    assert panel.select(['T0', 'T1']) is first
+    for i in range(2, 2 + 3 * SELECT_CACHE_SIZE):
+        panel.select(['T0', f'T{i}'])
+    assert len(panel._selections) == SELECT_CACHE_SIZE
+    assert panel.select(['T0', 'T1']) is not first
+
+
+def test_memo_is_shared_across_threads():
+    panel = _panel()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: panel.clean_returns(), range(32)))
+    assert all(r is results[0] for r in results)
+    restored = pickle.loads(pickle.dumps(panel))
+    np.testing.assert_array_equal(restored.clean_returns(), results[0])
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from utils.constraints import PortfolioConstraints
+from utils.solvers import solve_constrained
+
+
+def _quadratic(weights, target):
+    return float(np.sum((weights - target) ** 2))
+
+
+def _quadratic_grad(weights, target):
+    return 2.0 * (weights - target)
+
+
+def test_solve_constrained_rejects_iteration_limit():
+    tickers = ['A', 'B', 'C', 'D']
+    compiled = PortfolioConstraints(max_weight=0.4).compile(tickers)
+    target = np.array([0.7, 0.2, 0.05, 0.05])
+
+    weights = solve_constrained(_quadratic, _quadratic_grad, compiled, args=(target,))
+    assert abs(weights.sum() - 1.0) < 1e-9 and weights.max() <= 0.4 + 1e-9
+
+    with pytest.raises(ValueError, match="Iteration limit"):
+        solve_constrained(_quadratic, _quadratic_grad, compiled, args=(target,), max_iter=1)
@@ -0,0 +1,354 @@
+"""
+Walk-forward backtests of the portfolio optimization methods.
+
+The price panel is loaded and cleaned once (the same PricePanel returns the
+optimizers use). An estimation window of `lookback` return rows is rolled
+across it and the weights are re-solved on every rebalance date with the
+estimators in utils/covariance.py and the solvers in utils/solvers.py.
+Between rebalances the portfolio is held and its weights drift with prices,
+so the equity curve, turnover and realized risk are out of sample: weights
+chosen on row t only use returns before row t. Returns are never back-filled:
+a ticker enters the estimation (and can be bought) once its whole window has
+returns, and a missing bar earns 0 until trading resumes.
+
+Each window is estimated once and shared by all requested methods, and every
+solve is warm-started from the method's previous weights. With
+max_workers > 1 the rebalance dates are split into contiguous blocks that are
+solved in a process pool; the warm start then restarts at each block boundary.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config.settings import (
+    BACKTEST_LOOKBACK_DAYS, BACKTEST_REBALANCE, BACKTEST_MAX_WORKERS,
+    COVARIANCE_METHOD, COVARIANCE_EWMA_HALFLIFE, COVARIANCE_PCA_FACTORS
+)
+from utils.black_litterman import default_views, posterior_moments
+from utils.covariance import condition_covariance, estimate_covariance
+from utils.data_cache import get_price_panel
+from utils.estimation import MIN_RETURN_OBSERVATIONS, validate_panel
+from utils.portfolio_optimizer import TRADING_DAYS_PER_YEAR
+from utils.solvers import max_sharpe_long_only, min_variance_qp, risk_parity_weights
+
+BACKTEST_METHODS = ('mpt', 'risk_parity', 'black_litterman')
+
+# Calendar rebalance frequencies and their pandas period aliases
+_REBALANCE_PERIODS = {'W': 'W', 'M': 'M', 'Q': 'Q', 'A': 'Y', 'Y': 'Y'}
+
+
+class BacktestResult:
+    """
+    Out-of-sample performance of one method.
+
+    Attributes:
+    method (str): Optimization method.
+    tickers (list): Ticker symbols (columns of weights).
+    dates (pd.DatetimeIndex): Dates of the out-of-sample returns.
+    returns (np.ndarray): Daily portfolio returns (net of transaction costs).
+    rebalance_dates (pd.DatetimeIndex): First trading day each weight vector was held.
+    weights (np.ndarray): (n_rebalances, n_assets) target weights.
+    turnover (np.ndarray): One-way turnover at each rebalance (1.0 for the initial purchase).
+    stats (dict): Realized statistics (see realized_stats()).
+    """
+
+    def __init__(self, method, tickers, dates, returns, rebalance_dates, weights, turnover, stats):
+        self.method = method
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.returns = returns
+        self.rebalance_dates = rebalance_dates
+        self.weights = weights
+        self.turnover = turnover
+        self.stats = stats
+
+    def __repr__(self):
+        return f"BacktestResult({self.method}, {len(self.rebalance_dates)} rebalances, {len(self.dates)} days)"
+
+    def equity_curve(self):
+        """Growth of 1 as a Series indexed by date."""
+        return pd.Series(np.cumprod(1.0 + self.returns), index=self.dates, name=self.method)
+
+    def weights_frame(self):
+        """Target weights as a DataFrame (rebalance dates x tickers)."""
+        return pd.DataFrame(self.weights, index=self.rebalance_dates, columns=self.tickers)
+
+
+def rebalance_schedule(dates, lookback, frequency='M'):
+    """
+    Rows at which the portfolio is rebalanced.
+
+    The first rebalance is the first row with a full estimation window; after
+    that the portfolio is rebalanced on the first trading day of each period.
+
+    Parameters:
+    dates (pd.DatetimeIndex): Dates of the return rows.
+    lookback (int): Estimation window in return rows.
+    frequency (str or int): 'W', 'M', 'Q', 'A' or a number of trading days.
+
+    Returns:
+    np.ndarray: Increasing row indices (all >= lookback).
+    """
+    n_rows = len(dates)
+    if lookback >= n_rows:
+        return np.array([], dtype=np.int64)
+
+    if isinstance(frequency, (int, np.integer)) or str(frequency).strip().isdigit():
+        step = int(frequency)
+        if step < 1:
+            raise ValueError("Rebalance interval must be at least 1 trading day")
+        return np.arange(lookback, n_rows, step)
+
+    period = _REBALANCE_PERIODS.get(str(frequency).strip().upper())
+    if period is None:
+        raise ValueError(
+            f"Unknown rebalance frequency '{frequency}'. Use W, M, Q, A or a number of trading days."
+        )
+    periods = pd.DatetimeIndex(dates).to_period(period)
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    starts = starts[starts > lookback]
+    return np.r_[lookback, starts].astype(np.int64)
+
+
+def _estimate_window(window, settings):
+    """Mean, covariance model, conditioned dense covariance and its Cholesky factor."""
+    cov_method, halflife, n_factors = settings
+    cov_model = estimate_covariance(window, cov_method, halflife=halflife, n_factors=n_factors)
+    cov, cholesky, _ = condition_covariance(cov_model.dense())
+    return window.mean(axis=0), cov_model, cov, cholesky
+
+
+def _window_weights(method, moments, daily_risk_free_rate, views, previous):
+    """Solve one estimation window; previous is the last weights (warm start) or None."""
+    mu, cov_model, cov, cholesky = moments
+    n_assets = len(mu)
+
+    if method == 'risk_parity':
+        return risk_parity_weights(cov_model, x0=previous)
+
+    if method == 'black_litterman':
+        # Market caps are not available historically, so the prior is the
+        # window's mean return (the fallback optimize_portfolio_black_litterman uses)
+        P, Q, scale = views
+        mu, cov, _ = posterior_moments(mu, cov, P, Q, omega_scale=scale)
+        cholesky = None
+
+    try:
+        return max_sharpe_long_only(mu, cov, daily_risk_free_rate, cholesky=cholesky, x0=previous)
+    except ValueError:
+        # No asset beats the risk-free rate: hold the minimum-variance portfolio
+        start = previous if previous is not None else np.full(n_assets, 1.0 / n_assets)
+        weights, _ = min_variance_qp(cov, np.ones((1, n_assets)), np.array([1.0]), start)
+        return weights
+
+
+def _restrict_views(views, active):
+    """Views on the active assets only (views naming an inactive asset are dropped)."""
+    P, Q, scale = views
+    keep = ~np.any(P[:, ~active] != 0.0, axis=1)
+    return P[np.ix_(keep, active)], Q[keep], scale[keep]
+
+
+def _solve_block(methods, returns, rows, lookback, settings, daily_risk_free_rate, views):
+    """
+    Solve consecutive rebalance rows for every method.
+
+    Each window is estimated once and shared by the methods; each method is
+    warm-started from its own previous weights. Assets with a missing return
+    in the window (not listed yet) are left out and get zero weight.
+    """
+    n_assets = returns.shape[1]
+    weights = {method: np.zeros((len(rows), n_assets)) for method in methods}
+    for j, row in enumerate(rows):
+        window = returns[row - lookback:row]
+        active = np.isfinite(window).all(axis=0)
+        n_active = int(active.sum())
+        if n_active == 0:
+            raise ValueError(f"No ticker has a full {lookback}-day return history before row {row}")
+        if n_active == 1:
+            for method in methods:
+                weights[method][j, active] = 1.0
+            continue
+
+        moments = _estimate_window(window if n_active == n_assets else window[:, active], settings)
+        window_views = views if n_active == n_assets else _restrict_views(views, active)
+        for method in methods:
+            previous = weights[method][j - 1][active] if j > 0 else None
+            if previous is not None and previous.sum() <= 0.0:
+                previous = None
+            weights[method][j, active] = _window_weights(
+                method, moments, daily_risk_free_rate, window_views, previous
+            )
+    return weights
+
+
+def _solve_all(methods, returns, rows, lookback, settings, daily_risk_free_rate, views, max_workers):
+    if max_workers is None or max_workers <= 1 or len(rows) < 2 * max_workers:
+        return _solve_block(methods, returns, rows, lookback, settings, daily_risk_free_rate, views)
+
+    # Each worker receives only the return rows its windows need
+    blocks = [block for block in np.array_split(rows, max_workers) if len(block)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(
+                _solve_block, methods, returns[block[0] - lookback:block[-1]],
+                block - block[0] + lookback, lookback, settings, daily_risk_free_rate, views
+            )
+            for block in blocks
+        ]
+        parts = [future.result() for future in futures]
+    return {method: np.vstack([part[method] for part in parts]) for method in methods}
+
+
+def simulate_holdings(returns, rows, weights, transaction_cost=0.0):
+    """
+    Hold each weight vector from its rebalance row until the next one.
+
+    Parameters:
+    returns (np.ndarray): (n_rows, n_assets) daily asset returns.
+    rows (np.ndarray): Rebalance rows.
+    weights (np.ndarray): (len(rows), n_assets) target weights.
+    transaction_cost (float): Cost per unit traded, charged on the rebalance day.
+
+    Returns:
+    tuple: (daily portfolio returns from rows[0] on, one-way turnover per rebalance).
+    """
+    bounds = np.r_[rows, returns.shape[0]]
+    portfolio = np.empty(returns.shape[0] - rows[0])
+    turnover = np.empty(len(rows))
+    drifted = np.zeros(returns.shape[1])
+
+    for j in range(len(rows)):
+        lo, hi = bounds[j], bounds[j + 1]
+        w = weights[j]
+        trades = w - drifted
+        turnover[j] = float(np.maximum(trades, 0.0).sum())
+
+        growth = np.cumprod(1.0 + returns[lo:hi], axis=0)
+        value = growth @ w
+        period = np.empty(hi - lo)
+        period[0] = value[0] - 1.0
+        period[1:] = value[1:] / value[:-1] - 1.0
+        period[0] -= transaction_cost * float(np.abs(trades).sum())
+        portfolio[lo - rows[0]:hi - rows[0]] = period
+
+        drifted = w * growth[-1] / value[-1] if value[-1] > 0 else np.zeros_like(w)
+
+    return portfolio, turnover
+
+
+def realized_stats(daily_returns, turnover, risk_free_rate=0.0):
+    """
+    Annualized out-of-sample statistics.
+
+    Parameters:
+    daily_returns (np.ndarray): Daily portfolio returns.
+    turnover (np.ndarray): One-way turnover per rebalance (first entry is the initial purchase).
+    risk_free_rate (float): Annual risk-free rate.
+
+    Returns:
+    dict: total_return, annual_return, annual_volatility, sharpe_ratio,
+          max_drawdown, annual_turnover, n_rebalances.
+    """
+    equity = np.cumprod(1.0 + daily_returns)
+    years = len(daily_returns) / TRADING_DAYS_PER_YEAR
+    final = float(equity[-1]) if len(equity) else 1.0
+    daily_std = float(np.std(daily_returns, ddof=1)) if len(daily_returns) > 1 else 0.0
+    excess = float(np.mean(daily_returns)) - risk_free_rate / TRADING_DAYS_PER_YEAR if len(daily_returns) else 0.0
+    drawdowns = equity / np.maximum.accumulate(equity) - 1.0 if len(equity) else np.zeros(1)
+    return {
+        'total_return': final - 1.0,
+        'annual_return': float(final ** (1.0 / years) - 1.0) if years > 0 and final > 0 else -1.0,
+        'annual_volatility': float(daily_std * np.sqrt(TRADING_DAYS_PER_YEAR)),
+        'sharpe_ratio': float(excess / daily_std * np.sqrt(TRADING_DAYS_PER_YEAR)) if daily_std > 0 else 0.0,
+        'max_drawdown': float(np.min(drawdowns)),
+        'annual_turnover': float(np.sum(turnover[1:]) / years) if years > 0 else 0.0,
+        'n_rebalances': int(len(turnover))
+    }
+
+
+def backtest_panel(panel, tickers, methods=BACKTEST_METHODS, lookback=None, rebalance=None,
+                   risk_free_rate=0.04, cov_method=None, transaction_cost_bps=0.0,
+                   views=None, max_workers=None):
+    """
+    Walk-forward backtest of one or more methods on a price panel.
+
+    Parameters:
+    panel (PricePanel): Aligned close prices.
+    tickers (list): Tickers to trade.
+    methods (iterable): Any of 'mpt', 'risk_parity', 'black_litterman'.
+    lookback (int, optional): Estimation window in trading days; defaults to BACKTEST_LOOKBACK_DAYS.
+    rebalance (str or int, optional): 'W', 'M', 'Q', 'A' or a number of trading days;
+                                      defaults to BACKTEST_REBALANCE.
+    risk_free_rate (float): Annual risk-free rate.
+    cov_method (str, optional): Covariance estimator; defaults to COVARIANCE_METHOD.
+    transaction_cost_bps (float): Cost per unit traded, in basis points.
+    views (BlackLittermanViews, optional): Black-Litterman views (annual returns);
+                                           defaults to default_views(tickers).
+    max_workers (int, optional): Processes used across windows; defaults to BACKTEST_MAX_WORKERS.
+
+    Returns:
+    dict: {method: BacktestResult}
+
+    Raises:
+    ValueError: If the method is unknown or the history is shorter than the window.
+    """
+    tickers = list(tickers)
+    methods = [methods] if isinstance(methods, str) else list(methods)
+    unknown = [m for m in methods if m not in BACKTEST_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown backtest method(s) {unknown}. Choose from: {', '.join(BACKTEST_METHODS)}")
+
+    lookback = int(lookback if lookback is not None else BACKTEST_LOOKBACK_DAYS)
+    rebalance = rebalance if rebalance is not None else BACKTEST_REBALANCE
+    max_workers = max_workers if max_workers is not None else BACKTEST_MAX_WORKERS
+    if lookback < MIN_RETURN_OBSERVATIONS:
+        raise ValueError(f"Lookback must be at least {MIN_RETURN_OBSERVATIONS} trading days")
+
+    panel = validate_panel(panel, tickers)
+    # Drop the first row: it has no previous price. Missing returns stay NaN
+    # for the estimation windows and count as 0 when holding
+    returns = np.ascontiguousarray(panel.causal_returns()[1:])
+    dates = panel.dates[1:]
+    rows = rebalance_schedule(dates, lookback, rebalance)
+    if len(rows) == 0:
+        raise ValueError(
+            f"Not enough history for a {lookback}-day estimation window "
+            f"({len(dates)} return rows). Widen the date range or shorten the lookback."
+        )
+
+    settings = ((cov_method or COVARIANCE_METHOD).strip().lower(), COVARIANCE_EWMA_HALFLIFE, COVARIANCE_PCA_FACTORS)
+    daily_risk_free_rate = risk_free_rate / TRADING_DAYS_PER_YEAR
+    P, Q, scale = (views if views is not None else default_views(tickers)).compile(tickers)
+    daily_views = (P, Q / TRADING_DAYS_PER_YEAR, scale)
+    transaction_cost = transaction_cost_bps / 10000.0
+
+    all_weights = _solve_all(methods, returns, rows, lookback, settings, daily_risk_free_rate, daily_views, max_workers)
+    held_returns = np.nan_to_num(returns, nan=0.0)
+    results = {}
+    for method in methods:
+        daily, turnover = simulate_holdings(held_returns, rows, all_weights[method], transaction_cost)
+        results[method] = BacktestResult(
+            method, tickers, dates[rows[0]:], daily, dates[rows], all_weights[method], turnover,
+            realized_stats(daily, turnover, risk_free_rate)
+        )
+    return results
+
+
+def run_backtest(tickers, start_date, end_date, methods=BACKTEST_METHODS, lookback=None, rebalance=None,
+                 risk_free_rate=0.04, cov_method=None, transaction_cost_bps=0.0, views=None, max_workers=None):
+    """
+    Walk-forward backtest for a universe and date range.
+
+    Loads the shared price panel (get_price_panel), then runs backtest_panel();
+    see backtest_panel() for the parameters.
+
+    Returns:
+    dict: {method: BacktestResult}
+    """
+    panel = get_price_panel(tickers, start_date, end_date)
+    return backtest_panel(
+        panel, tickers, methods, lookback, rebalance, risk_free_rate, cov_method,
+        transaction_cost_bps, views, max_workers
+    )
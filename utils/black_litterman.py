@@ -0,0 +1,221 @@
+"""
+Black-Litterman views and posterior for the optimizers.
+
+Views are declared by ticker (absolute: "AAPL returns 8%", relative: "MSFT
+outperforms GOOGL by 5%", or any weighted basket), each with an optional
+confidence, and compiled to the pick matrix P, view returns Q and view
+uncertainty Omega for a ticker universe.
+
+The posterior is computed in the (k x k) view space with one Cholesky
+factorization of M = P tau S P' + Omega, so the cost is O(N^2 k) for k views
+and no N x N matrix is inverted. Posteriors are memoized per (prior,
+covariance, views): the risk-free rate enters the market-implied prior only
+as a constant shift, and the posterior mean is linear in that shift, so
+re-running with another risk-free rate reuses the cached algebra.
+"""
+import hashlib
+
+import numpy as np
+from scipy.linalg import LinAlgError, cho_factor, cho_solve
+
+from config.settings import BL_POSTERIOR_CACHE_SIZE
+from utils import tracing
+from utils.caching import LRUCache, read_only
+
+# Scaling of the prior covariance (uncertainty of the equilibrium returns)
+BL_TAU = 0.05
+
+
+class BlackLittermanViews:
+    """
+    A set of Black-Litterman views, declared by ticker.
+
+    Confidence is in (0, 1]: None uses the He-Litterman default
+    Omega_kk = tau (P S P')_kk, otherwise that variance is scaled by
+    (1 - confidence) / confidence (0.5 = default, 1 = certain).
+
+    Example:
+    views = BlackLittermanViews().relative('MSFT', 'GOOGL', 0.05).absolute('AAPL', 0.08, confidence=0.7)
+    """
+
+    def __init__(self):
+        self._views = []
+
+    def __len__(self):
+        return len(self._views)
+
+    def absolute(self, ticker, expected_return, confidence=None):
+        """View that ticker returns expected_return (annual)."""
+        return self.basket({ticker: 1.0}, expected_return, confidence)
+
+    def relative(self, outperformer, underperformer, spread, confidence=None):
+        """View that outperformer beats underperformer by spread (annual)."""
+        return self.basket({outperformer: 1.0, underperformer: -1.0}, spread, confidence)
+
+    def basket(self, weights, expected_return, confidence=None):
+        """View on any weighted combination of tickers ({ticker: weight})."""
+        if confidence is not None and not 0.0 < confidence <= 1.0:
+            raise ValueError("View confidence must be in (0, 1]")
+        self._views.append((tuple(sorted(weights.items())), float(expected_return),
+                            None if confidence is None else float(confidence)))
+        return self
+
+    def key(self):
+        """Hashable description of the views (for caching)."""
+        return tuple(self._views)
+
+    def compile(self, tickers):
+        """
+        Compile the views for a ticker universe, independently of the covariance.
+
+        Views naming a ticker outside the universe are dropped; the drop is
+        reported once per compile as a 'black_litterman.views_dropped' trace event.
+
+        Parameters:
+        tickers (list): Ticker order of the weights.
+
+        Returns:
+        tuple: (P (k, n_assets), Q (k,), Omega scale (k,)); k may be 0. The
+               scale multiplies the He-Litterman view variance tau (P S P')_kk.
+        """
+        position = {t: i for i, t in enumerate(tickers)}
+        kept = []
+        missing = set()
+        for weights, expected_return, confidence in self._views:
+            absent = [t for t, _ in weights if t not in position]
+            if absent:
+                missing.update(absent)
+                continue
+            kept.append((weights, expected_return, confidence))
+        if missing:
+            tracing.event('black_litterman.views_dropped', n_dropped=len(self._views) - len(kept),
+                          tickers=sorted(missing))
+
+        P = np.zeros((len(kept), len(tickers)))
+        for row, (weights, _, _) in enumerate(kept):
+            for ticker, weight in weights:
+                P[row, position[ticker]] += weight
+        Q = np.array([view[1] for view in kept], dtype=np.float64)
+        # (1 - c) / c where a confidence c is given
+        scale = np.array([1.0 if view[2] is None else (1.0 - view[2]) / view[2] for view in kept])
+        return P, Q, scale
+
+    def build(self, tickers, cov, tau=BL_TAU):
+        """
+        P, Q and the diagonal of Omega for a ticker universe and prior covariance.
+
+        Parameters:
+        tickers (list): Ticker order of cov.
+        cov (array): Prior covariance matrix (annual).
+        tau (float): Prior uncertainty scaling.
+
+        Returns:
+        tuple: (P (k, n_assets), Q (k,), Omega diagonal (k,)); k may be 0.
+        """
+        P, Q, scale = self.compile(tickers)
+        return P, Q, tau * np.einsum('ij,jk,ik->i', P, np.asarray(cov, dtype=np.float64), P) * scale
+
+
+def default_views(tickers):
+    """
+    The view the app has always used: MSFT outperforms GOOGL by 5% a year
+    (no views unless both are in the universe).
+    """
+    views = BlackLittermanViews()
+    if 'MSFT' in tickers and 'GOOGL' in tickers:
+        views.relative('MSFT', 'GOOGL', 0.05)
+    return views
+
+
+def posterior_moments(prior, cov, P, Q, omega=None, tau=BL_TAU, omega_scale=None):
+    """
+    Black-Litterman posterior mean and covariance.
+
+    With A = tau S P' and M = P tau S P' + Omega:
+        mu_post = pi + A M^-1 (Q - P pi)
+        S_post = (1 + tau) S - A M^-1 A'
+    M is factorized once (Cholesky) and solved for all right-hand sides at once.
+
+    Parameters:
+    prior (array): Prior (equilibrium) returns pi.
+    cov (array): Prior covariance S.
+    P (array): (k, n_assets) pick matrix (k may be 0).
+    Q (array): (k,) view returns.
+    omega (array, optional): (k,) view variances; defaults to diag(tau P S P').
+    tau (float): Prior uncertainty scaling.
+    omega_scale (array, optional): (k,) multipliers of the default view variances
+                                   (as from BlackLittermanViews.compile).
+
+    Returns:
+    tuple: (posterior mean, posterior covariance, rate loading), where the rate
+           loading g = 1 - A M^-1 P 1 is the change of the posterior mean per
+           unit added to every prior return.
+    """
+    prior = np.asarray(prior, dtype=np.float64)
+    cov = np.asarray(cov, dtype=np.float64)
+    n = len(prior)
+    if P is None or len(Q) == 0:
+        return prior.copy(), (1.0 + tau) * cov, np.ones(n)
+
+    P = np.atleast_2d(np.asarray(P, dtype=np.float64))
+    A = tau * (cov @ P.T)
+    view_cov = P @ A
+    if omega is None:
+        omega = np.diag(view_cov) * (1.0 if omega_scale is None else np.asarray(omega_scale, dtype=np.float64))
+    M = view_cov + np.diag(omega)
+    try:
+        factor = cho_factor(M, lower=True, check_finite=False)
+    except LinAlgError:
+        # Redundant certain views: load the diagonal just enough to factorize
+        M = M + np.eye(len(M)) * 1e-12 * max(float(np.mean(np.diag(M))), 1e-300)
+        factor = cho_factor(M, lower=True, check_finite=False)
+
+    rhs = np.column_stack([np.asarray(Q, dtype=np.float64) - P @ prior, P @ np.ones(n), A.T])
+    solved = cho_solve(factor, rhs, check_finite=False)
+    mu = prior + A @ solved[:, 0]
+    rate_loading = 1.0 - A @ solved[:, 1]
+    posterior = (1.0 + tau) * cov - A @ solved[:, 2:]
+    return mu, 0.5 * (posterior + posterior.T), rate_loading
+
+
+def _fingerprint(*arrays):
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+_posterior_cache = LRUCache(BL_POSTERIOR_CACHE_SIZE)
+
+
+def black_litterman_posterior(prior, cov, tickers, views, tau=BL_TAU):
+    """
+    Memoized posterior for an excess-return prior and a set of views.
+
+    Parameters:
+    prior (array): Prior returns without the risk-free rate (excess returns),
+                   or the full prior when it does not depend on the rate.
+    cov (array): Prior covariance (annual).
+    tickers (list): Ticker order of prior and cov.
+    views (BlackLittermanViews): Views (may be empty).
+    tau (float): Prior uncertainty scaling.
+
+    Returns:
+    tuple: (posterior mean, posterior covariance, rate loading) as from
+           posterior_moments; add risk_free_rate * rate_loading to the mean
+           when the prior was given in excess of the risk-free rate.
+    """
+    key = (_fingerprint(prior, cov), tuple(tickers), views.key(), float(tau))
+
+    def compute():
+        P, Q, scale = views.compile(list(tickers))
+        return tuple(read_only(a) for a in posterior_moments(prior, cov, P, Q, tau=tau, omega_scale=scale))
+
+    return _posterior_cache.get_or_compute(key, compute)
+
+
+def get_posterior_cache_stats():
+    """Return hit/miss counts and size of the posterior cache."""
+    return _posterior_cache.stats()
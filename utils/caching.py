@@ -0,0 +1,56 @@
+"""
+Small in-process caching helpers shared by the estimation, price panel and
+Black-Litterman modules.
+"""
+import threading
+from collections import OrderedDict
+
+
+def read_only(array):
+    """Mark a NumPy array read-only (safe to share from a cache) and return it."""
+    array.flags.writeable = False
+    return array
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with hit/miss counters.
+
+    Values are computed outside the lock, so concurrent misses on the same key
+    may compute twice; the last result stored is kept.
+    """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._entries[key]
+            self._stats['misses'] += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._stats = {'hits': 0, 'misses': 0}
+
+    def stats(self):
+        """Return hit/miss counts and the current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        return stats
@@ -0,0 +1,239 @@
+"""
+Declarative allocation constraints for the optimizers in utils/portfolio_optimizer.
+
+A PortfolioConstraints object describes the allocation rules by ticker
+(weight caps, per-asset bounds, group/sector exposure limits, turnover against
+current holdings, minimum position size and a maximum number of positions).
+compile() turns it into matrix form for one ticker universe: bound vectors, a
+sparse inequality matrix A_ub x <= b_ub and the budget row A_eq x = b_eq. The
+solvers evaluate each constraint type as one matrix product instead of one
+Python closure per constraint.
+
+Turnover sum |x - x0| <= T is linearized with one auxiliary variable per asset
+(t >= x - x0, t >= x0 - x, sum t <= T), so compiled problems may have more
+variables than assets; the first n_assets are always the weights.
+
+Minimum position size and cardinality are not convex. Solvers handle them by
+re-solving with the offending positions excluded (see solve_constrained in
+utils/solvers.py).
+"""
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+
+
+class PortfolioConstraints:
+    """
+    Allocation rules, by ticker.
+
+    Parameters:
+    min_weight (float): Default lower bound per asset.
+    max_weight (float): Default upper bound per asset (e.g. 0.1 = 10% cap).
+    asset_bounds (dict, optional): Ticker to (lower, upper), overriding the defaults.
+    groups (dict, optional): Group name (e.g. sector) to list of tickers.
+    group_bounds (dict, optional): Group name to (lower, upper) total weight;
+                                   either side may be None.
+    current_weights (dict, optional): Current holdings, ticker to weight.
+    max_turnover (float, optional): Maximum sum |w - current| (requires current_weights).
+    min_position (float, optional): Held positions must be at least this large.
+    max_positions (int, optional): Maximum number of non-zero positions.
+    """
+
+    def __init__(self, min_weight=0.0, max_weight=1.0, asset_bounds=None, groups=None, group_bounds=None,
+                 current_weights=None, max_turnover=None, min_position=None, max_positions=None):
+        if max_turnover is not None and current_weights is None:
+            raise ValueError("max_turnover requires current_weights")
+        self.min_weight = float(min_weight)
+        self.max_weight = float(max_weight)
+        self.asset_bounds = dict(asset_bounds or {})
+        self.groups = {name: list(members) for name, members in (groups or {}).items()}
+        self.group_bounds = dict(group_bounds or {})
+        self.current_weights = dict(current_weights) if current_weights is not None else None
+        self.max_turnover = None if max_turnover is None else float(max_turnover)
+        self.min_position = None if min_position is None else float(min_position)
+        self.max_positions = None if max_positions is None else int(max_positions)
+
+    def compile(self, tickers):
+        """
+        Compile to matrix form for the given ticker order.
+
+        Parameters:
+        tickers (list): Ticker symbols, in the order of the weight vector.
+
+        Returns:
+        CompiledConstraints
+
+        Raises:
+        ValueError: If the bounds alone are already infeasible.
+        """
+        tickers = list(tickers)
+        n = len(tickers)
+        position = {t: i for i, t in enumerate(tickers)}
+
+        lower = np.full(n, self.min_weight)
+        upper = np.full(n, self.max_weight)
+        for ticker, (lo, hi) in self.asset_bounds.items():
+            i = position.get(ticker)
+            if i is not None:
+                lower[i] = self.min_weight if lo is None else float(lo)
+                upper[i] = self.max_weight if hi is None else float(hi)
+        if np.any(lower > upper) or lower.sum() > 1.0 + 1e-12 or upper.sum() < 1.0 - 1e-12:
+            raise ValueError("Weight bounds are infeasible: they must allow weights summing to 1")
+
+        # Group exposure rows, built in COO form: one row per finite group bound
+        rows, cols, vals, rhs = [], [], [], []
+        for name, (lo, hi) in self.group_bounds.items():
+            members = [position[t] for t in self.groups.get(name, []) if t in position]
+            if not members:
+                continue
+            for sign, bound in ((1.0, hi), (-1.0, lo)):
+                if bound is None:
+                    continue
+                rows.extend([len(rhs)] * len(members))
+                cols.extend(members)
+                vals.extend([sign] * len(members))
+                rhs.append(sign * float(bound))
+
+        n_aux = 0
+        current = None
+        if self.max_turnover is not None:
+            n_aux = n
+            current = np.array([float(self.current_weights.get(t, 0.0)) for t in tickers])
+            idx = np.arange(n)
+            base = len(rhs)
+            # x - t <= x0 and -x - t <= -x0, then sum(t) <= max_turnover
+            rows.extend(np.concatenate([base + idx, base + idx, base + n + idx, base + n + idx, np.full(n, base + 2 * n)]))
+            cols.extend(np.concatenate([idx, n + idx, idx, n + idx, n + idx]))
+            vals.extend(np.concatenate([np.ones(n), -np.ones(n), -np.ones(n), -np.ones(n), np.ones(n)]))
+            rhs.extend(np.concatenate([current, -current, [self.max_turnover]]))
+            lower = np.concatenate([lower, np.zeros(n)])
+            upper = np.concatenate([upper, np.full(n, 2.0)])
+
+        n_vars = n + n_aux
+        A_ub = sparse.csr_matrix((vals, (rows, cols)), shape=(len(rhs), n_vars))
+        A_eq = sparse.csr_matrix((np.ones(n), (np.zeros(n, dtype=int), np.arange(n))), shape=(1, n_vars))
+        return CompiledConstraints(
+            tickers, lower, upper, A_ub, np.asarray(rhs, dtype=np.float64), A_eq, np.array([1.0]),
+            current, self.min_position, self.max_positions
+        )
+
+
+class CompiledConstraints:
+    """
+    Constraints in matrix form over the variable vector (weights, then auxiliaries).
+
+    Attributes:
+    tickers (list): Ticker order of the weights.
+    n_assets (int): Number of weights.
+    n_vars (int): Number of variables (weights plus turnover auxiliaries).
+    lower, upper (np.ndarray): (n_vars,) variable bounds.
+    A_ub (scipy.sparse.csr_matrix): Inequality rows, A_ub z <= b_ub.
+    b_ub (np.ndarray): Inequality right-hand side.
+    A_eq (scipy.sparse.csr_matrix): Equality rows (the budget), A_eq z = b_eq.
+    b_eq (np.ndarray): Equality right-hand side.
+    current (np.ndarray or None): Current weights when turnover is limited.
+    min_position (float or None): Minimum held position.
+    max_positions (int or None): Maximum number of held positions.
+    """
+
+    def __init__(self, tickers, lower, upper, A_ub, b_ub, A_eq, b_eq, current=None,
+                 min_position=None, max_positions=None):
+        self.tickers = tickers
+        self.n_assets = len(tickers)
+        self.n_vars = len(lower)
+        self.lower = lower
+        self.upper = upper
+        self.A_ub = A_ub
+        self.b_ub = b_ub
+        self.A_eq = A_eq
+        self.b_eq = b_eq
+        self.current = current
+        self.min_position = min_position
+        self.max_positions = max_positions
+        self._dense = None
+
+    @property
+    def long_only(self):
+        """True if this is just 0 <= w <= 1 with sum(w) = 1 (the dedicated solvers apply)."""
+        return (self.n_vars == self.n_assets and self.A_ub.shape[0] == 0
+                and not np.any(self.lower[:self.n_assets]) and np.all(self.upper[:self.n_assets] >= 1.0)
+                and self.min_position is None and self.max_positions is None)
+
+    @property
+    def discrete(self):
+        """True if a minimum position size or cardinality limit must be enforced."""
+        return self.min_position is not None or self.max_positions is not None
+
+    def bounds(self):
+        """(n_vars, 2) bounds array for scipy.optimize."""
+        return np.column_stack([self.lower, self.upper])
+
+    def slsqp_constraints(self):
+        """
+        The constraints as (at most) two vectorized SLSQP constraints.
+
+        Each is a single function evaluating all of its rows with one matrix
+        product, with a constant Jacobian.
+        """
+        if self._dense is None:
+            self._dense = (self.A_ub.toarray(), self.A_eq.toarray())
+        A_ub, A_eq = self._dense
+        b_ub, b_eq = self.b_ub, self.b_eq
+        constraints = [{'type': 'eq', 'fun': lambda z: A_eq @ z - b_eq, 'jac': lambda z: A_eq}]
+        if len(b_ub):
+            constraints.append({'type': 'ineq', 'fun': lambda z: b_ub - A_ub @ z, 'jac': lambda z: -A_ub})
+        return constraints
+
+    def feasible_point(self):
+        """
+        A feasible variable vector (the current holdings if they qualify).
+
+        Raises:
+        ValueError: If the constraints admit no portfolio.
+        """
+        if self.current is not None:
+            z = np.concatenate([self.current, np.zeros(self.n_vars - self.n_assets)])
+            if self.is_feasible(z):
+                return z
+        # Feasibility LP pulled towards equal weights
+        n = self.n_assets
+        target = np.clip(np.full(n, 1.0 / n), self.lower[:n], self.upper[:n])
+        c = np.zeros(self.n_vars)
+        c[:n] = -target
+        res = linprog(c, A_ub=self.A_ub if len(self.b_ub) else None, b_ub=self.b_ub if len(self.b_ub) else None,
+                      A_eq=self.A_eq, b_eq=self.b_eq, bounds=self.bounds(), method='highs')
+        if res.status == 2:
+            raise ValueError("Portfolio constraints are infeasible")
+        if not res.success:
+            raise ValueError(f"Could not find a feasible portfolio: {res.message}")
+        return res.x
+
+    def is_feasible(self, z, tol=1e-8):
+        """True if the variable vector satisfies the bounds and linear rows."""
+        z = np.asarray(z, dtype=np.float64)
+        if np.any(z < self.lower - tol) or np.any(z > self.upper + tol):
+            return False
+        if len(self.b_ub) and np.any(self.A_ub @ z > self.b_ub + tol):
+            return False
+        return bool(np.all(np.abs(self.A_eq @ z - self.b_eq) <= tol))
+
+    def violations(self, weights, tol=1e-6):
+        """Indices of held positions breaking the minimum size or cardinality limit."""
+        w = np.asarray(weights, dtype=np.float64)[:self.n_assets]
+        held = np.flatnonzero(w > tol)
+        bad = set()
+        if self.min_position is not None:
+            bad.update(held[w[held] < self.min_position - tol].tolist())
+        if self.max_positions is not None and len(held) > self.max_positions:
+            bad.update(held[np.argsort(w[held])[:len(held) - self.max_positions]].tolist())
+        # Positions with a positive lower bound cannot be removed
+        return np.array(sorted(i for i in bad if self.lower[i] <= 0.0), dtype=int)
+
+    def exclude(self, indices):
+        """Copy with the given assets fixed at zero."""
+        upper = self.upper.copy()
+        upper[indices] = 0.0
+        return CompiledConstraints(
+            self.tickers, self.lower, upper, self.A_ub, self.b_ub, self.A_eq, self.b_eq,
+            self.current, self.min_position, self.max_positions
+        )
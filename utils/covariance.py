@@ -0,0 +1,242 @@
+"""
+Covariance estimators for the shared estimation stage (utils/estimation.py).
+
+The sample covariance becomes ill-conditioned once the universe is large
+relative to the history. Shrinkage (Ledoit-Wolf, OAS), exponentially weighted
+and statistical factor (PCA) estimators are provided here, all vectorized
+over the (n_dates, n_assets) return block.
+
+Every estimator returns an object with the same small interface
+(matvec, diag, column, dense). The factor model keeps its loadings and
+specific variances, so solvers that only need matrix-vector products pay
+O(N k) instead of O(N^2).
+"""
+import numpy as np
+from scipy.linalg import cho_factor, LinAlgError
+
+COVARIANCE_METHODS = ('sample', 'ledoit_wolf', 'oas', 'ewma', 'pca')
+
+
+class DenseCovariance:
+    """Covariance held as a full (n_assets, n_assets) matrix."""
+
+    def __init__(self, matrix, method='sample', shrinkage=None):
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        self.method = method
+        self.shrinkage = shrinkage
+
+    @property
+    def n_assets(self):
+        return self.matrix.shape[0]
+
+    def matvec(self, x):
+        return self.matrix @ x
+
+    def diag(self):
+        return np.diag(self.matrix).copy()
+
+    def column(self, i):
+        return self.matrix[:, i]
+
+    def dense(self):
+        return self.matrix
+
+
+class FactorCovariance:
+    """
+    Low-rank plus diagonal covariance: S = L L' + diag(specific).
+
+    Attributes:
+    loadings (np.ndarray): (n_assets, k) factor loadings scaled by factor volatility.
+    specific (np.ndarray): (n_assets,) specific (idiosyncratic) variances.
+    """
+
+    def __init__(self, loadings, specific, method='pca'):
+        self.loadings = np.ascontiguousarray(loadings, dtype=np.float64)
+        self.specific = np.asarray(specific, dtype=np.float64)
+        self.method = method
+        self.shrinkage = None
+        self._dense = None
+
+    @property
+    def n_assets(self):
+        return self.loadings.shape[0]
+
+    @property
+    def n_factors(self):
+        return self.loadings.shape[1]
+
+    def matvec(self, x):
+        """S x in O(N k)."""
+        return self.loadings @ (self.loadings.T @ x) + self.specific * x
+
+    def diag(self):
+        return np.einsum('ij,ij->i', self.loadings, self.loadings) + self.specific
+
+    def column(self, i):
+        """Column i of S in O(N k)."""
+        col = self.loadings @ self.loadings[i]
+        col[i] += self.specific[i]
+        return col
+
+    def dense(self):
+        """Full matrix (built once, for solvers that need submatrix solves)."""
+        if self._dense is None:
+            self._dense = self.loadings @ self.loadings.T + np.diag(self.specific)
+        return self._dense
+
+
+def condition_covariance(cov_matrix, jitter=1e-10, max_tries=12):
+    """
+    Make a covariance matrix safely positive definite via Cholesky.
+
+    The (symmetrized) matrix is factorized directly; only if that fails is the
+    diagonal loaded with jitter * mean variance, growing tenfold per attempt.
+    This replaces full eigendecompositions for PSD checks: a Cholesky costs
+    N^3/3 flops, runs once in the common case, and its factor is reused by the
+    solvers.
+
+    Parameters:
+    cov_matrix (array): Covariance matrix.
+    jitter (float): First diagonal loading, relative to the mean variance.
+    max_tries (int): Maximum number of loading attempts.
+
+    Returns:
+    tuple: (conditioned matrix, (cholesky factor, lower) as from
+           scipy.linalg.cho_factor, absolute diagonal loading added).
+
+    Raises:
+    ValueError: If the matrix contains NaN/Inf or cannot be made positive definite.
+    """
+    cov = np.asarray(cov_matrix, dtype=np.float64)
+    if not np.all(np.isfinite(cov)):
+        raise ValueError("Covariance matrix contains NaN or Inf values")
+    cov = 0.5 * (cov + cov.T)
+    scale = float(np.mean(np.abs(np.diag(cov)))) if cov.size else 0.0
+    scale = scale if scale > 0 else 1.0
+
+    loading = 0.0
+    for attempt in range(max_tries + 1):
+        candidate = cov if loading == 0.0 else cov + np.eye(len(cov)) * loading
+        try:
+            factor = cho_factor(candidate, lower=True, check_finite=False)
+        except LinAlgError:
+            loading = jitter * scale * (10.0 ** attempt)
+            continue
+        return candidate, factor, loading
+
+    raise ValueError("Covariance matrix could not be made positive definite")
+
+
+def _centered(returns):
+    X = np.asarray(returns, dtype=np.float64)
+    return X - X.mean(axis=0)
+
+
+def sample_covariance(returns):
+    """Unbiased sample covariance."""
+    return DenseCovariance(np.atleast_2d(np.cov(returns, rowvar=False)), 'sample')
+
+
+def ledoit_wolf_covariance(returns):
+    """
+    Ledoit-Wolf shrinkage towards a scaled identity.
+
+    With S the (1/T) sample covariance and m = tr(S)/N, the optimal weight on
+    the target m*I is min(b^2, d^2) / d^2 where d^2 = ||S - mI||^2 / N and
+    b^2 = (sum_t ||x_t||^4 / T - ||S||^2) / (N T).
+    """
+    X = _centered(returns)
+    n_obs, n_assets = X.shape
+    S = X.T @ X / n_obs
+    m = np.trace(S) / n_assets
+    d2 = (np.sum(S * S) - 2.0 * m * np.trace(S) + m * m * n_assets) / n_assets
+    row_norms_sq = np.einsum('ij,ij->i', X, X)
+    b2_bar = (np.sum(row_norms_sq ** 2) / n_obs - np.sum(S * S)) / (n_assets * n_obs)
+    shrinkage = 0.0 if d2 <= 0 else float(np.clip(min(b2_bar, d2) / d2, 0.0, 1.0))
+    shrunk = (1.0 - shrinkage) * S
+    shrunk[np.diag_indices(n_assets)] += shrinkage * m
+    return DenseCovariance(shrunk, 'ledoit_wolf', shrinkage)
+
+
+def oas_covariance(returns):
+    """Oracle Approximating Shrinkage (Chen et al.) towards a scaled identity."""
+    X = _centered(returns)
+    n_obs, n_assets = X.shape
+    S = X.T @ X / n_obs
+    m = np.trace(S) / n_assets
+    alpha = np.mean(S * S)
+    num = alpha + m * m
+    den = (n_obs + 1.0) * (alpha - m * m / n_assets)
+    shrinkage = 1.0 if den == 0 else float(min(num / den, 1.0))
+    shrunk = (1.0 - shrinkage) * S
+    shrunk[np.diag_indices(n_assets)] += shrinkage * m
+    return DenseCovariance(shrunk, 'oas', shrinkage)
+
+
+def ewma_covariance(returns, halflife=63):
+    """
+    Exponentially weighted covariance (most recent observation weighted most).
+
+    Parameters:
+    returns (array): (n_dates, n_assets) returns, oldest first.
+    halflife (float): Half-life of the weights in observations.
+    """
+    X = np.asarray(returns, dtype=np.float64)
+    n_obs = X.shape[0]
+    decay = 0.5 ** (1.0 / halflife)
+    weights = decay ** np.arange(n_obs - 1, -1, -1, dtype=np.float64)
+    weights /= weights.sum()
+    Xc = X - weights @ X
+    # Bias correction for weighted samples: 1 / (1 - sum(w^2))
+    cov = (Xc * weights[:, None]).T @ Xc / (1.0 - np.sum(weights ** 2))
+    return DenseCovariance(cov, 'ewma')
+
+
+def pca_factor_covariance(returns, n_factors=5):
+    """
+    Statistical factor model: top principal components plus diagonal specific risk.
+
+    Uses a thin SVD of the centered return block, so the cost is
+    O(T N min(T, N)) and no N x N matrix is formed.
+
+    Parameters:
+    returns (array): (n_dates, n_assets) returns.
+    n_factors (int): Number of principal components kept.
+    """
+    X = _centered(returns)
+    n_obs, n_assets = X.shape
+    k = int(max(1, min(n_factors, n_obs - 1, n_assets)))
+    _, singular, vt = np.linalg.svd(X / np.sqrt(max(n_obs - 1, 1)), full_matrices=False)
+    loadings = vt[:k].T * singular[:k]
+    total_var = np.einsum('ij,ij->j', X, X) / max(n_obs - 1, 1)
+    common_var = np.einsum('ij,ij->i', loadings, loadings)
+    # Keep a small floor so the model stays positive definite
+    specific = np.maximum(total_var - common_var, 1e-6 * max(float(np.mean(total_var)), 1e-300))
+    return FactorCovariance(loadings, specific, 'pca')
+
+
+def estimate_covariance(returns, method='sample', halflife=63, n_factors=5):
+    """
+    Estimate a covariance model from a (n_dates, n_assets) return block.
+
+    Parameters:
+    returns (array): Cleaned returns.
+    method (str): One of COVARIANCE_METHODS.
+    halflife (float): EWMA half-life in observations.
+    n_factors (int): Number of PCA factors.
+
+    Returns:
+    DenseCovariance or FactorCovariance
+    """
+    if method == 'sample':
+        return sample_covariance(returns)
+    if method == 'ledoit_wolf':
+        return ledoit_wolf_covariance(returns)
+    if method == 'oas':
+        return oas_covariance(returns)
+    if method == 'ewma':
+        return ewma_covariance(returns, halflife)
+    if method == 'pca':
+        return pca_factor_covariance(returns, n_factors)
+    raise ValueError(f"Unknown covariance method '{method}'. Choose one of: {', '.join(COVARIANCE_METHODS)}")
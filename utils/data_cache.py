@@ -1,12 +1,20 @@
 """
-Centralized data caching for yfinance downloads.
+Centralized data caching for market data downloads.
 This module provides cached functions to avoid redundant API calls.
+Data comes from the provider selected in utils/market_data.py (yfinance by default).
 """
-import yfinance as yf
 import pandas as pd
 import time
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout, RequestException
+from utils import price_store
+from utils.market_data import get_provider
+from utils.price_panel import PricePanel
+from config.settings import (
+    PRICE_REFRESH_MODE, BATCH_DOWNLOAD_ENABLED, BATCH_DOWNLOAD_CHUNK_SIZE,
+    INFO_FIELDS, INFO_CACHE_TTL
+)
 
 # Try to import streamlit for caching (optional - if not available, caching won't work)
 try:
@@ -19,7 +27,62 @@ except ImportError:
         def decorator(func):
             return func
         return decorator
-    st = type('obj', (object,), {'cache_data': cache_data})()
+    st = type('obj', (object,), {'cache_data': cache_data, 'cache_resource': cache_data})()
+
+
+class _SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+    
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for it and receive a copy of its result (or its exception).
+    st.cache_data only stores a result once the first call returns, so without
+    this every thread that misses the cache at the same time would download.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {'issued': 0, 'coalesced': 0}
+    
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._in_flight[key] = call
+                self._stats['issued'] += 1
+            else:
+                self._stats['coalesced'] += 1
+        
+        if not is_leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            result = call['result']
+            # Followers get their own copy so no caller can mutate another's data
+            return result.copy() if hasattr(result, 'copy') else result
+        
+        try:
+            call['result'] = func(*args, **kwargs)
+            return call['result']
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call['done'].set()
+    
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+        return stats
+
+
+_single_flight = _SingleFlight()
 
 
 @st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
@@ -28,6 +91,11 @@ def get_ticker_history(ticker, start_date, end_date, max_retries=3, retry_delay=
     Download historical stock data for a single ticker with caching.
     This is the central function that all other modules should use to avoid redundant downloads.
     
+    The persistent price store (utils/price_store.py) is consulted first, so a
+    history that was already downloaded by any process on this host is served
+    from disk. The network is only used when the stored range does not cover
+    the requested one.
+    
     Parameters:
     ticker (str): Stock ticker symbol.
     start_date (str): Start date for historical data.
@@ -49,24 +117,157 @@ def get_ticker_history(ticker, start_date, end_date, max_retries=3, retry_delay=
     start_str = str(start_date) if isinstance(start_date, str) else start_date.strftime('%Y-%m-%d')
     end_str = str(end_date) if isinstance(end_date, str) else end_date.strftime('%Y-%m-%d')
     
+    # Concurrent callers for the same ticker/range (preload thread, other tabs,
+    # other sessions) share one in-flight load instead of downloading twice
+    return _single_flight.do(
+        ('history', str(ticker).upper(), start_str, end_str),
+        _load_ticker_history, ticker, start_str, end_str, max_retries, retry_delay
+    )
+
+
+def _use_price_store():
+    """Return True if histories should go through the on-disk price store."""
+    # Local and synthetic providers are already offline - storing them would
+    # only mix fixture data into the store of real downloads
+    return price_store.is_enabled() and getattr(get_provider(), 'use_price_store', False)
+
+
+def _load_ticker_history(ticker, start_str, end_str, max_retries=3, retry_delay=2):
+    """
+    Load a ticker history from the price store, downloading whatever is missing.
+    
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    start_str (str): Start date in 'YYYY-MM-DD' format.
+    end_str (str): End date in 'YYYY-MM-DD' format (exclusive).
+    max_retries (int): Maximum number of retry attempts.
+    retry_delay (float): Delay between retries in seconds.
+    
+    Returns:
+    pd.DataFrame: Historical stock data with all columns.
+    """
+    if not _use_price_store():
+        return _download_ticker_history(ticker, start_str, end_str, max_retries, retry_delay)
+    
+    stored, meta = price_store.load(ticker)
+    if stored is not None and price_store.covers(meta, start_str, end_str):
+        hist = price_store.slice_history(stored, start_str, end_str)
+        if not hist.empty:
+            price_store.record_hit(meta)
+            return hist
+    
+    price_store.record_miss()
+    
+    if stored is not None and meta and PRICE_REFRESH_MODE == 'incremental':
+        # Only download the bars missing around the stored history and splice them in
+        hist = _top_up_ticker_history(ticker, stored, meta, start_str, end_str, max_retries, retry_delay)
+        if not hist.empty:
+            return hist
+        raise ValueError(f"No data downloaded for {ticker} in date range {start_str} to {end_str}")
+    
+    fetch_start = time.perf_counter()
+    hist = _download_ticker_history(ticker, start_str, end_str, max_retries, retry_delay)
+    fetch_seconds = time.perf_counter() - fetch_start
+    price_store.record_fetch(fetch_seconds)
+    
+    _store_downloaded_history(ticker, stored, meta, hist, start_str, end_str, fetch_seconds)
+    
+    return hist
+
+
+def _store_downloaded_history(ticker, stored, meta, hist, start_str, end_str, fetch_seconds):
+    """
+    Save a full-range download to the price store, merging it with any stored history.
+    
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    stored (pd.DataFrame or None): History currently in the price store.
+    meta (dict or None): Price store metadata for the stored history.
+    hist (pd.DataFrame): History downloaded for [start_str, end_str).
+    start_str (str): Start date of the download.
+    end_str (str): End date of the download (exclusive).
+    fetch_seconds (float): Network time spent on the download.
+    """
+    # Widen the stored coverage only when the new range overlaps or touches it,
+    # otherwise a gap between the two ranges would be reported as covered
+    covered_start, covered_end = start_str, price_store.covered_end_for(end_str)
+    if stored is not None and meta and meta['covered_start'] <= covered_end and start_str <= meta['covered_end']:
+        stored = price_store.merge_history(stored, hist)
+        covered_start = min(covered_start, meta['covered_start'])
+        covered_end = max(covered_end, meta['covered_end'])
+    else:
+        stored = hist
+    price_store.save(ticker, stored, covered_start, covered_end, fetch_seconds)
+
+
+def _top_up_ticker_history(ticker, stored, meta, start_str, end_str, max_retries=3, retry_delay=2):
+    """
+    Extend a stored history to cover [start_str, end_str) by downloading only the missing bars.
+    
+    Since calculate_date_range moves end_date forward every day, this turns a
+    full multi-year re-download into a fetch of the few bars added since the
+    last stored one.
+    
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    stored (pd.DataFrame): History currently in the price store.
+    meta (dict): Price store metadata for the stored history.
+    start_str (str): Requested start date in 'YYYY-MM-DD' format.
+    end_str (str): Requested end date in 'YYYY-MM-DD' format (exclusive).
+    max_retries (int): Maximum number of retry attempts per delta download.
+    retry_delay (float): Delay between retries in seconds.
+    
+    Returns:
+    pd.DataFrame: History for the requested range (may be empty).
+    """
+    fetch_seconds = 0.0
+    for delta_start, delta_end in price_store.missing_ranges(stored, meta, start_str, end_str):
+        fetch_start = time.perf_counter()
+        # A delta may legitimately contain no bars (weekend, holiday, pre-IPO)
+        delta = _download_ticker_history(ticker, delta_start, delta_end, max_retries, retry_delay, allow_empty=True)
+        elapsed = time.perf_counter() - fetch_start
+        price_store.record_fetch(elapsed, rows=len(delta))
+        fetch_seconds += elapsed
+        stored = price_store.merge_history(stored, delta)
+    
+    covered_start = min(start_str, meta['covered_start'])
+    covered_end = max(price_store.covered_end_for(end_str), meta['covered_end'])
+    price_store.save(ticker, stored, covered_start, covered_end, meta.get('fetch_seconds', 0.0) + fetch_seconds)
+    
+    return price_store.slice_history(stored, start_str, end_str)
+
+
+def _download_ticker_history(ticker, start_str, end_str, max_retries=3, retry_delay=2, allow_empty=False):
+    """
+    Download historical stock data for a single ticker from the active market data provider (no caching).
+    
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    start_str (str): Start date in 'YYYY-MM-DD' format.
+    end_str (str): End date in 'YYYY-MM-DD' format (exclusive).
+    max_retries (int): Maximum number of retry attempts.
+    retry_delay (float): Delay between retries in seconds.
+    allow_empty (bool): Return an empty DataFrame instead of retrying when no bars exist.
+    
+    Returns:
+    pd.DataFrame: Historical stock data with all columns.
+    """
     for attempt in range(max_retries):
         try:
-            stock = yf.Ticker(ticker)
-            
-            # Download history with explicit parameters
+            # Download history with explicit parameters from the active provider
             try:
-                hist = stock.history(start=start_str, end=end_str, auto_adjust=True)
+                hist = get_provider().history(ticker, start_str, end_str)
+            except (RequestsConnectionError, Timeout, RequestException):
+                raise
             except Exception as hist_err:
-                # Try without auto_adjust if that fails
-                try:
-                    hist = stock.history(start=start_str, end=end_str)
-                except Exception as e2:
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay * (attempt + 1))  # Exponential backoff for consistency
-                        continue
-                    raise Exception(f"Failed to download history: {str(hist_err)}. Retry failed: {str(e2)}") from e2
+                if attempt < max_retries - 1:
+                    time.sleep(retry_delay * (attempt + 1))  # Exponential backoff for consistency
+                    continue
+                raise Exception(f"Failed to download history: {str(hist_err)}") from hist_err
             
             if hist.empty:
+                if allow_empty:
+                    return hist
                 if attempt < max_retries - 1:
                     time.sleep(retry_delay * (attempt + 1))  # Exponential backoff for consistency
                     continue
@@ -93,11 +294,92 @@ def get_ticker_history(ticker, start_date, end_date, max_retries=3, retry_delay=
                 raise Exception(f"Error downloading data for {ticker}: {str(e)}") from e
 
 
+def _download_batch_history(tickers, start_str, end_str):
+    """
+    Download historical data for several tickers in one multi-ticker request.
+    
+    Parameters:
+    tickers (list): Stock ticker symbols (one chunk).
+    start_str (str): Start date in 'YYYY-MM-DD' format.
+    end_str (str): End date in 'YYYY-MM-DD' format (exclusive).
+    
+    Returns:
+    dict: Ticker to DataFrame of its bars. Tickers that returned no data are omitted.
+    """
+    return get_provider().download(tickers, start_str, end_str)
+
+
+def _needs_full_download(ticker, start_str, end_str):
+    """Return True if a ticker has no stored history that can serve or be topped up to the range."""
+    if not _use_price_store():
+        return True
+    # Only the JSON sidecar is needed to decide; the history itself is read later
+    meta = price_store.load_meta(ticker)
+    if not meta:
+        return True
+    if price_store.covers(meta, start_str, end_str):
+        return False
+    return PRICE_REFRESH_MODE != 'incremental'
+
+
+def _batch_download_into_store(tickers, start_str, end_str):
+    """
+    Download tickers that have no usable stored history in chunked multi-ticker requests.
+    
+    Each chunk is a single HTTP round-trip and a single wide DataFrame to parse,
+    instead of one Ticker.history call per symbol. Results are written to the
+    price store so the per-ticker path serves them as store hits; offline
+    providers (local, synthetic) are never persisted.
+    
+    Parameters:
+    tickers (list): Stock ticker symbols.
+    start_str (str): Start date in 'YYYY-MM-DD' format.
+    end_str (str): End date in 'YYYY-MM-DD' format (exclusive).
+    
+    Returns:
+    dict: Ticker to downloaded DataFrame for the tickers that succeeded.
+    """
+    chunk_size = max(1, int(BATCH_DOWNLOAD_CHUNK_SIZE))
+    use_store = _use_price_store()
+    downloaded = {}
+    
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        fetch_start = time.perf_counter()
+        try:
+            histories = _single_flight.do(
+                ('batch', tuple(sorted(t.upper() for t in chunk)), start_str, end_str),
+                _download_batch_history, chunk, start_str, end_str
+            )
+        except Exception as e:
+            # Leave the whole chunk to the per-ticker fallback
+            print(f"Warning: Batch download failed for {len(chunk)} tickers: {str(e)}")
+            continue
+        if not use_store:
+            downloaded.update(histories)
+            continue
+        fetch_seconds = time.perf_counter() - fetch_start
+        price_store.record_fetch(fetch_seconds)
+        
+        # Attribute the round-trip evenly so store hits report a realistic saving
+        per_ticker_seconds = fetch_seconds / max(1, len(histories))
+        for ticker, hist in histories.items():
+            stored, meta = price_store.load(ticker)
+            _store_downloaded_history(ticker, stored, meta, hist, start_str, end_str, per_ticker_seconds)
+            downloaded[ticker] = hist
+    
+    return downloaded
+
+
 @st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
 def get_ticker_info(ticker, field=None):
     """
     Get ticker info (company name, market cap, etc.) with caching.
     
+    Fields listed in INFO_FIELDS are served from the bulk info cache, which
+    fetches each ticker's info dict once for all of them. Other fields, and
+    field=None, fetch the full info dict.
+    
     Parameters:
     ticker (str): Stock ticker symbol.
     field (str, optional): Specific field to retrieve (e.g., 'longName', 'marketCap').
@@ -107,8 +389,11 @@ def get_ticker_info(ticker, field=None):
     dict or str: Ticker info dict or specific field value.
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        if field in INFO_FIELDS:
+            fields = _get_projected_info(ticker)
+            return fields.get(field) if fields is not None else None
+        
+        info = get_provider().info(ticker)
         
         if field:
             return info.get(field)
@@ -118,11 +403,98 @@ def get_ticker_info(ticker, field=None):
         return None
 
 
+@st.cache_data(ttl=INFO_CACHE_TTL, show_spinner=False)
+def get_ticker_info_bulk(tickers, fields=None):
+    """
+    Get projected info fields for many tickers at once.
+    
+    Each ticker's info dict is fetched at most once per INFO_CACHE_TTL (from
+    memory, the on-disk store, or the provider in parallel) and only the
+    INFO_FIELDS are kept.
+    
+    Parameters:
+    tickers (list): List of stock ticker symbols.
+    fields (list, optional): Subset of INFO_FIELDS to return. Defaults to all of them.
+    
+    Returns:
+    dict: Ticker to {field: value}. Tickers whose info could not be fetched map to None values.
+    """
+    fields = list(fields) if fields else list(INFO_FIELDS)
+    unique_tickers = list(dict.fromkeys(tickers))
+    
+    def _safe_projected_info(ticker):
+        try:
+            return _get_projected_info(ticker)
+        except Exception:
+            return None
+    
+    result = {}
+    if unique_tickers:
+        max_workers = min(10, len(unique_tickers))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            projected = dict(zip(unique_tickers, executor.map(_safe_projected_info, unique_tickers)))
+        for ticker in unique_tickers:
+            info = projected.get(ticker) or {}
+            result[ticker] = {f: info.get(f) for f in fields}
+    return result
+
+
+_info_memory = {}
+_info_memory_lock = threading.Lock()
+
+
+def _project_info(info):
+    """Keep only INFO_FIELDS with JSON-friendly values."""
+    fields = {}
+    for field in INFO_FIELDS:
+        value = info.get(field) if info else None
+        if value is not None and not isinstance(value, (str, int, float, bool)):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = str(value)
+        fields[field] = value
+    return fields
+
+
+def _get_projected_info(ticker):
+    """
+    Return the projected info fields for a ticker, fetching the info dict at most once per TTL.
+    
+    Lookup order: in-process memory, on-disk store, provider (single-flight).
+    
+    Returns:
+    dict or None: Field name to value, or None if the provider call failed.
+    """
+    key = str(ticker).upper()
+    now = time.time()
+    with _info_memory_lock:
+        entry = _info_memory.get(key)
+    if entry is not None and now - entry[0] <= INFO_CACHE_TTL:
+        return entry[1]
+    
+    fields = price_store.load_info(ticker, INFO_CACHE_TTL) if _use_price_store() else None
+    if fields is None:
+        try:
+            info = _single_flight.do(('info', key), get_provider().info, ticker)
+        except Exception:
+            return None
+        fields = _project_info(info)
+        if _use_price_store():
+            price_store.save_info(ticker, fields)
+    
+    with _info_memory_lock:
+        _info_memory[key] = (now, fields)
+    return fields
+
+
 @st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
 def get_multiple_tickers_history(tickers, start_date, end_date, max_retries=3, retry_delay=2):
     """
     Download historical stock data for multiple tickers with caching.
-    Uses get_ticker_history internally to leverage the cache.
+    Tickers that are not in the price store yet are downloaded with chunked
+    multi-ticker requests (see BATCH_DOWNLOAD_CHUNK_SIZE); everything else, and
+    any symbol a batch failed to return, uses get_ticker_history to leverage the cache.
     
     Parameters:
     tickers (list): List of stock ticker symbols.
@@ -132,26 +504,39 @@ def get_multiple_tickers_history(tickers, start_date, end_date, max_retries=3, r
     retry_delay (float): Delay between retries in seconds.
     
     Returns:
-    pd.DataFrame: Historical stock data with tickers as columns (Adj Close or Close).
+    pd.DataFrame: Historical stock data with tickers as columns (Adj Close or Close),
+                  indexed by tz-naive trading dates.
     """
     # Validate dates
     if not start_date or not end_date:
         raise ValueError("Start date and end date must be provided.")
     
+    start_str = str(start_date) if isinstance(start_date, str) else start_date.strftime('%Y-%m-%d')
+    end_str = str(end_date) if isinstance(end_date, str) else end_date.strftime('%Y-%m-%d')
+    
+    def _close_series(ticker, hist):
+        """Extract the close price Series from a history, on a tz-naive date index"""
+        # Get Adj Close, fallback to Close if not available
+        if 'Close' in hist.columns:
+            ticker_data = hist['Close'].copy()
+        elif 'Adj Close' in hist.columns:
+            ticker_data = hist['Adj Close'].copy()
+        else:
+            raise ValueError(f"No 'Close' or 'Adj Close' column found for {ticker}")
+        
+        # Batched and per-ticker downloads use different timezone conventions;
+        # align every ticker on plain trading dates
+        if getattr(ticker_data.index, 'tz', None) is not None:
+            ticker_data.index = ticker_data.index.tz_localize(None)
+        return ticker_data
+    
     # Helper function to download a single ticker
     def _download_single_ticker(ticker):
         """Download and process a single ticker"""
         try:
             # Use the cached function to get full history
             hist = get_ticker_history(ticker, start_date, end_date, max_retries, retry_delay)
-            
-            # Get Adj Close, fallback to Close if not available
-            if 'Close' in hist.columns:
-                ticker_data = hist['Close'].copy()
-            elif 'Adj Close' in hist.columns:
-                ticker_data = hist['Adj Close'].copy()
-            else:
-                raise ValueError(f"No 'Close' or 'Adj Close' column found for {ticker}")
+            ticker_data = _close_series(ticker, hist)
 
             if ticker_data is not None and len(ticker_data) > 0:
                 return ticker, ticker_data
@@ -162,23 +547,40 @@ def get_multiple_tickers_history(tickers, start_date, end_date, max_retries=3, r
             print(f"Warning: Failed to download data for {ticker}: {str(e)}")
             return ticker, None
     
-    # Download all tickers in parallel using ThreadPoolExecutor
-    # This is much faster than sequential downloads
     all_data = {}
-    max_workers = min(10, len(tickers))  # Increased from 5 to 10 for better performance
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all download tasks
-        future_to_ticker = {
-            executor.submit(_download_single_ticker, ticker): ticker 
-            for ticker in tickers
-        }
+    unique_tickers = list(dict.fromkeys(tickers))
+    
+    # Tickers with no usable stored history are fetched in chunked multi-ticker
+    # requests; stored ones go through get_ticker_history (store hit or top-up)
+    if BATCH_DOWNLOAD_ENABLED and len(unique_tickers) > 1:
+        batch_candidates = [t for t in unique_tickers if _needs_full_download(t, start_str, end_str)]
+        if len(batch_candidates) > 1:
+            for ticker, hist in _batch_download_into_store(batch_candidates, start_str, end_str).items():
+                try:
+                    ticker_data = _close_series(ticker, hist)
+                except ValueError:
+                    continue
+                if len(ticker_data) > 0:
+                    all_data[ticker] = ticker_data
+    
+    # Download the remaining tickers in parallel using ThreadPoolExecutor;
+    # this is also the retry path for symbols that failed in a batch
+    remaining = [t for t in unique_tickers if t not in all_data]
+    if remaining:
+        max_workers = min(10, len(remaining))  # Increased from 5 to 10 for better performance
         
-        # Process results as they complete
-        for future in as_completed(future_to_ticker):
-            ticker, ticker_data = future.result()
-            if ticker_data is not None:
-                all_data[ticker] = ticker_data
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Submit all download tasks
+            future_to_ticker = {
+                executor.submit(_download_single_ticker, ticker): ticker 
+                for ticker in remaining
+            }
+            
+            # Process results as they complete
+            for future in as_completed(future_to_ticker):
+                ticker, ticker_data = future.result()
+                if ticker_data is not None:
+                    all_data[ticker] = ticker_data
     
     if not all_data:
         raise ValueError("No data downloaded for any ticker")
@@ -207,3 +609,47 @@ def get_multiple_tickers_history(tickers, start_date, end_date, max_retries=3, r
     
     return result_df
 
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)  # Shared (not copied) so memoized views are reused
+def get_price_panel(tickers, start_date, end_date, max_retries=3, retry_delay=2):
+    """
+    Get the aligned close-price panel for a universe and date range.
+    
+    The panel is built once from get_multiple_tickers_history and shared by
+    the KPI, chart and optimizer code, which read its memoized derived views
+    (returns, validity masks) instead of re-cleaning the DataFrame.
+    
+    Parameters:
+    tickers (list): List of stock ticker symbols.
+    start_date (str): Start date for historical data.
+    end_date (str): End date for historical data.
+    max_retries (int): Maximum number of retry attempts per ticker.
+    retry_delay (float): Delay between retries in seconds.
+    
+    Returns:
+    PricePanel: Immutable price panel (tickers that failed to download are absent).
+    """
+    data = get_multiple_tickers_history(tickers, start_date, end_date, max_retries, retry_delay)
+    return PricePanel.from_frame(data)
+
+
+def get_price_store_stats():
+    """
+    Get hit/miss counters for the persistent price store.
+    
+    Returns:
+    dict: Counters (hits, misses, network_fetches, network_seconds, seconds_saved, hit_rate).
+    """
+    return price_store.get_store_stats()
+
+
+def get_single_flight_stats():
+    """
+    Get request coalescing counters for downloads in this process.
+    
+    Returns:
+    dict: 'issued' (loads actually executed), 'coalesced' (callers that waited
+          on an identical in-flight load) and 'in_flight' (loads running now).
+    """
+    return _single_flight.stats()
@@ -0,0 +1,215 @@
+"""
+Shared return and covariance estimation for the portfolio optimizers.
+
+MPT, Risk Parity and the other optimizers all start from the same stage:
+validate the price panel, clean daily returns, then estimate the mean vector
+and covariance matrix. That stage is done once here and memoized by the
+panel's content hash plus the estimator settings. The risk-free rate and the
+optimization method are not part of the key, so switching either only reruns
+the solve.
+"""
+import numpy as np
+import pandas as pd
+
+from config.settings import (
+    ESTIMATE_CACHE_SIZE, COVARIANCE_METHOD, COVARIANCE_EWMA_HALFLIFE, COVARIANCE_PCA_FACTORS
+)
+from utils.caching import LRUCache, read_only
+from utils.covariance import DenseCovariance, condition_covariance, estimate_covariance
+from utils.data_cache import get_price_panel
+
+# Minimum number of return rows required by the optimizers
+MIN_RETURN_OBSERVATIONS = 5
+
+# First diagonal loading tried (relative to the mean variance) when the
+# covariance matrix fails its Cholesky factorization
+COV_JITTER = 1e-10
+
+
+class MomentEstimates:
+    """
+    Cleaned returns and their first two moments for a set of tickers.
+
+    Attributes:
+    tickers (list): Ticker symbols, in the order of the arrays.
+    dates (pd.DatetimeIndex): Dates of the return rows.
+    returns (np.ndarray): (n_dates, n_assets) read-only cleaned daily returns.
+    mu (np.ndarray): Read-only mean daily returns.
+    cov (np.ndarray): Read-only daily covariance matrix (regularized if needed).
+    cov_model (DenseCovariance or FactorCovariance): The covariance in the
+        estimator's native (possibly factored) form, for matrix-vector products.
+    regularization (float): Ridge added to the covariance diagonal (0 if none).
+    cholesky (tuple or None): Lower Cholesky factor of cov as returned by
+        scipy.linalg.cho_factor, for solvers that solve with the full matrix.
+    """
+
+    def __init__(self, tickers, dates, returns, mu, cov, cov_model=None, regularization=0.0,
+                 cholesky=None):
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.returns = read_only(returns)
+        self.mu = read_only(mu)
+        self.cov = read_only(cov)
+        self.cov_model = cov_model if cov_model is not None else DenseCovariance(self.cov)
+        self.regularization = regularization
+        self.cholesky = cholesky
+
+    def __repr__(self):
+        return f"MomentEstimates({len(self.tickers)} assets, {len(self.dates)} observations)"
+
+    @property
+    def mean_returns(self):
+        """Mean daily returns as a Series indexed by ticker."""
+        return pd.Series(self.mu, index=self.tickers)
+
+    @property
+    def cov_matrix(self):
+        """Daily covariance matrix as a DataFrame indexed by ticker."""
+        return pd.DataFrame(self.cov, index=self.tickers, columns=self.tickers)
+
+    def returns_frame(self):
+        """Cleaned daily returns as a DataFrame (dates x tickers)."""
+        return pd.DataFrame(self.returns, index=self.dates, columns=self.tickers)
+
+
+def validate_panel(panel, tickers, start_date=None, end_date=None):
+    """
+    Check that a price panel has usable data for every requested ticker.
+
+    Parameters:
+    panel (PricePanel): Aligned close prices.
+    tickers (list): Tickers the optimizer needs.
+    start_date (str, optional): Start date (only used in error messages).
+    end_date (str, optional): End date (only used in error messages).
+
+    Returns:
+    PricePanel: The panel restricted to the requested tickers, in order.
+
+    Raises:
+    ValueError: If the panel is empty, too short or missing tickers.
+    """
+    if panel.values.size == 0:
+        raise ValueError(
+            "No price data returned. Check tickers and date range.\n"
+            f"Tickers: {tickers}\n"
+            f"Date range: {start_date} to {end_date}"
+        )
+
+    # Remove columns where ALL values are NaN (invalid tickers)
+    panel = panel.drop_empty_columns()
+    if panel.shape[1] == 0:
+        raise ValueError(
+            "All tickers have no price data in the selected date range.\n"
+            f"Tickers: {tickers}\n"
+            f"Date range: {start_date} to {end_date}\n"
+            "Please verify ticker symbols and ensure the date range contains trading days."
+        )
+
+    # Need at least 2 rows for returns
+    if panel.shape[0] < 2:
+        raise ValueError(
+            f"Not enough price rows to compute returns (need at least 2 trading days, got {panel.shape[0]}).\n"
+            f"Date range: {start_date} to {end_date}\n"
+            "Please widen the date range to include at least 2 trading days."
+        )
+
+    missing = [t for t in tickers if t not in panel.tickers]
+    if missing:
+        raise ValueError(
+            f"Missing data for tickers: {set(missing)}\n"
+            f"Available tickers in data: {list(panel.tickers)}\n"
+            "Please verify ticker symbols are correct."
+        )
+
+    return panel.select(tickers)
+
+
+def _estimator_settings(cov_method=None):
+    method = (cov_method or COVARIANCE_METHOD).strip().lower()
+    return (method, COVARIANCE_EWMA_HALFLIFE, COVARIANCE_PCA_FACTORS)
+
+
+def _compute_estimates(panel, tickers, settings):
+    returns = panel.clean_returns()
+    if returns.shape[0] < MIN_RETURN_OBSERVATIONS:
+        raise ValueError(
+            f"Insufficient valid return data after cleaning: {returns.shape[0]} rows "
+            f"(need at least {MIN_RETURN_OBSERVATIONS}).\n"
+            "Please widen the date range to include more trading days."
+        )
+
+    method, halflife, n_factors = settings
+    mu = returns.mean(axis=0)
+    cov_model = estimate_covariance(returns, method, halflife=halflife, n_factors=n_factors)
+    cov = np.array(cov_model.dense())
+
+    if not np.all(np.isfinite(mu)):
+        raise ValueError("Mean returns contain NaN or Inf values")
+    if np.all(mu == 0):
+        raise ValueError("All mean returns are zero")
+    if not np.all(np.isfinite(cov)):
+        raise ValueError("Covariance matrix contains NaN or Inf values")
+
+    cov, cholesky, regularization = condition_covariance(cov, jitter=COV_JITTER)
+    if isinstance(cov_model, DenseCovariance):
+        # Factor models are positive definite by construction (floored specific risk)
+        cov_model = DenseCovariance(cov, cov_model.method, cov_model.shrinkage)
+    return MomentEstimates(tickers, panel.dates, returns, mu, cov, cov_model, regularization, cholesky)
+
+
+_estimate_cache = LRUCache(ESTIMATE_CACHE_SIZE)
+
+
+def estimate_moments(panel, tickers, start_date=None, end_date=None, cov_method=None):
+    """
+    Validate a panel and estimate cleaned returns, mean vector and covariance.
+
+    Results are memoized by the panel's content hash, the ticker list and the
+    estimator settings, so every optimizer run on the same data shares one
+    estimation pass.
+
+    Parameters:
+    panel (PricePanel): Aligned close prices.
+    tickers (list): Tickers to estimate, in output order.
+    start_date (str, optional): Start date (only used in error messages).
+    end_date (str, optional): End date (only used in error messages).
+    cov_method (str, optional): Covariance estimator (see utils/covariance.py);
+                                defaults to COVARIANCE_METHOD.
+
+    Returns:
+    MomentEstimates: Shared, read-only estimates.
+    """
+    tickers = list(tickers)
+    panel = validate_panel(panel, tickers, start_date, end_date)
+    settings = _estimator_settings(cov_method)
+    key = (panel.fingerprint(), tuple(tickers), settings, COV_JITTER)
+    return _estimate_cache.get_or_compute(key, lambda: _compute_estimates(panel, tickers, settings))
+
+
+def get_moment_estimates(tickers, start_date, end_date, cov_method=None):
+    """
+    Estimate returns and covariance for a universe and date range.
+
+    Uses the shared price panel (get_price_panel), then estimate_moments().
+
+    Parameters:
+    tickers (list): List of stock ticker symbols.
+    start_date (str): Start date for historical data.
+    end_date (str): End date for historical data.
+    cov_method (str, optional): Covariance estimator; defaults to COVARIANCE_METHOD.
+
+    Returns:
+    MomentEstimates: Shared, read-only estimates.
+    """
+    panel = get_price_panel(tickers, start_date, end_date)
+    return estimate_moments(panel, tickers, start_date, end_date, cov_method)
+
+
+def get_estimate_cache_stats():
+    """Return hit/miss counts and size of the estimation cache."""
+    return _estimate_cache.stats()
+
+
+def clear_estimate_cache():
+    """Drop all memoized estimates."""
+    _estimate_cache.clear()
@@ -0,0 +1,428 @@
+"""
+Technical indicators: full-series helpers and incremental (streaming) state.
+
+The series helpers compute whole indicator series at once. The state classes
+are seeded once from history and then updated in O(1) per bar: KPIState
+backs the KPI table (create_kpi_states / update_kpi_states in
+utils/kpi_calculator.py) and ChartState backs the charts in
+utils/visualizations.py, which the app keeps per ticker so a rerun only
+processes bars added since the last one. Each state supports update() for a
+new bar and revise() to replace the latest (still forming) bar.
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+def rsi_series(close, window=14, method='sma'):
+    """
+    Relative Strength Index series.
+
+    Parameters:
+    close (pd.Series): Close prices.
+    window (int): Look-back window.
+    method (str): 'sma' for simple moving averages of gains/losses (used by the
+                  KPI table), 'wilder' for Wilder's smoothing.
+
+    Returns:
+    pd.Series: RSI values (NaN until the window is filled).
+    """
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    if method == 'wilder':
+        avg_gain = gain.ewm(alpha=1.0 / window, adjust=False, min_periods=window).mean()
+        avg_loss = loss.ewm(alpha=1.0 / window, adjust=False, min_periods=window).mean()
+    else:
+        avg_gain = gain.rolling(window=window).mean()
+        avg_loss = loss.rolling(window=window).mean()
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+def bollinger_series(close, window=20, num_std=2):
+    """
+    Bollinger Bands series.
+
+    Returns:
+    tuple: (middle, upper, lower) pd.Series.
+    """
+    middle = close.rolling(window=window).mean()
+    std = close.rolling(window=window).std()
+    return middle, middle + num_std * std, middle - num_std * std
+
+
+def macd_series(close, fast=12, slow=26, signal=9):
+    """
+    MACD and signal line series (EWMs with adjust=False).
+
+    Returns:
+    tuple: (macd, signal) pd.Series.
+    """
+    ema_fast = close.ewm(span=fast, adjust=False).mean()
+    ema_slow = close.ewm(span=slow, adjust=False).mean()
+    macd = ema_fast - ema_slow
+    return macd, macd.ewm(span=signal, adjust=False).mean()
+
+
+class _EWMState:
+    """Exponentially weighted mean with adjust=False semantics (seeded by the first value)."""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = None
+        self._previous = None
+
+    def update(self, x):
+        self._previous = self.value
+        self.value = x if self.value is None else self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+    def revise(self, x):
+        if self._previous is None:
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1.0 - self.alpha) * self._previous
+        return self.value
+
+
+class RSIState:
+    """
+    Incremental RSI.
+
+    method='sma' keeps running sums of gains and losses over the window (same
+    values as rsi_series and the KPI table); method='wilder' uses Wilder's
+    recursive smoothing.
+    """
+
+    def __init__(self, window=14, method='sma'):
+        if method not in ('sma', 'wilder'):
+            raise ValueError(f"Unknown RSI method '{method}'")
+        self.window = window
+        self.method = method
+        self.last_price = None
+        self._prev_price = None
+        self._count = 0
+        # SMA: window of (gain, loss) pairs and their running sums
+        self._moves = deque(maxlen=window)
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        # Wilder: smoothed averages and the values before the latest bar
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._wilder_prev = (0.0, 0.0)
+
+    @classmethod
+    def from_history(cls, prices, window=14, method='sma'):
+        state = cls(window, method)
+        for price in prices:
+            state.update(float(price))
+        return state
+
+    def _move(self, price, previous):
+        # The first bar has no previous price and counts as a zero move, as in pandas
+        delta = 0.0 if previous is None else price - previous
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def update(self, price):
+        """Append a new bar and return the current RSI."""
+        gain, loss = self._move(price, self.last_price)
+        self._prev_price = self.last_price
+        self.last_price = price
+        self._count += 1
+
+        if self.method == 'sma':
+            if len(self._moves) == self.window:
+                old_gain, old_loss = self._moves[0]
+                self._gain_sum -= old_gain
+                self._loss_sum -= old_loss
+            self._moves.append((gain, loss))
+            self._gain_sum += gain
+            self._loss_sum += loss
+        else:
+            self._wilder_prev = (self._avg_gain, self._avg_loss)
+            self._apply_wilder(gain, loss)
+        return self.value
+
+    def revise(self, price):
+        """Replace the latest bar's price (intraday update) and return the current RSI."""
+        if self.last_price is None:
+            return self.update(price)
+        gain, loss = self._move(price, self._prev_price)
+        self.last_price = price
+
+        if self.method == 'sma':
+            old_gain, old_loss = self._moves[-1]
+            self._moves[-1] = (gain, loss)
+            self._gain_sum += gain - old_gain
+            self._loss_sum += loss - old_loss
+        else:
+            self._avg_gain, self._avg_loss = self._wilder_prev
+            self._apply_wilder(gain, loss)
+        return self.value
+
+    def _apply_wilder(self, gain, loss):
+        # Wilder smoothing is an EWM with alpha = 1/window, seeded by the first move
+        if self._count == 1:
+            self._avg_gain, self._avg_loss = gain, loss
+        else:
+            alpha = 1.0 / self.window
+            self._avg_gain += alpha * (gain - self._avg_gain)
+            self._avg_loss += alpha * (loss - self._avg_loss)
+
+    @property
+    def value(self):
+        if self._count < self.window:
+            return np.nan
+        if self.method == 'sma':
+            avg_gain, avg_loss = self._gain_sum / self.window, self._loss_sum / self.window
+        else:
+            avg_gain, avg_loss = self._avg_gain, self._avg_loss
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else np.nan
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+class BollingerState:
+    """
+    Incremental Bollinger Bands from a rolling sum and sum of squares.
+
+    Prices are shifted by the first seen price before squaring to limit
+    cancellation error, and the sums are rebuilt from the window periodically
+    so rounding drift cannot accumulate over long intraday sessions.
+    """
+
+    _REBUILD_EVERY = 1000
+
+    def __init__(self, window=20, num_std=2):
+        self.window = window
+        self.num_std = num_std
+        self._prices = deque(maxlen=window)
+        self._shift = None
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._updates = 0
+
+    @classmethod
+    def from_history(cls, prices, window=20, num_std=2):
+        state = cls(window, num_std)
+        for price in prices:
+            state.update(float(price))
+        return state
+
+    def _add(self, price, sign):
+        x = price - self._shift
+        self._sum += sign * x
+        self._sum_sq += sign * x * x
+
+    def update(self, price):
+        """Append a new bar and return (middle, upper, lower)."""
+        if self._shift is None:
+            self._shift = price
+        if len(self._prices) == self.window:
+            self._add(self._prices[0], -1)
+        self._prices.append(price)
+        self._add(price, +1)
+        self._updates += 1
+        if self._updates % self._REBUILD_EVERY == 0:
+            self._rebuild()
+        return self.value
+
+    def revise(self, price):
+        """Replace the latest bar's price and return (middle, upper, lower)."""
+        if not self._prices:
+            return self.update(price)
+        self._add(self._prices[-1], -1)
+        self._prices[-1] = price
+        self._add(price, +1)
+        return self.value
+
+    def _rebuild(self):
+        self._shift = self._prices[-1]
+        shifted = np.asarray(self._prices, dtype=np.float64) - self._shift
+        self._sum = float(shifted.sum())
+        self._sum_sq = float((shifted * shifted).sum())
+
+    @property
+    def value(self):
+        n = len(self._prices)
+        if n < self.window:
+            return np.nan, np.nan, np.nan
+        mean_shifted = self._sum / n
+        var = max((self._sum_sq - n * mean_shifted * mean_shifted) / (n - 1), 0.0)
+        middle = mean_shifted + self._shift
+        band = self.num_std * np.sqrt(var)
+        return middle, middle + band, middle - band
+
+
+class MACDState:
+    """Incremental MACD and signal line (EWMs with adjust=False)."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self._fast = _EWMState(fast)
+        self._slow = _EWMState(slow)
+        self._signal = _EWMState(signal)
+
+    @classmethod
+    def from_history(cls, prices, fast=12, slow=26, signal=9):
+        state = cls(fast, slow, signal)
+        for price in prices:
+            state.update(float(price))
+        return state
+
+    def update(self, price):
+        """Append a new bar and return (macd, signal)."""
+        macd = self._fast.update(price) - self._slow.update(price)
+        return macd, self._signal.update(macd)
+
+    def revise(self, price):
+        """Replace the latest bar's price and return (macd, signal)."""
+        macd = self._fast.revise(price) - self._slow.revise(price)
+        return macd, self._signal.revise(macd)
+
+    @property
+    def value(self):
+        if self._fast.value is None:
+            return np.nan, np.nan
+        return self._fast.value - self._slow.value, self._signal.value
+
+
+class KPIState:
+    """RSI, Bollinger Bands and MACD state for one ticker, updated together."""
+
+    def __init__(self, rsi_window=14, bollinger_window=20, fast=12, slow=26, signal=9, rsi_method='sma'):
+        self.rsi = RSIState(rsi_window, rsi_method)
+        self.bollinger = BollingerState(bollinger_window)
+        self.macd = MACDState(fast, slow, signal)
+        self.last_price = None
+
+    @classmethod
+    def from_history(cls, prices, **kwargs):
+        state = cls(**kwargs)
+        for price in np.asarray(prices, dtype=np.float64):
+            state.update(float(price))
+        return state
+
+    def update(self, price):
+        """Append a new bar for all indicators."""
+        self.last_price = price
+        self.rsi.update(price)
+        self.bollinger.update(price)
+        self.macd.update(price)
+
+    def revise(self, price):
+        """Replace the latest bar's price for all indicators."""
+        self.last_price = price
+        self.rsi.revise(price)
+        self.bollinger.revise(price)
+        self.macd.revise(price)
+
+    def snapshot(self):
+        """Current values in the layout used by calculate_kpis."""
+        middle, upper, lower = self.bollinger.value
+        macd, signal = self.macd.value
+        return {
+            'RSI': self.rsi.value,
+            'Bollinger Bands': {
+                'Middle Band': middle,
+                'Upper Band': upper,
+                'Lower Band': lower,
+                'Current Price': self.last_price
+            },
+            'MACD': {
+                'MACD': macd,
+                'Signal Line': signal
+            }
+        }
+
+
+class ChartState:
+    """
+    Indicator series for the charts in utils/visualizations.py, kept up to date bar by bar.
+
+    Seeded once by replaying a close price history through a KPIState; each
+    update() then appends one bar in O(1) (revise() replaces the latest,
+    still forming bar) and records the indicator values, so the chart traces
+    are built from these buffers instead of recomputing the whole series.
+    """
+
+    COLUMNS = ('Close', 'RSI', 'Middle Band', 'Upper Band', 'Lower Band', 'MACD', 'Signal Line')
+
+    def __init__(self, **kwargs):
+        self.kpi = KPIState(**kwargs)
+        self.dates = []
+        self._rows = []
+
+    @classmethod
+    def from_history(cls, close, **kwargs):
+        """
+        Seed from a close price series.
+
+        Parameters:
+        close (pd.Series): Close prices indexed by date (NaN entries are skipped).
+        **kwargs: Indicator parameters passed to KPIState.
+        """
+        state = cls(**kwargs)
+        close = close.dropna()
+        for date, price in zip(close.index, close.to_numpy(dtype=np.float64)):
+            state.update(float(price), date)
+        return state
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _row(self):
+        middle, upper, lower = self.kpi.bollinger.value
+        macd, signal = self.kpi.macd.value
+        return (self.kpi.last_price, self.kpi.rsi.value, middle, upper, lower, macd, signal)
+
+    def update(self, price, date):
+        """Append a new bar and record its indicator values."""
+        self.kpi.update(price)
+        self.dates.append(date)
+        self._rows.append(self._row())
+
+    def revise(self, price):
+        """Replace the latest bar's price and its indicator values."""
+        self.kpi.revise(price)
+        self._rows[-1] = self._row()
+
+    def continues(self, close):
+        """
+        True if close extends the seeded history: same first bar, and the bars
+        up to the last recorded one are all present (only later bars are new).
+        """
+        close = close.dropna()
+        if not self.dates or close.empty or close.index[0] != self.dates[0]:
+            return False
+        n = len(self.dates)
+        return len(close) >= n and close.index[n - 1] == self.dates[-1]
+
+    def extend(self, close):
+        """
+        Apply the bars of close that are newer than the recorded ones.
+
+        The latest recorded bar is revised if its price changed (intraday), then
+        later bars are appended. Call continues(close) first.
+
+        Parameters:
+        close (pd.Series): Close prices indexed by date.
+
+        Returns:
+        int: Number of bars appended.
+        """
+        close = close.dropna()
+        last_date = self.dates[-1]
+        if last_date in close.index:
+            price = float(close[last_date])
+            if price != self.kpi.last_price:
+                self.revise(price)
+        newer = close[close.index > last_date]
+        for date, price in zip(newer.index, newer.to_numpy(dtype=np.float64)):
+            self.update(float(price), date)
+        return len(newer)
+
+    def frame(self):
+        """Recorded bars and indicator values as a DataFrame (columns COLUMNS)."""
+        return pd.DataFrame(self._rows, index=pd.DatetimeIndex(self.dates), columns=list(self.COLUMNS))
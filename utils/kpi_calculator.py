@@ -1,12 +1,12 @@
 """
 KPI calculation functions for stock analysis
 """
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import time
+from scipy.signal import lfilter
 from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout, RequestException
-from utils.data_cache import get_ticker_history, get_ticker_info as get_ticker_info_cached, get_multiple_tickers_history as get_multiple_tickers_history_cached
+from utils.data_cache import get_ticker_info_bulk, get_price_panel
+from utils.indicators import KPIState
 
 # Try to import streamlit for caching (optional - if not available, caching won't work)
 try:
@@ -22,27 +22,241 @@ except ImportError:
     st = type('obj', (object,), {'cache_data': cache_data})()
 
 
+RSI_WINDOW = 14
+BOLLINGER_WINDOW = 20
+MACD_FAST_SPAN = 12
+MACD_SLOW_SPAN = 26
+MACD_SIGNAL_SPAN = 9
+
+# Relative tolerance of the latest-value path versus the full-series path.
+# RSI and Bollinger Bands are exact on their trailing windows; the MACD EWMs
+# are seeded from a warm-up tail long enough that the seed's influence has
+# decayed below this fraction of the price move over the tail.
+KPI_LATEST_TOLERANCE = 1e-8
+
+KPI_TABLE_COLUMNS = [
+    'Price', 'RSI', 'BB Middle', 'BB Upper', 'BB Lower', 'MACD', 'Signal Line', 'Observations'
+]
+
+
+def _bottom_align(values):
+    """
+    Push each column's valid prices to the bottom of the array, keeping their order.
+    
+    This reproduces per-ticker dropna() for every column at once: after
+    alignment, column j holds its valid prices in rows start[j]..T-1 and NaN
+    padding above, so windowed indicators can run over the whole 2-D block.
+    
+    Returns:
+    tuple: (aligned array, start row per column)
+    """
+    n_rows = values.shape[0]
+    valid = np.isfinite(values)
+    # Stable sort puts invalid rows (False) first and keeps valid rows in date order
+    order = np.argsort(valid, axis=0, kind='stable')
+    aligned = np.take_along_axis(values, order, axis=0)
+    start = n_rows - valid.sum(axis=0)
+    aligned[np.arange(n_rows)[:, None] < start[None, :]] = np.nan
+    return aligned, start
+
+
+def _window_valid(n_rows, start, window):
+    """Mask of rows whose trailing window lies entirely within each column's valid rows."""
+    return (np.arange(n_rows)[:, None] - (window - 1)) >= start[None, :]
+
+
+def _rolling_sum(values, window):
+    """Trailing rolling sum along axis 0 via cumulative sums (NaN treated as 0)."""
+    csum = np.cumsum(np.nan_to_num(values, nan=0.0), axis=0)
+    result = csum.copy()
+    result[window:] -= csum[:-window]
+    return result
+
+
+def _rolling_mean_std(values, start, window):
+    """Rolling mean and sample std (ddof=1), NaN where the window is incomplete."""
+    n_rows = values.shape[0]
+    # Center each column before summing squares to limit cancellation error
+    counts = np.isfinite(values).sum(axis=0)
+    center = np.nansum(values, axis=0) / np.maximum(counts, 1)
+    shifted = values - center
+    s1 = _rolling_sum(shifted, window)
+    s2 = _rolling_sum(shifted * shifted, window)
+    mean = s1 / window + center
+    var = np.maximum((s2 - s1 * s1 / window) / (window - 1), 0.0)
+    invalid = ~_window_valid(n_rows, start, window)
+    mean[invalid] = np.nan
+    var[invalid] = np.nan
+    return mean, np.sqrt(var)
+
+
+def _ewm(values, start, span):
+    """
+    Exponentially weighted mean along axis 0, matching pandas ewm(span, adjust=False).
+    
+    The padding above each column's first valid value is filled with that value,
+    which leaves the recursion at its seed until the real data starts.
+    """
+    alpha = 2.0 / (span + 1.0)
+    n_rows, n_cols = values.shape
+    cols = np.arange(n_cols)
+    first = values[np.minimum(start, n_rows - 1), cols] if n_rows else np.zeros(n_cols)
+    first = np.nan_to_num(first, nan=0.0)
+    filled = np.where(np.arange(n_rows)[:, None] < start[None, :], first[None, :], values)
+    filled = np.nan_to_num(filled, nan=0.0)
+    zi = ((1.0 - alpha) * first)[None, :]
+    result, _ = lfilter([alpha], [1.0, -(1.0 - alpha)], filled, axis=0, zi=zi)
+    result[np.arange(n_rows)[:, None] < start[None, :]] = np.nan
+    return result
+
+
+def compute_indicator_series(values):
+    """
+    Compute RSI, Bollinger Bands and MACD series for every column of a price block.
+    
+    Each column is treated like its own dropna()'d price series; outputs are
+    aligned to the bottom (last row = latest value for every ticker).
+    
+    Parameters:
+    values (np.ndarray): (n_dates, n_tickers) prices, NaN where missing.
+    
+    Returns:
+    dict: Indicator name to (n_dates, n_tickers) array, plus 'start' (first valid row per column).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_rows = values.shape[0]
+    aligned, start = _bottom_align(values)
+    
+    # RSI (simple moving average of gains and losses, as in plot_rsi)
+    delta = np.full_like(aligned, np.nan)
+    delta[1:] = aligned[1:] - aligned[:-1]
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    # The first delta of each column is NaN and counts as a zero gain/loss, as in pandas
+    rsi_valid = _window_valid(n_rows, start, RSI_WINDOW)
+    avg_gain = _rolling_sum(gain, RSI_WINDOW) / RSI_WINDOW
+    avg_loss = _rolling_sum(loss, RSI_WINDOW) / RSI_WINDOW
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        rsi = 100.0 - (100.0 / (1.0 + rs))
+    rsi[~rsi_valid] = np.nan
+    
+    # Bollinger Bands
+    middle, std = _rolling_mean_std(aligned, start, BOLLINGER_WINDOW)
+    
+    # MACD
+    ema_fast = _ewm(aligned, start, MACD_FAST_SPAN)
+    ema_slow = _ewm(aligned, start, MACD_SLOW_SPAN)
+    macd = ema_fast - ema_slow
+    signal = _ewm(macd, start, MACD_SIGNAL_SPAN)
+    
+    return {
+        'Price': aligned,
+        'RSI': rsi,
+        'BB Middle': middle,
+        'BB Upper': middle + 2 * std,
+        'BB Lower': middle - 2 * std,
+        'MACD': macd,
+        'Signal Line': signal,
+        'start': start,
+    }
+
+
+def latest_tail_length(tolerance=KPI_LATEST_TOLERANCE):
+    """
+    Number of trailing bars needed to reproduce the latest indicator values.
+    
+    An adjust=False EWM started k bars before the end differs from the full
+    series by (1 - alpha)^k times the seed error, so the slow EMA needs
+    log(tol) / log(1 - alpha_slow) bars and the signal line a further
+    log(tol) / log(1 - alpha_signal) bars on top of that.
+    
+    Parameters:
+    tolerance (float): Relative tolerance for the MACD and signal line values.
+    
+    Returns:
+    int: Tail length in bars (independent of the history length).
+    """
+    def _warmup(span):
+        alpha = 2.0 / (span + 1.0)
+        return int(np.ceil(np.log(tolerance) / np.log(1.0 - alpha)))
+    
+    ewm_tail = _warmup(MACD_SLOW_SPAN) + _warmup(MACD_SIGNAL_SPAN)
+    return max(ewm_tail, RSI_WINDOW + 1, BOLLINGER_WINDOW)
+
+
+def compute_kpi_table(panel, latest_only=False, tolerance=KPI_LATEST_TOLERANCE):
+    """
+    Compute the latest RSI, Bollinger Bands and MACD values for every ticker in a panel.
+    
+    All indicators are computed in one vectorized pass over the 2-D price block
+    instead of per-ticker pandas rolling/ewm chains.
+    
+    With latest_only=True only the trailing latest_tail_length(tolerance) rows
+    are processed, so the cost no longer grows with the history length. RSI
+    and Bollinger Bands are then identical to the full path; MACD and the
+    signal line agree within `tolerance` relative to the price move over the
+    tail. Each ticker uses its own last R valid bars, so stale tickers or
+    tickers with gaps keep a full warm-up; tickers with fewer valid bars than
+    the tail are computed exactly.
+    
+    Parameters:
+    panel (PricePanel): Aligned close prices.
+    latest_only (bool): Use the trailing-window fast path.
+    tolerance (float): Relative tolerance for the fast path MACD values.
+    
+    Returns:
+    pd.DataFrame: One row per ticker with columns KPI_TABLE_COLUMNS.
+    """
+    n_rows = panel.values.shape[0]
+    if n_rows == 0:
+        return pd.DataFrame(index=panel.tickers, columns=KPI_TABLE_COLUMNS, dtype=float)
+    
+    values = panel.values
+    if latest_only:
+        tail = latest_tail_length(tolerance)
+        values = values[-tail:]
+        # The last R rows hold each ticker's last R valid bars only if it has no
+        # gaps there; stale or gappy tickers take their trailing R valid bars
+        gappy = ~np.isfinite(values).all(axis=0)
+        if gappy.any():
+            values = values.copy()
+            aligned, _ = _bottom_align(panel.values[:, gappy])
+            values[:, gappy] = aligned[-tail:]
+    
+    series = compute_indicator_series(values)
+    table = pd.DataFrame(
+        {name: series[name][-1] for name in KPI_TABLE_COLUMNS if name != 'Observations'},
+        index=panel.tickers
+    )
+    table['Observations'] = panel.valid_counts()
+    return table[KPI_TABLE_COLUMNS]
+
+
 @st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
-def calculate_kpis(tickers, start_date, end_date):
+def calculate_kpis(tickers, start_date, end_date, latest_only=True):
     """
     Calculate KPIs for a list of stocks over a given time period.
-    Uses get_multiple_tickers_history_cached() to download all tickers at once for better performance.
+    Uses the shared price panel (get_price_panel) so all tickers are downloaded once
+    and the aligned price block is reused by charts and optimizers.
     Cached to improve performance and reduce API calls.
 
     Parameters:
     tickers (list): A list of stock ticker symbols.
     start_date (str): The start date for the analysis.
     end_date (str): The end date for the analysis.
+    latest_only (bool): Compute the current values from the trailing window only
+                        (see compute_kpi_table); False runs the full-series path.
 
     Returns:
     dict: A dictionary containing the KPIs for each stock.
     """
     kpi_data = {}
     
-    # Download all tickers at once using get_multiple_tickers_history_cached()
+    # Get the shared price panel for all tickers at once
     # This is more efficient than downloading each ticker separately
     try:
-        all_data = get_multiple_tickers_history_cached(tickers, start_date, end_date)
+        panel = get_price_panel(tickers, start_date, end_date)
     except (RequestsConnectionError, Timeout, RequestException) as e:
         error_msg = (
             f"Connection error downloading data: {str(e)}\n"
@@ -55,44 +269,39 @@ def calculate_kpis(tickers, start_date, end_date):
         print(error_msg)
         raise Exception(error_msg) from e
     
-    if all_data.empty:
+    if panel.values.size == 0:
         return kpi_data
     
-    # Process each ticker from the combined DataFrame
+    # Fetch EPS and beta for every ticker in one bulk info lookup
+    ticker_info = get_ticker_info_bulk(tickers, ['trailingEps', 'beta'])
+    
+    # Compute RSI, Bollinger Bands and MACD for all tickers in one vectorized pass
+    kpi_table = compute_kpi_table(panel, latest_only=latest_only)
+    
+    # Assemble the per-ticker KPI dictionaries
     for ticker in tickers:
         try:
             # Skip if ticker not in the downloaded data
-            if ticker not in all_data.columns:
+            if ticker not in panel.tickers:
                 continue
             
-            # Get the Close prices for this ticker (as a Series)
-            data_series = all_data[ticker].dropna()
-            
-            if data_series.empty or len(data_series) < 14:
+            row = kpi_table.loc[ticker]
+            if row['Observations'] < RSI_WINDOW:
                 continue
                 
             kpi_data[ticker] = {}
+            current_price = row['Price']
+
+            kpi_data[ticker]['RSI'] = row['RSI']
 
-            # Calculate RSI
-            delta = data_series.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            kpi_data[ticker]['RSI'] = rsi.iloc[-1] if not rsi.empty else None
-
-            # Calculate Bollinger Bands
-            middle_band = data_series.rolling(window=20).mean()
-            upper_band = middle_band + 2 * data_series.rolling(window=20).std()
-            lower_band = middle_band - 2 * data_series.rolling(window=20).std()
             kpi_data[ticker]['Bollinger Bands'] = {
-                'Middle Band': middle_band.iloc[-1] if not middle_band.empty else None,
-                'Upper Band': upper_band.iloc[-1] if not upper_band.empty else None,
-                'Lower Band': lower_band.iloc[-1] if not lower_band.empty else None,
-                'Current Price': data_series.iloc[-1] if not data_series.empty else None
+                'Middle Band': row['BB Middle'],
+                'Upper Band': row['BB Upper'],
+                'Lower Band': row['BB Lower'],
+                'Current Price': current_price
             }
 
-            # Calculate P/E Ratio - use cached ticker info function
+            # Calculate P/E Ratio - use bulk ticker info
             # EPS (Earnings Per Share) represents the company's profit per share.
             # Formula: EPS = Net Income / Number of Outstanding Shares
             # Example:
@@ -100,30 +309,25 @@ def calculate_kpis(tickers, start_date, end_date):
             # EPS = 100 / 50 = 2
             # This value is commonly used to calculate the P/E ratio (Price / EPS).
             try:
-                eps = get_ticker_info_cached(ticker, 'trailingEps')
+                eps = ticker_info.get(ticker, {}).get('trailingEps')
                 if eps and eps != 0:
-                    pe_ratio = data_series.iloc[-1] / eps
+                    pe_ratio = current_price / eps
                     kpi_data[ticker]['P/E Ratio'] = pe_ratio
                 else:
                     kpi_data[ticker]['P/E Ratio'] = None
             except Exception:
                 kpi_data[ticker]['P/E Ratio'] = None
 
-            # Calculate Beta - use cached ticker info function
+            # Calculate Beta - use bulk ticker info
             try:
-                beta = get_ticker_info_cached(ticker, 'beta')
+                beta = ticker_info.get(ticker, {}).get('beta')
                 kpi_data[ticker]['Beta'] = beta
             except Exception:
                 kpi_data[ticker]['Beta'] = None
 
-            # Calculate MACD
-            ema_12 = data_series.ewm(span=12, adjust=False).mean()
-            ema_26 = data_series.ewm(span=26, adjust=False).mean()
-            macd = ema_12 - ema_26
-            signal = macd.ewm(span=9, adjust=False).mean()
             kpi_data[ticker]['MACD'] = {
-                'MACD': macd.iloc[-1] if not macd.empty else None,
-                'Signal Line': signal.iloc[-1] if not signal.empty else None
+                'MACD': row['MACD'],
+                'Signal Line': row['Signal Line']
             }
             
         except Exception as e:
@@ -148,13 +352,78 @@ def get_beta_values(tickers, start_date, end_date):
     dict: Dictionary of ticker to beta value mappings.
     """
     betas = {}
+    # Use the bulk info cache - one info fetch per ticker for all fields
+    ticker_info = get_ticker_info_bulk(tickers, ['beta'])
     for ticker in tickers:
-        try:
-            # Use centralized cached function for ticker info
-            beta = get_ticker_info_cached(ticker, 'beta')
-            if beta is not None:
-                betas[ticker] = beta
-        except Exception:
-            continue
+        beta = ticker_info.get(ticker, {}).get('beta')
+        if beta is not None:
+            betas[ticker] = beta
     return betas
 
+
+
+def create_kpi_states(tickers, start_date, end_date):
+    """
+    Seed incremental indicator state for each ticker from its price history.
+    
+    Only the trailing latest_tail_length() bars are replayed, which reproduces
+    the calculate_kpis values (MACD within KPI_LATEST_TOLERANCE). Afterwards
+    update_kpi_states() refreshes the KPIs in O(1) per ticker.
+    
+    Parameters:
+    tickers (list): A list of stock ticker symbols.
+    start_date (str): Start date for the seeding history.
+    end_date (str): End date for the seeding history.
+    
+    Returns:
+    dict: Ticker to KPIState (tickers without enough history are omitted).
+    """
+    panel = get_price_panel(tickers, start_date, end_date)
+    tail = latest_tail_length()
+    states = {}
+    for ticker in tickers:
+        if ticker not in panel.tickers:
+            continue
+        prices = panel.column(ticker).to_numpy()
+        if len(prices) < RSI_WINDOW:
+            continue
+        states[ticker] = KPIState.from_history(
+            prices[-tail:],
+            rsi_window=RSI_WINDOW,
+            bollinger_window=BOLLINGER_WINDOW,
+            fast=MACD_FAST_SPAN,
+            slow=MACD_SLOW_SPAN,
+            signal=MACD_SIGNAL_SPAN
+        )
+    return states
+
+
+def update_kpi_states(states, latest_prices, new_bar=False):
+    """
+    Apply the latest prices to seeded KPI states and return the KPIs.
+    
+    Parameters:
+    states (dict): Ticker to KPIState, from create_kpi_states().
+    latest_prices (dict): Ticker to latest price. Tickers without a price keep their values.
+    new_bar (bool): True when the prices open a new bar (e.g. the next trading day);
+                    False to revise the current bar with an intraday price.
+    
+    Returns:
+    dict: KPIs in the calculate_kpis layout (P/E Ratio and Beta from the bulk info cache).
+    """
+    ticker_info = get_ticker_info_bulk(list(states), ['trailingEps', 'beta'])
+    kpi_data = {}
+    for ticker, state in states.items():
+        price = latest_prices.get(ticker)
+        if price is not None and np.isfinite(price):
+            if new_bar:
+                state.update(float(price))
+            else:
+                state.revise(float(price))
+        
+        kpi_data[ticker] = state.snapshot()
+        info = ticker_info.get(ticker, {})
+        eps = info.get('trailingEps')
+        kpi_data[ticker]['P/E Ratio'] = state.last_price / eps if eps else None
+        kpi_data[ticker]['Beta'] = info.get('beta')
+    return kpi_data
@@ -0,0 +1,268 @@
+"""
+Market data providers used by utils/data_cache.
+
+A provider supplies raw daily histories and ticker info. data_cache keeps the
+retry, price store, batching and request coalescing logic on top of whichever
+provider is active, so the app and benchmarks can run against yfinance, a
+directory of recorded histories, or a deterministic synthetic generator.
+"""
+import os
+import json
+import zlib
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from config.settings import MARKET_DATA_PROVIDER, MARKET_DATA_DIR
+
+
+class YFinanceProvider:
+    """Live data from Yahoo Finance via yfinance."""
+
+    name = 'yfinance'
+    # Network data is worth persisting in the on-disk price store
+    use_price_store = True
+
+    def history(self, ticker, start_str, end_str):
+        """
+        Download daily bars for one ticker in [start_str, end_str).
+
+        Returns:
+        pd.DataFrame: Open, High, Low, Close, Volume columns (may be empty).
+        """
+        import yfinance as yf
+        stock = yf.Ticker(ticker)
+        try:
+            return stock.history(start=start_str, end=end_str, auto_adjust=True)
+        except Exception:
+            # Try without auto_adjust if that fails
+            return stock.history(start=start_str, end=end_str)
+
+    def download(self, tickers, start_str, end_str):
+        """
+        Download daily bars for several tickers in one multi-ticker request.
+
+        Returns:
+        dict: Ticker to DataFrame. Tickers that returned no data are omitted.
+        """
+        import yfinance as yf
+        wide = yf.download(
+            tickers,
+            start=start_str,
+            end=end_str,
+            group_by='ticker',
+            auto_adjust=True,
+            threads=True,
+            progress=False
+        )
+        if wide is None or wide.empty:
+            return {}
+
+        histories = {}
+        if isinstance(wide.columns, pd.MultiIndex):
+            available = set(wide.columns.get_level_values(0))
+            for ticker in tickers:
+                if ticker not in available:
+                    continue
+                hist = wide[ticker].dropna(how='all')
+                if not hist.empty:
+                    histories[ticker] = hist
+        elif len(tickers) == 1:
+            # Older yfinance versions return flat columns for a single ticker
+            hist = wide.dropna(how='all')
+            if not hist.empty:
+                histories[tickers[0]] = hist
+
+        return histories
+
+    def info(self, ticker):
+        """Return the yfinance info dict for a ticker."""
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+
+class LocalProvider:
+    """
+    Recorded histories read from a directory.
+
+    Each ticker is one file named after the ticker (CSV with a Date column,
+    Parquet or pickle), e.g. AAPL.csv. Ticker info is read from <TICKER>.info.json.
+    Use save_fixture() to record histories in this layout.
+    """
+
+    name = 'local'
+    use_price_store = False
+
+    def __init__(self, directory=None):
+        self.directory = directory or MARKET_DATA_DIR
+
+    def _base_path(self, ticker):
+        return os.path.join(self.directory, quote(str(ticker).upper(), safe=''))
+
+    def _read(self, ticker):
+        base = self._base_path(ticker)
+        if os.path.exists(base + '.parquet'):
+            return pd.read_parquet(base + '.parquet')
+        if os.path.exists(base + '.pkl'):
+            return pd.read_pickle(base + '.pkl')
+        if os.path.exists(base + '.csv'):
+            return pd.read_csv(base + '.csv', index_col=0, parse_dates=True)
+        return pd.DataFrame()
+
+    def history(self, ticker, start_str, end_str):
+        hist = self._read(ticker)
+        if hist.empty:
+            return hist
+        start_ts = pd.Timestamp(start_str)
+        end_ts = pd.Timestamp(end_str)
+        tz = getattr(hist.index, 'tz', None)
+        if tz is not None:
+            start_ts = start_ts.tz_localize(tz)
+            end_ts = end_ts.tz_localize(tz)
+        return hist.loc[(hist.index >= start_ts) & (hist.index < end_ts)]
+
+    def download(self, tickers, start_str, end_str):
+        histories = {}
+        for ticker in tickers:
+            hist = self.history(ticker, start_str, end_str)
+            if not hist.empty:
+                histories[ticker] = hist
+        return histories
+
+    def info(self, ticker):
+        path = self._base_path(ticker) + '.info.json'
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+class SyntheticProvider:
+    """
+    Deterministic synthetic market data.
+
+    Each ticker gets a geometric Brownian motion path seeded from its symbol, so
+    the same ticker and date range always produce the same bars. Intended for
+    reproducible benchmarks and air-gapped runs, not for analysis.
+    """
+
+    name = 'synthetic'
+    use_price_store = False
+
+    # Fixed calendar origin so a ticker's path does not depend on the requested range
+    _ORIGIN = pd.Timestamp('2000-01-03')
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def _ticker_seed(self, ticker):
+        return (zlib.crc32(str(ticker).upper().encode('utf-8')) + self.seed) % (2 ** 32)
+
+    def _params(self, ticker):
+        rng = np.random.default_rng(self._ticker_seed(ticker))
+        annual_drift = rng.uniform(-0.05, 0.25)
+        annual_vol = rng.uniform(0.15, 0.55)
+        start_price = rng.uniform(20.0, 500.0)
+        return annual_drift, annual_vol, start_price
+
+    def history(self, ticker, start_str, end_str):
+        end_ts = pd.Timestamp(end_str)
+        start_ts = pd.Timestamp(start_str)
+        if end_ts <= self._ORIGIN or end_ts <= start_ts:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+
+        # Weekday filter on a daily range (pd.bdate_range is slow for long spans)
+        days = pd.date_range(self._ORIGIN, end_ts, freq='D', inclusive='left')
+        dates = days[days.dayofweek < 5]
+        annual_drift, annual_vol, start_price = self._params(ticker)
+        rng = np.random.default_rng(self._ticker_seed(ticker) + 1)
+        daily_vol = annual_vol / np.sqrt(252)
+        log_returns = rng.normal((annual_drift - 0.5 * annual_vol ** 2) / 252, daily_vol, size=len(dates))
+        close = start_price * np.exp(np.cumsum(log_returns))
+        open_ = close * np.exp(rng.normal(0.0, daily_vol / 4, size=len(dates)))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0.0, daily_vol / 2, size=len(dates))))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0.0, daily_vol / 2, size=len(dates))))
+        volume = rng.integers(1_000_000, 50_000_000, size=len(dates))
+
+        hist = pd.DataFrame(
+            {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+            index=pd.DatetimeIndex(dates, name='Date')
+        )
+        return hist.loc[hist.index >= start_ts]
+
+    def download(self, tickers, start_str, end_str):
+        histories = {}
+        for ticker in tickers:
+            hist = self.history(ticker, start_str, end_str)
+            if not hist.empty:
+                histories[ticker] = hist
+        return histories
+
+    def info(self, ticker):
+        rng = np.random.default_rng(self._ticker_seed(ticker) + 2)
+        return {
+            'longName': f"{str(ticker).upper()} Synthetic Inc.",
+            'shortName': str(ticker).upper(),
+            'trailingEps': float(rng.uniform(0.5, 15.0)),
+            'beta': float(rng.uniform(0.5, 2.0)),
+            'marketCap': float(rng.uniform(1e9, 3e12)),
+        }
+
+
+def save_fixture(ticker, hist, directory=None, info=None):
+    """
+    Record a history (and optionally its info dict) in the LocalProvider layout.
+
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    hist (pd.DataFrame): Daily bars to record.
+    directory (str, optional): Target directory (defaults to MARKET_DATA_DIR).
+    info (dict, optional): Ticker info to record alongside the history.
+    """
+    provider = LocalProvider(directory)
+    os.makedirs(provider.directory, exist_ok=True)
+    base = provider._base_path(ticker)
+    hist.to_csv(base + '.csv', index_label='Date')
+    if info is not None:
+        with open(base + '.info.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f, default=str)
+
+
+_PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'local': LocalProvider,
+    'synthetic': SyntheticProvider,
+}
+
+_provider = None
+
+
+def get_provider():
+    """Return the active market data provider (configured by MARKET_DATA_PROVIDER)."""
+    global _provider
+    if _provider is None:
+        provider_cls = _PROVIDERS.get(MARKET_DATA_PROVIDER)
+        if provider_cls is None:
+            raise ValueError(
+                f"Unknown MARKET_DATA_PROVIDER '{MARKET_DATA_PROVIDER}'. "
+                f"Choose one of: {', '.join(_PROVIDERS)}"
+            )
+        _provider = provider_cls()
+    return _provider
+
+
+def set_provider(provider):
+    """
+    Replace the active market data provider (e.g. in benchmarks).
+
+    Parameters:
+    provider: An object with history(), download() and info() methods, or one of
+              'yfinance', 'local', 'synthetic'.
+    """
+    global _provider
+    if isinstance(provider, str):
+        if provider not in _PROVIDERS:
+            raise ValueError(f"Unknown market data provider '{provider}'")
+        provider = _PROVIDERS[provider]()
+    _provider = provider
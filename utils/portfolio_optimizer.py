@@ -3,13 +3,22 @@ Portfolio optimization functions using Modern Portfolio Theory and Black-Litterm
 """
 import numpy as np
 import pandas as pd
-import yfinance as yf
-import time
-import json
-import os
 from scipy.optimize import minimize
 from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout, RequestException
-from utils.data_cache import get_ticker_history, get_ticker_info as get_ticker_info_cached, get_multiple_tickers_history
+from utils.data_cache import get_ticker_info_bulk, get_price_panel
+from config.settings import (
+    RESAMPLE_COUNT, RESAMPLE_MAX_WORKERS, COVARIANCE_METHOD, COVARIANCE_EWMA_HALFLIFE, COVARIANCE_PCA_FACTORS,
+    CVAR_CONFIDENCE
+)
+from utils.black_litterman import BL_TAU, black_litterman_posterior, default_views
+from utils.covariance import condition_covariance
+from utils.estimation import get_moment_estimates
+from utils.resampling import resampled_max_sharpe
+from utils.solvers import (
+    max_sharpe_long_only, risk_parity_weights, efficient_frontier, min_cvar_lp, hrp_weights,
+    max_sharpe_constrained, solve_constrained
+)
+from utils import tracing
 
 # Try to import streamlit for caching (optional - if not available, caching won't work)
 try:
@@ -26,17 +35,19 @@ except ImportError:
 
 # Try to import pypfopt, but make it optional
 try:
-    from pypfopt import risk_models, expected_returns, BlackLittermanModel, EfficientFrontier, black_litterman
+    from pypfopt import risk_models, expected_returns, EfficientFrontier, black_litterman
     PYPFOPT_AVAILABLE = True
 except ImportError:
     PYPFOPT_AVAILABLE = False
     # Create dummy classes to prevent errors
     risk_models = None
     expected_returns = None
-    BlackLittermanModel = None
     EfficientFrontier = None
     black_litterman = None
 
+# Daily moments are annualized (and annual risk-free rates de-annualized) with this
+TRADING_DAYS_PER_YEAR = 252
+
 
 def portfolio_performance(weights, mean_returns, cov_matrix):
     """
@@ -56,6 +67,62 @@ def portfolio_performance(weights, mean_returns, cov_matrix):
     return returns, std
 
 
+def simulate_random_portfolios(mean_returns, cov_matrix, n_portfolios=10000, risk_free_rate=0.0,
+                               concentration=1.0, chunk_size=65536, seed=None, return_weights=False):
+    """
+    Evaluate random long-only portfolios in batches.
+
+    Weights are drawn from a symmetric Dirichlet distribution (normalized
+    gamma variates) and evaluated a chunk at a time: returns as W @ mu and
+    variances as the row-wise quadratic forms einsum('ij,ij->i', W @ S, W).
+    Memory stays at O(chunk_size * n_assets) whatever n_portfolios is.
+
+    Parameters:
+    mean_returns (array): Mean returns per asset.
+    cov_matrix (array): Covariance matrix of asset returns.
+    n_portfolios (int): Number of random portfolios.
+    risk_free_rate (float): Risk-free rate, in the units of mean_returns.
+    concentration (float): Dirichlet concentration; 1 is uniform over the
+                           simplex, smaller values give more concentrated portfolios.
+    chunk_size (int): Portfolios evaluated per batch.
+    seed (int, optional): Seed for reproducible draws.
+    return_weights (bool): Also return the (n_portfolios, n_assets) weights.
+
+    Returns:
+    tuple: (returns, volatilities, sharpe_ratios) arrays, plus the weights if
+           return_weights is True.
+    """
+    mu = np.asarray(mean_returns, dtype=np.float64)
+    cov = np.ascontiguousarray(cov_matrix, dtype=np.float64)
+    n_assets = len(mu)
+    rng = np.random.default_rng(seed)
+
+    returns = np.empty(n_portfolios)
+    volatilities = np.empty(n_portfolios)
+    weights = np.empty((n_portfolios, n_assets)) if return_weights else None
+
+    for start in range(0, n_portfolios, chunk_size):
+        size = min(chunk_size, n_portfolios - start)
+        if concentration == 1.0:
+            W = rng.standard_exponential((size, n_assets))
+        else:
+            W = rng.standard_gamma(concentration, (size, n_assets))
+        W /= W.sum(axis=1, keepdims=True)
+
+        stop = start + size
+        returns[start:stop] = W @ mu
+        volatilities[start:stop] = np.sqrt(np.maximum(np.einsum('ij,ij->i', W @ cov, W), 0.0))
+        if return_weights:
+            weights[start:stop] = W
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe_ratios = np.where(volatilities > 0, (returns - risk_free_rate) / volatilities, 0.0)
+
+    if return_weights:
+        return returns, volatilities, sharpe_ratios, weights
+    return returns, volatilities, sharpe_ratios
+
+
 def negative_sharpe_ratio(weights, mean_returns, cov_matrix, risk_free_rate):
     """
     Calculate the negative Sharpe ratio for a given portfolio.
@@ -73,6 +140,91 @@ def negative_sharpe_ratio(weights, mean_returns, cov_matrix, risk_free_rate):
     return -(p_returns - risk_free_rate) / p_std
 
 
+def negative_sharpe_ratio_grad(weights, mean_returns, cov_matrix, risk_free_rate):
+    """
+    Gradient of negative_sharpe_ratio with respect to the weights.
+
+    d/dw [-(mu'w - rf) / sigma] = -mu / sigma + (mu'w - rf) * S w / sigma^3
+
+    Parameters:
+    weights (array): Asset weights in the portfolio.
+    mean_returns (Series): Mean returns for each asset.
+    cov_matrix (DataFrame): Covariance matrix of asset returns.
+    risk_free_rate (float): Risk-free rate.
+
+    Returns:
+    np.ndarray: Gradient vector.
+    """
+    mu = np.asarray(mean_returns, dtype=np.float64)
+    cov_w = np.asarray(cov_matrix, dtype=np.float64) @ weights
+    p_std = np.sqrt(weights @ cov_w)
+    excess = weights @ mu - risk_free_rate
+    return -mu / p_std + excess * cov_w / p_std ** 3
+
+
+def risk_parity_objective(weights, cov_matrix, budgets=None):
+    """
+    Squared deviation of fractional risk contributions from their targets.
+
+    Parameters:
+    weights (array): Asset weights in the portfolio.
+    cov_matrix (array): Covariance matrix of asset returns.
+    budgets (array, optional): Target risk fractions (default: equal).
+
+    Returns:
+    float: Sum of squared deviations.
+    """
+    cov_w = cov_matrix @ weights
+    portfolio_var = float(weights @ cov_w)
+    if portfolio_var <= 0:
+        return 1e10
+    target = np.full(len(weights), 1.0 / len(weights)) if budgets is None else budgets
+    # Fractional risk contribution of each asset: w_i (S w)_i / (w' S w)
+    risk_contrib_fraction = weights * cov_w / portfolio_var
+    return float(np.sum((risk_contrib_fraction - target) ** 2))
+
+
+def risk_parity_gradient(weights, cov_matrix, budgets=None):
+    """
+    Gradient of risk_parity_objective with respect to the weights.
+
+    With c = w * S w, V = w' S w and d = c / V - target:
+    grad = 2 (d * S w + S (d * w)) / V - 4 (d' c) S w / V^2
+
+    Parameters:
+    weights (array): Asset weights in the portfolio.
+    cov_matrix (array): Covariance matrix of asset returns.
+    budgets (array, optional): Target risk fractions (default: equal).
+
+    Returns:
+    np.ndarray: Gradient vector.
+    """
+    cov_w = cov_matrix @ weights
+    portfolio_var = float(weights @ cov_w)
+    if portfolio_var <= 0:
+        return np.zeros_like(weights)
+    target = np.full(len(weights), 1.0 / len(weights)) if budgets is None else budgets
+    contrib = weights * cov_w
+    d = contrib / portfolio_var - target
+    return (
+        2.0 * (d * cov_w + cov_matrix @ (d * weights)) / portfolio_var
+        - 4.0 * float(d @ contrib) * cov_w / portfolio_var ** 2
+    )
+
+
+def _squared_distance(weights, target):
+    return float(np.sum((weights - target) ** 2))
+
+
+def _squared_distance_grad(weights, target):
+    return 2.0 * (weights - target)
+
+
+def sum_to_one_constraint():
+    """Equality constraint sum(w) = 1 with its (constant) Jacobian, for scipy.optimize.minimize."""
+    return {'type': 'eq', 'fun': lambda w: np.sum(w) - 1.0, 'jac': lambda w: np.ones_like(w)}
+
+
 def max_sharpe_ratio(mean_returns, cov_matrix, risk_free_rate):
     """
     Find the portfolio with the maximum Sharpe ratio.
@@ -86,367 +238,82 @@ def max_sharpe_ratio(mean_returns, cov_matrix, risk_free_rate):
     OptimizeResult: The optimization result containing the portfolio weights.
     """
     num_assets = len(mean_returns)
-    args = (mean_returns, cov_matrix, risk_free_rate)
-    constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1})
+    args = (np.asarray(mean_returns, dtype=np.float64), np.asarray(cov_matrix, dtype=np.float64), risk_free_rate)
     bounds = tuple((0, 1) for asset in range(num_assets))
     
     result = minimize(negative_sharpe_ratio, num_assets * [1. / num_assets,], 
-                      args=args, method='SLSQP', bounds=bounds, constraints=constraints)
+                      args=args, method='SLSQP', jac=negative_sharpe_ratio_grad,
+                      bounds=bounds, constraints=sum_to_one_constraint())
     return result
 
 
 
 
 @st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
-def optimize_portfolio_mpt(tickers, start_date, end_date, risk_free_rate=0.04):
+@tracing.traced('optimizer.mpt')
+def optimize_portfolio_mpt(tickers, start_date, end_date, risk_free_rate=0.04, cov_method=None, constraints=None):
     """
-    Optimize portfolio using Modern Portfolio Theory with scipy optimization.
-    Uses a direct scipy.optimize approach for maximum Sharpe ratio.
+    Optimize portfolio using Modern Portfolio Theory (maximum Sharpe ratio).
+    Solves the long-only tangency problem with the active-set QP in
+    utils/solvers.py (SLSQP only when no asset beats the risk-free rate, or
+    when constraints beyond long-only are given).
     Cached to improve performance and reduce API calls.
     
     Parameters:
     tickers (list): List of stock ticker symbols.
     start_date (str): Start date for historical data.
     end_date (str): End date for historical data.
-    risk_free_rate (float): Risk-free rate.
+    risk_free_rate (float): Annual risk-free rate.
+    cov_method (str, optional): Covariance estimator ('sample', 'ledoit_wolf', 'oas',
+                                'ewma', 'pca'); defaults to COVARIANCE_METHOD.
+    constraints (PortfolioConstraints, optional): Allocation constraints
+                                                  (utils/constraints.py); long-only if None.
     
     Returns:
     dict: Dictionary containing optimal weights and performance metrics.
     """
-    log_path = r"c:\Users\ohada\OneDrive\Desktop\Gen AI for Stock Analysis (2)\Gen AI for Stock Analysis\.cursor\debug.log"
-    
-    # #region agent log - Function entry
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'portfolio_optimizer.py:211',
-            'message': 'MPT: Function entry',
-            'data': {
-                'tickers': tickers,
-                'start_date': str(start_date),
-                'end_date': str(end_date),
-                'risk_free_rate': float(risk_free_rate)
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Fetch the adjusted close prices with retry logic
-    # Use get_multiple_tickers_history directly - data is already cached from preload
-    data = get_multiple_tickers_history(tickers, start_date, end_date)
-    
-    # #region agent log - After data download
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'portfolio_optimizer.py:240',
-            'message': 'MPT: After data download',
-            'data': {
-                'data_empty': bool(data.empty),
-                'data_shape': list(data.shape) if hasattr(data, 'shape') else None,
-                'data_columns': list(data.columns) if hasattr(data, 'columns') else None,
-                'data_has_nan': bool(data.isna().any().any()) if hasattr(data, 'isna') else None,
-                'data_sample_first_5': data.head().to_dict() if not data.empty else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Validate data BEFORE processing
-    if data is None or data.empty:
-        raise ValueError(
-            "No price data returned. Check tickers and date range.\n"
-            f"Tickers: {tickers}\n"
-            f"Date range: {start_date} to {end_date}"
-        )
-    
-    # #region agent log - Data validation
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'portfolio_optimizer.py:250',
-            'message': 'MPT: Data validation before returns',
-            'data': {
-                'data_shape': list(data.shape) if hasattr(data, 'shape') else None,
-                'data_columns': list(data.columns) if hasattr(data, 'columns') else None,
-                'data_nan_per_col': data.isna().sum().to_dict() if hasattr(data, 'isna') else None,
-                'data_min_date': str(data.index.min()) if hasattr(data, 'index') and len(data) > 0 else None,
-                'data_max_date': str(data.index.max()) if hasattr(data, 'index') and len(data) > 0 else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Remove columns where ALL values are NaN (invalid tickers)
-    data = data.dropna(axis=1, how='all')
-    
-    if data.shape[1] == 0:
-        raise ValueError(
-            "All tickers have no price data in the selected date range.\n"
-            f"Tickers: {tickers}\n"
-            f"Date range: {start_date} to {end_date}\n"
-            "Please verify ticker symbols and ensure the date range contains trading days."
-        )
-    
-    # Need at least 2 rows for pct_change to work
-    if data.shape[0] < 2:
-        raise ValueError(
-            f"Not enough price rows to compute returns (need at least 2 trading days, got {data.shape[0]}).\n"
-            f"Date range: {start_date} to {end_date}\n"
-            "Please widen the date range to include at least 2 trading days."
-        )
-    
-    # Clean tickers list - remove any that don't exist in data
-    available_tickers_before = [t for t in tickers if t in data.columns]
-    if len(available_tickers_before) != len(tickers):
-        missing = set(tickers) - set(available_tickers_before)
-        raise ValueError(
-            f"Missing data for tickers: {missing}\n"
-            f"Available tickers in data: {list(data.columns)}\n"
-            "Please verify ticker symbols are correct."
-        )
+    # Shared estimation stage: validated panel, cleaned returns, mean and
+    # covariance (regularized if not positive definite). Memoized by panel
+    # content and estimator settings, so it is not repeated per risk-free rate
+    estimates = get_moment_estimates(tickers, start_date, end_date, cov_method)
+    available_tickers = estimates.tickers
+    mu = estimates.mu
+    S = estimates.cov
+    
+    # The risk-free rate is annual while mu and S are daily
+    daily_risk_free_rate = risk_free_rate / TRADING_DAYS_PER_YEAR
+    compiled = constraints.compile(available_tickers) if constraints is not None else None
     
-    # Calculate daily returns
-    returns = data.pct_change(fill_method=None)
-    
-    # #region agent log - After pct_change
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'portfolio_optimizer.py:290',
-            'message': 'MPT: After pct_change',
-            'data': {
-                'returns_empty': bool(returns.empty),
-                'returns_shape': list(returns.shape) if hasattr(returns, 'shape') else None,
-                'returns_has_nan': bool(returns.isna().any().any()) if hasattr(returns, 'isna') else None,
-                'returns_nan_count': int(returns.isna().sum().sum()) if hasattr(returns, 'isna') else None,
-                'first_row_all_nan': bool(returns.iloc[0].isna().all()) if len(returns) > 0 else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Replace infinite values with NaN
-    returns = returns.replace([np.inf, -np.inf], np.nan)
-    
-    # Fill NaN values: forward fill, backward fill, then 0
-    # This handles the first row (all NaN from pct_change) and any other missing values
-    returns = returns.ffill(axis=0).bfill(axis=0).fillna(0)
-    
-    # #region agent log - After fill
     try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'portfolio_optimizer.py:310',
-            'message': 'MPT: After fill',
-            'data': {
-                'returns_empty': bool(returns.empty),
-                'returns_shape': list(returns.shape) if hasattr(returns, 'shape') else None,
-                'returns_has_nan': bool(returns.isna().any().any()) if hasattr(returns, 'isna') else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Drop rows where ALL values are NaN (shouldn't happen after fill, but safety check)
-    returns = returns.dropna(how='all')
-    
-    # #region agent log - After returns calculation (final)
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'portfolio_optimizer.py:325',
-            'message': 'MPT: After returns calculation (final)',
-            'data': {
-                'returns_empty': bool(returns.empty),
-                'returns_shape': list(returns.shape) if hasattr(returns, 'shape') else None,
-                'returns_columns': list(returns.columns) if hasattr(returns, 'columns') else None,
-                'original_data_shape': list(data.shape) if hasattr(data, 'shape') else None,
-                'returns_has_nan': bool(returns.isna().any().any()) if hasattr(returns, 'isna') else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Validate returns with detailed error message
-    if returns.empty:
-        raise ValueError(
-            "Returns calculation produced empty data.\n"
-            f"Likely causes:\n"
-            f"1. Invalid tickers: {tickers}\n"
-            f"2. Too short date range: {start_date} to {end_date}\n"
-            f"3. Missing prices for all tickers\n"
-            f"Original data shape: {data.shape}\n"
-            "Try: widen the date range, verify tickers, and ensure at least 2 trading days of data."
-        )
-    
-    if len(returns) < 5:
-        raise ValueError(
-            f"Insufficient return data points: {len(returns)} (need at least 5).\n"
-            f"Date range: {start_date} to {end_date}\n"
-            "Please widen the date range to include more trading days."
-        )
-    
-    # Remove columns where ALL values are NaN (shouldn't happen after fill, but safety check)
-    returns = returns.dropna(axis=1, how='all')
-    
-    if returns.empty:
-        raise ValueError(
-            "All ticker columns were removed after processing.\n"
-            f"Original tickers: {tickers}\n"
-            "This should not happen. Please check the data source."
-        )
-    
-    # Ensure we still have data for all tickers (we already checked earlier, but verify again)
-    available_tickers = [t for t in tickers if t in returns.columns]
-    if len(available_tickers) != len(tickers):
-        missing = set(tickers) - set(available_tickers)
-        raise ValueError(
-            f"Missing data for tickers after processing: {missing}\n"
-            f"Available tickers: {list(returns.columns)}\n"
-            "This should not happen if data validation passed earlier."
-        )
-    if len(available_tickers) == 0:
-        raise ValueError(
-            "No valid tickers after data cleaning.\n"
-            f"Original tickers: {tickers}\n"
-            "Please verify ticker symbols are correct."
-        )
-    
-    # Select only the tickers we need
-    returns = returns[available_tickers]
-    
-    # Final validation of returns
-    if returns.empty or len(returns) < 5:
-        raise ValueError(
-            f"Insufficient valid return data after cleaning: {len(returns)} rows (need at least 5).\n"
-            f"Date range: {start_date} to {end_date}\n"
-            "Please widen the date range to include more trading days."
+        if compiled is not None and not compiled.long_only:
+            optimal_weights = max_sharpe_constrained(mu, S, compiled, daily_risk_free_rate)
+            solver = 'constrained'
+        else:
+            # Long-only tangency portfolio via the convex QP reformulation
+            optimal_weights = max_sharpe_long_only(mu, S, daily_risk_free_rate, cholesky=estimates.cholesky)
+            solver = 'active_set'
+    except ValueError:
+        if compiled is not None and not compiled.long_only:
+            raise
+        # No asset beats the risk-free rate, so no tangency portfolio exists:
+        # fall back to maximizing the (negative) Sharpe ratio directly
+        n_assets = len(available_tickers)
+        result = minimize(
+            negative_sharpe_ratio,
+            np.ones(n_assets) / n_assets,
+            args=(mu, S, daily_risk_free_rate),
+            method='SLSQP',
+            jac=negative_sharpe_ratio_grad,
+            bounds=tuple((0.0, 1.0) for _ in range(n_assets)),
+            constraints=sum_to_one_constraint(),
+            options={'maxiter': 1000, 'ftol': 1e-9}
         )
-    
-    # Calculate mean returns and covariance matrix
-    mean_returns = returns.mean()
-    cov_matrix = returns.cov()
-    
-    # Validate mean returns
-    if mean_returns.isna().any() or np.isinf(mean_returns).any():
-        raise ValueError("Mean returns contain NaN or Inf values")
-    if (mean_returns == 0).all():
-        raise ValueError("All mean returns are zero")
-    
-    # Validate covariance matrix
-    if cov_matrix.isna().any().any() or np.isinf(cov_matrix).any().any():
-        raise ValueError("Covariance matrix contains NaN or Inf values")
-    
-    # Ensure covariance matrix is positive semi-definite
-    # Add small regularization if needed
-    min_eigenval = np.min(np.linalg.eigvals(cov_matrix))
-    if min_eigenval < 1e-8:
-        regularization = abs(min_eigenval) + 1e-8
-        cov_matrix = cov_matrix + np.eye(len(cov_matrix)) * regularization
-    
-    # Convert to numpy arrays
-    mu = mean_returns.values
-    S = cov_matrix.values
-    
-    # Final validation of arrays
-    if np.any(np.isnan(mu)) or np.any(np.isinf(mu)):
-        raise ValueError("Mean returns array contains NaN or Inf")
-    if np.any(np.isnan(S)) or np.any(np.isinf(S)):
-        raise ValueError("Covariance matrix array contains NaN or Inf")
-    
-    # Objective function: negative Sharpe ratio (we minimize)
-    def objective(weights):
-        portfolio_return = np.dot(weights, mu)
-        portfolio_std = np.sqrt(np.dot(weights.T, np.dot(S, weights)))
-        if portfolio_std < 1e-10:
-            return 1e10  # Penalty for zero volatility
-        sharpe = (portfolio_return - risk_free_rate) / portfolio_std
-        return -sharpe  # Negative because we minimize
-    
-    # Constraints: weights sum to 1
-    constraints = {'type': 'eq', 'fun': lambda w: np.sum(w) - 1.0}
-    
-    # Bounds: each weight between 0 and 1
-    bounds = tuple((0.0, 1.0) for _ in range(len(available_tickers)))
-    
-    # Initial guess: equal weights
-    initial_weights = np.array([1.0 / len(available_tickers)] * len(available_tickers))
-    
-    # Optimize
-    result = minimize(
-        objective,
-        initial_weights,
-        method='SLSQP',
-        bounds=bounds,
-        constraints=constraints,
-        options={'maxiter': 1000, 'ftol': 1e-9}
-    )
-    
-    # #region agent log - Log optimization result
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'F',
-            'location': 'portfolio_optimizer.py:285',
-            'message': 'MPT: Optimization result',
-            'data': {
-                'success': result.success,
-                'message': result.message,
-                'fun': float(result.fun) if not np.isnan(result.fun) and not np.isinf(result.fun) else None,
-                'optimal_weights': [float(w) for w in result.x[:5]] if len(result.x) >= 5 else [float(w) for w in result.x],
-                'weights_sum': float(np.sum(result.x)),
-                'num_weights': len(result.x)
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    if not result.success:
-        raise ValueError(f"Optimization failed: {result.message}")
-    
-    optimal_weights = result.x
+        if not result.success:
+            raise ValueError(f"Optimization failed: {result.message}")
+        optimal_weights = result.x
+        solver = 'slsqp'
+        tracing.count('optimizer.mpt.slsqp_fallback')
+    tracing.event('optimizer.mpt.solved', solver=solver, n_assets=len(available_tickers))
     
     # Validate optimal weights
     if np.any(np.isnan(optimal_weights)) or np.any(np.isinf(optimal_weights)):
@@ -458,174 +325,21 @@ def optimize_portfolio_mpt(tickers, start_date, end_date, risk_free_rate=0.04):
     portfolio_return = np.dot(optimal_weights, mu)
     variance = np.dot(optimal_weights.T, np.dot(S, optimal_weights))
     
-    # #region agent log - Before sqrt calculation (Hypothesis C)
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'C',
-            'location': 'portfolio_optimizer.py:345',
-            'message': 'MPT: Before sqrt calculation',
-            'data': {
-                'portfolio_return': float(portfolio_return),
-                'variance': float(variance),
-                'variance_is_nan': bool(np.isnan(variance)),
-                'variance_is_negative': bool(variance < 0),
-                'variance_is_inf': bool(np.isinf(variance))
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
     portfolio_std = np.sqrt(variance) if variance >= 0 else np.nan
     
-    # #region agent log - After portfolio_std calculation (Hypothesis C)
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'C',
-            'location': 'portfolio_optimizer.py:360',
-            'message': 'MPT: After portfolio_std calculation',
-            'data': {
-                'portfolio_return': float(portfolio_return),
-                'portfolio_std': float(portfolio_std) if not np.isnan(portfolio_std) else None,
-                'portfolio_return_is_nan': bool(np.isnan(portfolio_return)),
-                'portfolio_std_is_nan': bool(np.isnan(portfolio_std)),
-                'portfolio_std_is_inf': bool(np.isinf(portfolio_std)) if not np.isnan(portfolio_std) else False
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # #region agent log - Before validation checks (Hypothesis B)
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'portfolio_optimizer.py:375',
-            'message': 'MPT: Before validation checks',
-            'data': {
-                'portfolio_return': float(portfolio_return),
-                'portfolio_std': float(portfolio_std) if not np.isnan(portfolio_std) else None,
-                'portfolio_return_is_nan': bool(np.isnan(portfolio_return)),
-                'portfolio_std_is_nan': bool(np.isnan(portfolio_std))
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
     # Validate results
     if np.isnan(portfolio_return) or np.isinf(portfolio_return):
-        # #region agent log - Validation failed
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'portfolio_optimizer.py:390',
-                'message': 'MPT: Validation FAILED - portfolio_return invalid',
-                'data': {
-                    'portfolio_return': float(portfolio_return) if not np.isnan(portfolio_return) and not np.isinf(portfolio_return) else None,
-                    'is_nan': bool(np.isnan(portfolio_return)),
-                    'is_inf': bool(np.isinf(portfolio_return))
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
         raise ValueError("Portfolio return calculation produced NaN or Inf")
     
     if np.isnan(portfolio_std) or np.isinf(portfolio_std) or portfolio_std < 1e-10:
-        # #region agent log - Validation failed
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'portfolio_optimizer.py:405',
-                'message': 'MPT: Validation FAILED - portfolio_std invalid',
-                'data': {
-                    'portfolio_std': float(portfolio_std) if not np.isnan(portfolio_std) and not np.isinf(portfolio_std) else None,
-                    'is_nan': bool(np.isnan(portfolio_std)),
-                    'is_inf': bool(np.isinf(portfolio_std)),
-                    'is_too_small': bool(portfolio_std < 1e-10) if not np.isnan(portfolio_std) else False
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
         raise ValueError("Portfolio volatility calculation produced invalid value")
     
-    # #region agent log - Validation passed
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'portfolio_optimizer.py:420',
-            'message': 'MPT: Validation PASSED',
-            'data': {
-                'portfolio_return': float(portfolio_return),
-                'portfolio_std': float(portfolio_std)
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    sharpe_ratio = (portfolio_return - risk_free_rate) / portfolio_std if portfolio_std > 0 else 0.0
+    sharpe_ratio = (portfolio_return - daily_risk_free_rate) / portfolio_std if portfolio_std > 0 else 0.0
     
     # Annualize (assuming 252 trading days)
-    annual_return = portfolio_return * 252
-    annual_volatility = portfolio_std * np.sqrt(252)
-    annual_sharpe = sharpe_ratio * np.sqrt(252) if not np.isnan(sharpe_ratio) else 0.0
-    
-    # #region agent log - Log annualized values
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'F',
-            'location': 'portfolio_optimizer.py:320',
-            'message': 'MPT: Annualized values calculated',
-            'data': {
-                'annual_return': float(annual_return),
-                'annual_volatility': float(annual_volatility),
-                'annual_sharpe': float(annual_sharpe),
-                'annual_return_is_nan': bool(np.isnan(annual_return)),
-                'annual_volatility_is_nan': bool(np.isnan(annual_volatility)),
-                'annual_sharpe_is_nan': bool(np.isnan(annual_sharpe))
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
+    annual_return = portfolio_return * TRADING_DAYS_PER_YEAR
+    annual_volatility = portfolio_std * np.sqrt(TRADING_DAYS_PER_YEAR)
+    annual_sharpe = sharpe_ratio * np.sqrt(TRADING_DAYS_PER_YEAR) if not np.isnan(sharpe_ratio) else 0.0
     
     # Validate annualized values
     if np.isnan(annual_return) or np.isinf(annual_return):
@@ -668,93 +382,11 @@ def optimize_portfolio_mpt(tickers, start_date, end_date, risk_free_rate=0.04):
         'sharpe_ratio': float(annual_sharpe)
     }
     
-    # #region agent log - Result dictionary created (Hypothesis D)
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'D',
-            'location': 'portfolio_optimizer.py:440',
-            'message': 'MPT: Result dictionary created',
-            'data': {
-                'expected_return': result['expected_return'],
-                'volatility': result['volatility'],
-                'sharpe_ratio': result['sharpe_ratio'],
-                'expected_return_is_nan': bool(np.isnan(result['expected_return'])),
-                'volatility_is_nan': bool(np.isnan(result['volatility'])),
-                'sharpe_ratio_is_nan': bool(np.isnan(result['sharpe_ratio'])),
-                'annual_return_before_dict': float(annual_return),
-                'annual_volatility_before_dict': float(annual_volatility) if not np.isnan(annual_volatility) else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # #region agent log - Before final validation (Hypothesis B)
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'portfolio_optimizer.py:460',
-            'message': 'MPT: Before final validation checks',
-            'data': {
-                'expected_return': result['expected_return'],
-                'volatility': result['volatility'],
-                'sharpe_ratio': result['sharpe_ratio'],
-                'expected_return_is_nan': bool(np.isnan(result['expected_return'])),
-                'volatility_is_nan': bool(np.isnan(result['volatility'])),
-                'sharpe_ratio_is_nan': bool(np.isnan(result['sharpe_ratio']))
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
     # Final validation - ensure all values are valid and reasonable
     if np.isnan(result['expected_return']) or np.isinf(result['expected_return']):
-        # #region agent log - Final validation failed
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'portfolio_optimizer.py:480',
-                'message': 'MPT: Final validation FAILED - expected_return',
-                'data': {'expected_return': result['expected_return']},
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
         raise ValueError(f"Invalid expected_return: {result['expected_return']}")
     
     if np.isnan(result['volatility']) or np.isinf(result['volatility']) or result['volatility'] <= 0:
-        # #region agent log - Final validation failed
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'portfolio_optimizer.py:495',
-                'message': 'MPT: Final validation FAILED - volatility',
-                'data': {'volatility': result['volatility']},
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
         raise ValueError(f"Invalid volatility: {result['volatility']}")
     
     if abs(result['expected_return']) < 1e-10 and result['volatility'] > 1e-10:
@@ -767,59 +399,20 @@ def optimize_portfolio_mpt(tickers, start_date, end_date, risk_free_rate=0.04):
     if result['expected_return'] == 0.0 and result['volatility'] == 0.0:
         raise ValueError("Portfolio optimization produced zero return and zero volatility")
     
-    # #region agent log - Final validation passed
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'portfolio_optimizer.py:520',
-            'message': 'MPT: Final validation PASSED - returning result',
-            'data': {
-                'expected_return': result['expected_return'],
-                'volatility': result['volatility'],
-                'sharpe_ratio': result['sharpe_ratio']
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # #region agent log - Log final validated result
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'F',
-            'location': 'portfolio_optimizer.py:395',
-            'message': 'MPT: Returning validated result',
-            'data': {
-                'expected_return': result['expected_return'],
-                'volatility': result['volatility'],
-                'sharpe_ratio': result['sharpe_ratio'],
-                'validation_passed': True
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
     return result
 
 
 @st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
-def optimize_portfolio_risk_parity(tickers, start_date, end_date, risk_free_rate=0.04):
+@tracing.traced('optimizer.risk_parity')
+def optimize_portfolio_risk_parity(tickers, start_date, end_date, risk_free_rate=0.04, risk_budgets=None, cov_method=None,
+                                   constraints=None):
     """
     Optimize portfolio using Risk Parity (Equal Risk Contribution).
 
     Uses the same cleaned return and covariance pipeline as MPT, but with a
-    different objective: each asset should contribute an equal share of total risk.
+    different objective: each asset should contribute an equal share of total
+    risk, or its given share when risk budgets are supplied. Solved with the
+    coordinate descent risk budgeting solver in utils/solvers.py.
 
     The risk-free rate is only used for reporting the Sharpe ratio; it does not
     affect the optimization itself.
@@ -828,175 +421,59 @@ def optimize_portfolio_risk_parity(tickers, start_date, end_date, risk_free_rate
     tickers (list): List of stock ticker symbols.
     start_date (str): Start date for historical data.
     end_date (str): End date for historical data.
-    risk_free_rate (float): Risk-free rate for Sharpe ratio calculation.
+    risk_free_rate (float): Annual risk-free rate for Sharpe ratio calculation.
+    risk_budgets (dict, optional): Ticker to positive risk budget (normalized to
+                                   sum to 1). Missing tickers get a budget of 1.
+                                   Equal risk contribution if None.
+    cov_method (str, optional): Covariance estimator ('sample', 'ledoit_wolf', 'oas',
+                                'ewma', 'pca'); defaults to COVARIANCE_METHOD.
+    constraints (PortfolioConstraints, optional): Allocation constraints; the risk
+                                                  budgets are then matched as closely
+                                                  as the constraints allow.
     
     Returns:
     dict: Dictionary containing optimal weights and performance metrics.
     """
-    log_path = r"c:\Users\ohada\OneDrive\Desktop\Gen AI for Stock Analysis (2)\Gen AI for Stock Analysis\.cursor\debug.log"
+    # Shared estimation stage (memoized across optimizers and risk-free rates)
+    estimates = get_moment_estimates(tickers, start_date, end_date, cov_method)
+    available_tickers = estimates.tickers
+    mu = estimates.mu
+    S = estimates.cov
 
-    # Fetch and clean data using the same pipeline as MPT
-    # Use get_multiple_tickers_history directly - data is already cached from preload
-    data = get_multiple_tickers_history(tickers, start_date, end_date)
-    
-    if data is None or data.empty:
-        raise ValueError(
-            "No price data returned. Check tickers and date range.\n"
-            f"Tickers: {tickers}\n"
-            f"Date range: {start_date} to {end_date}"
-        )
-
-    # Remove columns where ALL values are NaN (invalid tickers)
-    data = data.dropna(axis=1, how='all')
-    if data.shape[1] == 0:
-        raise ValueError(
-            "All tickers have no price data in the selected date range.\n"
-            f"Tickers: {tickers}\n"
-            f"Date range: {start_date} to {end_date}\n"
-            "Please verify ticker symbols and ensure the date range contains trading days."
-        )
-
-    # Need at least 2 rows for pct_change to work
-    if data.shape[0] < 2:
-        raise ValueError(
-            f"Not enough price rows to compute returns (need at least 2 trading days, got {data.shape[0]}).\n"
-            f"Date range: {start_date} to {end_date}\n"
-            "Please widen the date range to include at least 2 trading days."
-        )
-
-    # Clean tickers list - remove any that don't exist in data
-    available_tickers_before = [t for t in tickers if t in data.columns]
-    if len(available_tickers_before) != len(tickers):
-        missing = set(tickers) - set(available_tickers_before)
-        raise ValueError(
-            f"Missing data for tickers: {missing}\n"
-            f"Available tickers in data: {list(data.columns)}\n"
-            "Please verify ticker symbols are correct."
-        )
-
-    # Calculate daily returns
-    returns = data.pct_change(fill_method=None)
-    returns = returns.replace([np.inf, -np.inf], np.nan)
-    returns = returns.ffill(axis=0).bfill(axis=0).fillna(0)
-    returns = returns.dropna(how='all')
-
-    if returns.empty or len(returns) < 5:
-        raise ValueError(
-            f"Insufficient valid return data after cleaning: {len(returns)} rows (need at least 5).\n"
-            f"Date range: {start_date} to {end_date}\n"
-            "Please widen the date range to include more trading days."
-        )
-
-    # Ensure we still have data for all tickers
-    available_tickers = [t for t in tickers if t in returns.columns]
-    if len(available_tickers) != len(tickers):
-        missing = set(tickers) - set(available_tickers)
-        raise ValueError(
-            f"Missing data for tickers after processing: {missing}\n"
-            f"Available tickers: {list(returns.columns)}\n"
-            "This should not happen if data validation passed earlier."
-        )
-    if len(available_tickers) == 0:
-        raise ValueError(
-            "No valid tickers after data cleaning.\n"
-            f"Original tickers: {tickers}\n"
-            "Please verify ticker symbols are correct."
-        )
-
-    returns = returns[available_tickers]
-    
-    # Calculate mean returns and covariance matrix
-    mean_returns = returns.mean()
-    cov_matrix = returns.cov()
-    
-    if mean_returns.isna().any() or np.isinf(mean_returns).any():
-        raise ValueError("Mean returns contain NaN or Inf values")
-    if cov_matrix.isna().any().any() or np.isinf(cov_matrix).any().any():
-        raise ValueError("Covariance matrix contains NaN or Inf values")
-
-    # Ensure covariance matrix is positive semi-definite
-    min_eigenval = np.min(np.linalg.eigvals(cov_matrix))
-    if min_eigenval < 1e-8:
-        regularization = abs(min_eigenval) + 1e-8
-        cov_matrix = cov_matrix + np.eye(len(cov_matrix)) * regularization
-
-    mu = mean_returns.values
-    S = cov_matrix.values
-
-    if np.any(np.isnan(mu)) or np.any(np.isinf(mu)):
-        raise ValueError("Mean returns array contains NaN or Inf")
-    if np.any(np.isnan(S)) or np.any(np.isinf(S)):
-        raise ValueError("Covariance matrix array contains NaN or Inf")
-
-    n_assets = len(available_tickers)
-
-    def risk_parity_objective(weights):
-        # Enforce simple bounds in objective to avoid numerical issues
-        if np.any(weights < 0) or np.any(weights > 1):
-            return 1e10
-        if abs(np.sum(weights) - 1.0) > 1e-4:
-            return 1e10
-
-        portfolio_var = float(np.dot(weights.T, np.dot(S, weights)))
-        if portfolio_var <= 0:
-            return 1e10
-
-        # Marginal contribution to risk
-        marginal_contrib = np.dot(S, weights)
-        # Total risk contribution of each asset (not normalized)
-        risk_contrib = weights * marginal_contrib
-
-        # Normalize by total variance to get fractional risk contributions
-        risk_contrib_fraction = risk_contrib / portfolio_var
-
-        # Target: equal risk contribution
-        target = np.ones(n_assets) / n_assets
-
-        return float(np.sum((risk_contrib_fraction - target) ** 2))
-
-    # Constraints: weights sum to 1
-    constraints = {'type': 'eq', 'fun': lambda w: np.sum(w) - 1.0}
-
-    # Bounds: each weight between 0 and 1
-    bounds = tuple((0.0, 1.0) for _ in range(n_assets))
-
-    # Initial guess: equal weights
-    initial_weights = np.ones(n_assets) / n_assets
-
-    result = minimize(
-        risk_parity_objective,
-        initial_weights,
-        method='SLSQP',
-        bounds=bounds,
-        constraints=constraints,
-        options={'maxiter': 1000, 'ftol': 1e-9}
-    )
+    budgets = None
+    if risk_budgets:
+        budgets = np.array([float(risk_budgets.get(t, 1.0)) for t in available_tickers])
 
     try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'RP',
-            'location': 'portfolio_optimizer.py:optimize_portfolio_risk_parity',
-            'message': 'Risk Parity: Optimization result',
-            'data': {
-                'success': bool(result.success),
-                'message': str(result.message),
-                'fun': float(result.fun) if result.fun is not None and not np.isnan(result.fun) and not np.isinf(result.fun) else None,
-                'weights_sum': float(np.sum(result.x)),
-                'num_weights': len(result.x)
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-
-    if not result.success:
-        raise ValueError(f"Risk Parity optimization failed: {result.message}")
-
-    optimal_weights = result.x
+        optimal_weights = risk_parity_weights(estimates.cov_model, budgets)
+        compiled = constraints.compile(available_tickers) if constraints is not None else None
+        if compiled is not None and not compiled.long_only:
+            full_budgets = np.ones(len(available_tickers)) if budgets is None else budgets
+
+            def restrict_budgets(active):
+                # Excluded positions (minimum size, cardinality) give up their
+                # risk budget; the held assets share it in proportion, starting
+                # from the risk budgeting portfolio of the held assets alone
+                restricted = np.where(active, full_budgets, 0.0)
+                start = np.zeros(len(active))
+                start[active] = risk_parity_weights(S[np.ix_(active, active)], full_budgets[active])
+                return (S, restricted / restricted.sum()), start
+
+            # Closest risk budgeting portfolio within the constraints, from the unconstrained one
+            optimal_weights = solve_constrained(
+                risk_parity_objective, risk_parity_gradient, compiled,
+                args=(S, full_budgets / full_budgets.sum()), x0=optimal_weights,
+                restrict=restrict_budgets
+            )
+    except ValueError as e:
+        raise ValueError(f"Risk Parity optimization failed: {e}")
+
+    if tracing.enabled():
+        tracing.event(
+            'optimizer.risk_parity.solved',
+            n_assets=len(available_tickers),
+            objective=float(risk_parity_objective(optimal_weights, S, budgets / budgets.sum() if budgets is not None else None))
+        )
 
     if np.any(np.isnan(optimal_weights)) or np.any(np.isinf(optimal_weights)):
         raise ValueError("Risk Parity optimization produced NaN or Inf weights")
@@ -1013,18 +490,20 @@ def optimize_portfolio_risk_parity(tickers, start_date, end_date, risk_free_rate
     if np.isnan(portfolio_std) or np.isinf(portfolio_std) or portfolio_std < 1e-10:
         raise ValueError("Risk Parity portfolio volatility calculation produced invalid value")
 
-    sharpe_ratio = (portfolio_return - risk_free_rate) / portfolio_std if portfolio_std > 0 else 0.0
+    # The risk-free rate is annual while mu and S are daily
+    daily_risk_free_rate = risk_free_rate / TRADING_DAYS_PER_YEAR
+    sharpe_ratio = (portfolio_return - daily_risk_free_rate) / portfolio_std if portfolio_std > 0 else 0.0
 
     # Annualize (assuming 252 trading days)
-    annual_return = portfolio_return * 252
-    annual_volatility = portfolio_std * np.sqrt(252)
-    annual_sharpe = sharpe_ratio * np.sqrt(252) if not np.isnan(sharpe_ratio) else 0.0
+    annual_return = portfolio_return * TRADING_DAYS_PER_YEAR
+    annual_volatility = portfolio_std * np.sqrt(TRADING_DAYS_PER_YEAR)
+    annual_sharpe = sharpe_ratio * np.sqrt(TRADING_DAYS_PER_YEAR) if not np.isnan(sharpe_ratio) else 0.0
 
     if np.isnan(annual_sharpe) or np.isinf(annual_sharpe):
         annual_sharpe = 0.0
 
     weights_dict = {}
-    for i in range(n_assets):
+    for i in range(len(available_tickers)):
         weight = float(optimal_weights[i])
         if np.isnan(weight) or np.isinf(weight):
             raise ValueError(f"Invalid weight for {available_tickers[i]}: {weight}")
@@ -1048,9 +527,129 @@ def optimize_portfolio_risk_parity(tickers, start_date, end_date, risk_free_rate
 
 
 @st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
-def optimize_portfolio_black_litterman(tickers, start_date, end_date, risk_free_rate=0.001):
+@tracing.traced('optimizer.hrp')
+def optimize_portfolio_hrp(tickers, start_date, end_date, risk_free_rate=0.04, cov_method=None, constraints=None):
+    """
+    Optimize portfolio using Hierarchical Risk Parity.
+
+    Assets are clustered on their correlation distances and weight is split
+    down the cluster tree by inverse variance (see hrp_weights in
+    utils/solvers.py). No matrix is inverted, so HRP stays stable for large or
+    nearly singular universes where MPT and Risk Parity struggle.
+
+    The risk-free rate is only used for reporting the Sharpe ratio.
+
+    Parameters:
+    tickers (list): List of stock ticker symbols.
+    start_date (str): Start date for historical data.
+    end_date (str): End date for historical data.
+    risk_free_rate (float): Annual risk-free rate for Sharpe ratio calculation.
+    cov_method (str, optional): Covariance estimator ('sample', 'ledoit_wolf', 'oas',
+                                'ewma', 'pca'); defaults to COVARIANCE_METHOD.
+    constraints (PortfolioConstraints, optional): Allocation constraints; the HRP
+                                                  weights are then replaced by the
+                                                  nearest feasible weights.
+
+    Returns:
+    dict: Dictionary containing optimal weights and performance metrics.
+    """
+    estimates = get_moment_estimates(tickers, start_date, end_date, cov_method)
+    available_tickers = estimates.tickers
+    mu = estimates.mu
+    S = estimates.cov
+
+    optimal_weights = hrp_weights(estimates.cov_model.dense())
+    compiled = constraints.compile(available_tickers) if constraints is not None else None
+    if compiled is not None and not compiled.long_only:
+        optimal_weights = solve_constrained(_squared_distance, _squared_distance_grad, compiled,
+                                            args=(optimal_weights,), x0=optimal_weights)
+    tracing.event('optimizer.hrp.solved', n_assets=len(available_tickers))
+
+    if np.any(np.isnan(optimal_weights)) or np.any(np.isinf(optimal_weights)):
+        raise ValueError("HRP optimization produced NaN or Inf weights")
+
+    annual_return = float(optimal_weights @ mu) * TRADING_DAYS_PER_YEAR
+    annual_volatility = float(np.sqrt(optimal_weights @ S @ optimal_weights)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    if not np.isfinite(annual_volatility) or annual_volatility <= 0:
+        raise ValueError(f"Invalid annual_volatility: {annual_volatility}")
+    annual_sharpe = (annual_return - risk_free_rate) / annual_volatility
+
+    return {
+        'weights': {t: float(w) for t, w in zip(available_tickers, optimal_weights)},
+        'expected_return': float(annual_return),
+        'volatility': float(annual_volatility),
+        'sharpe_ratio': float(annual_sharpe)
+    }
+
+
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
+@tracing.traced('optimizer.cvar')
+def optimize_portfolio_cvar(tickers, start_date, end_date, risk_free_rate=0.04, confidence=None, max_cvar=None,
+                            cov_method=None, constraints=None):
+    """
+    Optimize portfolio on historical CVaR (expected shortfall) instead of variance.
+
+    The cleaned daily returns are the scenarios. Without max_cvar the
+    minimum-CVaR portfolio is returned; with max_cvar, the highest expected
+    return portfolio whose CVaR stays within the cap. Both are one sparse
+    linear program solved with HiGHS (see min_cvar_lp in utils/solvers.py).
+
+    Parameters:
+    tickers (list): List of stock ticker symbols.
+    start_date (str): Start date for historical data.
+    end_date (str): End date for historical data.
+    risk_free_rate (float): Annual risk-free rate for Sharpe ratio calculation.
+    confidence (float, optional): CVaR confidence level; defaults to CVAR_CONFIDENCE.
+    max_cvar (float, optional): Cap on daily CVaR as a positive loss (e.g. 0.03 = 3%).
+    cov_method (str, optional): Covariance estimator used for the reported volatility.
+    constraints (PortfolioConstraints, optional): Allocation constraints, added as LP rows.
+
+    Returns:
+    dict: Same layout as optimize_portfolio_mpt, plus daily 'var' and 'cvar'
+          (positive losses) and the 'confidence' used.
+    """
+    estimates = get_moment_estimates(tickers, start_date, end_date, cov_method)
+    available_tickers = estimates.tickers
+    mu = estimates.mu
+    S = estimates.cov
+    confidence = CVAR_CONFIDENCE if confidence is None else float(confidence)
+
+    try:
+        compiled = constraints.compile(available_tickers) if constraints is not None else None
+        optimal_weights, var, cvar = min_cvar_lp(estimates.returns, confidence, max_cvar, mu, compiled)
+    except ValueError as e:
+        raise ValueError(f"CVaR optimization failed: {e}")
+
+    tracing.event('optimizer.cvar.solved', n_assets=len(available_tickers),
+                  n_scenarios=len(estimates.returns), capped=max_cvar is not None)
+
+    if np.any(np.isnan(optimal_weights)) or np.any(np.isinf(optimal_weights)):
+        raise ValueError("CVaR optimization produced NaN or Inf weights")
+
+    annual_return = float(optimal_weights @ mu) * TRADING_DAYS_PER_YEAR
+    annual_volatility = float(np.sqrt(optimal_weights @ S @ optimal_weights)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    if not np.isfinite(annual_volatility) or annual_volatility <= 0:
+        raise ValueError(f"Invalid annual_volatility: {annual_volatility}")
+    annual_sharpe = (annual_return - risk_free_rate) / annual_volatility
+
+    return {
+        'weights': {t: float(w) for t, w in zip(available_tickers, optimal_weights)},
+        'expected_return': float(annual_return),
+        'volatility': float(annual_volatility),
+        'sharpe_ratio': float(annual_sharpe),
+        'var': float(var),
+        'cvar': float(cvar),
+        'confidence': confidence
+    }
+
+
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
+@tracing.traced('optimizer.black_litterman')
+def optimize_portfolio_black_litterman(tickers, start_date, end_date, risk_free_rate=0.001, constraints=None, views=None):
     """
     Optimize portfolio using Black-Litterman model.
+    The posterior is computed in utils/black_litterman.py and memoized per
+    (prior, views), so changing only the risk-free rate skips the BL algebra.
     Cached to improve performance and reduce API calls.
     
     Parameters:
@@ -1058,6 +657,11 @@ def optimize_portfolio_black_litterman(tickers, start_date, end_date, risk_free_
     start_date (str): Start date for historical data.
     end_date (str): End date for historical data.
     risk_free_rate (float): Risk-free rate.
+    constraints (PortfolioConstraints, optional): Allocation constraints
+                                                  (utils/constraints.py); long-only if None.
+    views (BlackLittermanViews, optional): Absolute and relative views with
+                                           confidences (utils/black_litterman.py);
+                                           defaults to MSFT outperforming GOOGL by 5%.
     
     Returns:
     dict: Dictionary containing optimal weights and performance metrics.
@@ -1069,543 +673,107 @@ def optimize_portfolio_black_litterman(tickers, start_date, end_date, risk_free_
             "Then run: pip install PyPortfolioOpt"
         )
     
-    # Fetch historical stock data with retry logic
-    # Use get_multiple_tickers_history directly - data is already cached from preload
-    df = get_multiple_tickers_history(tickers, start_date, end_date)
+    # Fetch historical stock data from the shared price panel
+    # Data is already cached from preload
+    df = get_price_panel(tickers, start_date, end_date).to_frame()
     
     # Calculate the sample mean returns and the covariance matrix
     mu = expected_returns.mean_historical_return(df)
     S = risk_models.sample_cov(df)
     
-    # Define market capitalizations using cached function
-    mcap = {}
-    for ticker in tickers:
-        try:
-            # Use centralized cached function for ticker info
-            market_cap = get_ticker_info_cached(ticker, 'marketCap')
-            mcap[ticker] = market_cap
-        except Exception:
-            mcap[ticker] = None
+    # Define market capitalizations using the bulk info cache
+    market_caps = get_ticker_info_bulk(tickers, ['marketCap'])
+    mcap = {ticker: market_caps.get(ticker, {}).get('marketCap') for ticker in tickers}
     
     # Manually set the market capitalization for SPY if it's in the list
     if 'SPY' in tickers:
         mcap['SPY'] = 45000000000000
     
-    # Define beliefs (Microsoft will outperform Google by 5%)
-    # This is a simple example - in practice, you'd want to make this configurable
-    Q = np.array([0.05])
-    P = np.zeros((1, len(tickers)))
+    asset_names = list(df.columns)
+    cov_array = np.asarray(S, dtype=np.float64)
+    mu_array = np.asarray(mu, dtype=np.float64)
+    if views is None:
+        views = default_views(asset_names)
     
-    if 'MSFT' in tickers and 'GOOGL' in tickers:
-        P[0, tickers.index('MSFT')] = 1
-        P[0, tickers.index('GOOGL')] = -1
-    
-    # Calculate the market implied returns
+    # Prior returns. The market implied prior is delta * S * w_mkt + rf; it is
+    # taken in excess of the risk-free rate so the cached posterior is shared
+    # across rates (the rate is added back through the posterior's rate loading)
     if 'SPY' in tickers and all(mcap.get(t) is not None for t in tickers):
         market_prices = df["SPY"]
         delta = black_litterman.market_implied_risk_aversion(market_prices)
-        market_prior = black_litterman.market_implied_prior_returns(mcap, delta, S, risk_free_rate)
-        # Calculate market weights from market cap
-        total_mcap = sum(v for v in mcap.values() if v is not None)
-        market_weights = {t: (mcap.get(t, 0) or 0) / total_mcap for t in tickers}
-    else:
-        # If SPY is not available, use historical mean returns and equal weights
-        market_prior = mu
-        market_weights = {t: 1.0 / len(tickers) for t in tickers}
-    
-    # Create the Black-Litterman model
-    bl = BlackLittermanModel(
-        S,
-        Q=Q,
-        P=P,
-        pi=market_prior,
-        market_weights=market_weights,
-        risk_free_rate=risk_free_rate
-    )
-    
-    # Get the adjusted returns and covariance matrix
-    bl_returns = bl.bl_returns()
-    bl_cov = bl.bl_cov()
-    
-    # #region agent log
-    log_path = r"c:\Users\ohada\OneDrive\Desktop\Gen AI for Stock Analysis (2)\Gen AI for Stock Analysis\.cursor\debug.log"
-    
-    # #region agent log - After bl_returns creation
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'F',
-            'location': 'portfolio_optimizer.py:1003',
-            'message': 'BL: After bl_returns creation',
-            'data': {
-                'bl_returns_type': type(bl_returns).__name__,
-                'bl_returns_has_isna': hasattr(bl_returns, 'isna'),
-                'bl_returns_isna_any': bool(bl_returns.isna().any()) if hasattr(bl_returns, 'isna') else None,
-                'bl_returns_has_values': hasattr(bl_returns, 'values'),
-                'bl_returns_np_isnan_any': bool(np.isnan(bl_returns.values).any()) if hasattr(bl_returns, 'values') else bool(np.isnan(bl_returns).any()) if hasattr(bl_returns, '__array__') else None,
-                'bl_returns_np_isinf_any': bool(np.isinf(bl_returns.values).any()) if hasattr(bl_returns, 'values') else bool(np.isinf(bl_returns).any()) if hasattr(bl_returns, '__array__') else None,
-                'bl_returns_shape': list(bl_returns.shape) if hasattr(bl_returns, 'shape') else None,
-                'bl_returns_length': len(bl_returns) if hasattr(bl_returns, '__len__') else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Get historical mean returns (mu) for fallback - defined earlier in function
-    mu_array = mu.values if hasattr(mu, 'values') else np.asarray(mu)
-    
-    # Convert bl_returns to numpy array for cleaning
-    if hasattr(bl_returns, 'values'):
-        bl_returns_array = bl_returns.values
-        bl_returns_index = bl_returns.index
-        is_series = True
-    elif hasattr(bl_returns, '__array__'):
-        bl_returns_array = np.asarray(bl_returns)
-        bl_returns_index = None
-        is_series = False
+        market_prior = black_litterman.market_implied_prior_returns(mcap, delta, S, 0.0)
+        prior = np.asarray(market_prior.reindex(asset_names), dtype=np.float64)
+        rate_shift = risk_free_rate
     else:
-        bl_returns_array = np.asarray(bl_returns)
-        bl_returns_index = None
-        is_series = False
+        # If SPY is not available, use historical mean returns
+        prior = mu_array
+        rate_shift = 0.0
     
-    # Check for NaN/Inf in returns BEFORE cleaning
-    returns_has_nan = np.isnan(bl_returns_array).any()
-    returns_has_inf = np.isinf(bl_returns_array).any()
+    # Posterior via one Cholesky solve in view space, memoized per (prior, views)
+    posterior_mean, bl_cov, rate_loading = black_litterman_posterior(prior, cov_array, asset_names, views, BL_TAU)
+    bl_returns_array = posterior_mean + rate_shift * rate_loading
     
-    # #region agent log - Before returns cleaning
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'F',
-            'location': 'portfolio_optimizer.py:1040',
-            'message': 'BL: Before returns cleaning',
-            'data': {
-                'returns_has_nan': bool(returns_has_nan),
-                'returns_has_inf': bool(returns_has_inf),
-                'returns_shape': list(bl_returns_array.shape) if hasattr(bl_returns_array, 'shape') else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Clean returns: ALWAYS replace NaN/Inf (even if not detected, safety check)
-    # First, try to use historical mean returns (mu) as fallback for NaN values
-    # This ensures we have realistic returns instead of zeros
-    # Replace NaN with corresponding historical mean return, or 0 if that's also NaN
-    # Replace Inf with large finite values
-    for i in range(len(bl_returns_array)):
-        if np.isnan(bl_returns_array[i]):
-            # Use historical mean return if available, otherwise use 0
-            if i < len(mu_array) and not np.isnan(mu_array[i]):
-                bl_returns_array[i] = mu_array[i]
-            else:
-                bl_returns_array[i] = 0.0
-        elif np.isinf(bl_returns_array[i]):
-            bl_returns_array[i] = 1e6 if bl_returns_array[i] > 0 else -1e6
-    
-    # Final validation: ensure no NaN/Inf remain
-    if np.isnan(bl_returns_array).any() or np.isinf(bl_returns_array).any():
-        # If still has NaN/Inf, replace with mean of non-NaN values or historical mean
-        if len(bl_returns_array) > 0:
-            non_nan_values = bl_returns_array[~np.isnan(bl_returns_array) & ~np.isinf(bl_returns_array)]
-            if len(non_nan_values) > 0:
-                mean_val = np.mean(non_nan_values)
-            elif len(mu_array) > 0:
-                mean_val = np.nanmean(mu_array) if not np.isnan(np.nanmean(mu_array)) else 0.0
-            else:
-                mean_val = 0.0
-            bl_returns_array = np.where(np.isnan(bl_returns_array) | np.isinf(bl_returns_array), mean_val, bl_returns_array)
-    
-    # Convert back to Series if original was Series, otherwise keep as array
-    if is_series and bl_returns_index is not None:
-        bl_returns = pd.Series(bl_returns_array, index=bl_returns_index)
-    else:
-        bl_returns = bl_returns_array
+    # Clean returns: NaN falls back to the historical mean return (or 0 if
+    # that is also NaN) and Inf is clipped to large finite values
+    bl_returns_array = np.where(np.isnan(bl_returns_array), np.nan_to_num(mu_array, nan=0.0), bl_returns_array)
+    bl_returns_array = np.nan_to_num(bl_returns_array, posinf=1e6, neginf=-1e6)
     
     # Validate that at least one return exceeds risk-free rate
     # This is required for the optimization to be feasible
-    max_return = np.max(bl_returns_array) if len(bl_returns_array) > 0 else 0.0
-    min_return = np.min(bl_returns_array) if len(bl_returns_array) > 0 else 0.0
-    
-    # #region agent log - After returns cleaning
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'F',
-            'location': 'portfolio_optimizer.py:1095',
-            'message': 'BL: After returns cleaning',
-            'data': {
-                'had_nan': bool(returns_has_nan),
-                'had_inf': bool(returns_has_inf),
-                'has_nan_after': bool(np.isnan(bl_returns_array).any()),
-                'has_inf_after': bool(np.isinf(bl_returns_array).any()),
-                'is_finite': bool(np.isfinite(bl_returns_array).all()),
-                'max_return': float(max_return),
-                'min_return': float(min_return),
-                'risk_free_rate': float(risk_free_rate),
-                'max_exceeds_rf': bool(max_return > risk_free_rate)
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
+    max_return = float(np.max(bl_returns_array)) if len(bl_returns_array) > 0 else 0.0
+    min_return = float(np.min(bl_returns_array)) if len(bl_returns_array) > 0 else 0.0
     
     # If no return exceeds risk-free rate, adjust returns to ensure feasibility
     if max_return <= risk_free_rate:
-        # #region agent log - Adjusting returns for feasibility
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'F',
-                'location': 'portfolio_optimizer.py:1120',
-                'message': 'BL: Adjusting returns - max return does not exceed risk-free rate',
-                'data': {
-                    'max_return_before': float(max_return),
-                    'risk_free_rate': float(risk_free_rate),
-                    'adjustment_needed': True
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
-        
-        # Add a small premium to all returns to ensure at least one exceeds risk-free rate
-        # Use historical mean returns as baseline if available
-        if len(mu_array) > 0 and len(mu_array) == len(bl_returns_array):
-            # Use historical mean returns, ensuring at least one exceeds risk-free rate
-            mu_max = np.max(mu_array)
-            if mu_max > risk_free_rate:
-                # Scale historical returns to ensure feasibility
-                bl_returns_array = mu_array.copy()
-            else:
-                # Add premium to make it feasible
-                premium = risk_free_rate - mu_max + 0.01  # Add 1% above risk-free rate
-                bl_returns_array = mu_array + premium
-        else:
-            # Fallback: add premium to current returns
-            premium = risk_free_rate - max_return + 0.01  # Add 1% above risk-free rate
-            bl_returns_array = bl_returns_array + premium
-        
-        # Update bl_returns with adjusted array
-        if is_series and bl_returns_index is not None:
-            bl_returns = pd.Series(bl_returns_array, index=bl_returns_index)
+        # Use historical mean returns as baseline, adding a premium (1% above
+        # the risk-free rate) if even those do not beat the risk-free rate
+        mu_max = float(np.max(mu_array))
+        if mu_max > risk_free_rate:
+            bl_returns_array = mu_array.copy()
         else:
-            bl_returns = bl_returns_array
-        
-        # Verify adjustment worked
-        max_return_after = np.max(bl_returns_array) if len(bl_returns_array) > 0 else 0.0
-        
-        # #region agent log - After adjustment
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'F',
-                'location': 'portfolio_optimizer.py:1165',
-                'message': 'BL: After returns adjustment',
-                'data': {
-                    'max_return_after': float(max_return_after),
-                    'min_return_after': float(np.min(bl_returns_array)) if len(bl_returns_array) > 0 else 0.0,
-                    'max_exceeds_rf_after': bool(max_return_after > risk_free_rate),
-                    'risk_free_rate': float(risk_free_rate)
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
-    
-    # Convert to numpy array if it's a DataFrame
-    if hasattr(bl_cov, 'values'):
-        bl_cov = bl_cov.values
-    bl_cov = np.asarray(bl_cov)
-    
-    # Check for NaN/Inf in covariance matrix BEFORE computing eigenvalues
-    cov_has_nan = np.isnan(bl_cov).any()
-    cov_has_inf = np.isinf(bl_cov).any()
+            bl_returns_array = mu_array + (risk_free_rate - mu_max + 0.01)
+        tracing.count('optimizer.black_litterman.returns_adjusted')
+    bl_returns = pd.Series(bl_returns_array, index=asset_names)
     
-    # #region agent log - Before validation
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'portfolio_optimizer.py:1010',
-            'message': 'BL: Before covariance validation',
-            'data': {
-                'cov_has_nan': bool(cov_has_nan),
-                'cov_has_inf': bool(cov_has_inf),
-                'cov_shape': list(bl_cov.shape) if hasattr(bl_cov, 'shape') else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Clean covariance matrix: ALWAYS replace NaN/Inf (even if not detected, safety check)
-    # Replace NaN with 0, Inf with large finite values
+    # Clean covariance matrix: replace NaN with 0 and Inf with large finite values
     bl_cov = np.nan_to_num(bl_cov, nan=0.0, posinf=1e6, neginf=-1e6)
-    # Add small regularization to diagonal to ensure stability
-    bl_cov = bl_cov + np.eye(len(bl_cov)) * 1e-8
-    
-    # Final validation: ensure no NaN/Inf remain
-    if np.isnan(bl_cov).any() or np.isinf(bl_cov).any():
-        # If still has NaN/Inf, replace with identity matrix scaled by variance
-        bl_cov = np.eye(len(bl_cov)) * np.diag(bl_cov).mean() if len(bl_cov) > 0 else bl_cov
-    
-    # #region agent log - After cleaning
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'portfolio_optimizer.py:1045',
-            'message': 'BL: Cleaned covariance matrix (NaN/Inf removed)',
-            'data': {
-                'had_nan': bool(cov_has_nan),
-                'had_inf': bool(cov_has_inf),
-                'has_nan_after': bool(np.isnan(bl_cov).any()),
-                'has_inf_after': bool(np.isinf(bl_cov).any()),
-                'is_finite': bool(np.isfinite(bl_cov).all())
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
-    # Now safe to compute eigenvalues
-    try:
-        # Hypothesis A: Check covariance matrix properties
-        cov_eigenvals = np.linalg.eigvals(bl_cov)
-        cov_min_eigenval = np.min(cov_eigenvals)
-        cov_max_eigenval = np.max(cov_eigenvals)
-        cov_is_psd = np.all(cov_eigenvals >= -1e-8)
-        cov_has_nan = np.isnan(bl_cov).any()
-        cov_has_inf = np.isinf(bl_cov).any()
-        
-        # Hypothesis B: Check expected returns
-        returns_has_nan = bl_returns.isna().any() if hasattr(bl_returns, 'isna') else np.isnan(bl_returns).any()
-        returns_has_inf = np.isinf(bl_returns).any() if hasattr(bl_returns, 'values') else np.isinf(bl_returns).any()
-        returns_min = float(bl_returns.min()) if hasattr(bl_returns, 'min') else float(np.min(bl_returns))
-        returns_max = float(bl_returns.max()) if hasattr(bl_returns, 'max') else float(np.max(bl_returns))
-        
-        # Hypothesis C: Check input data quality
-        # Clean S before computing eigenvalues
-        S_has_nan = np.isnan(S).any()
-        S_has_inf = np.isinf(S).any()
-        if S_has_nan or S_has_inf:
-            S = np.nan_to_num(S, nan=0.0, posinf=1e6, neginf=-1e6)
-        S_min_eigenval = np.min(np.linalg.eigvals(S))
-        market_prior_has_nan = np.isnan(market_prior).any() if hasattr(market_prior, '__iter__') else np.isnan(market_prior)
-        
-        # Hypothesis D: Check solver configuration
-        solver_info = {'risk_free_rate': float(risk_free_rate), 'num_assets': len(tickers)}
-        
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'portfolio_optimizer.py:337',
-            'message': 'Covariance matrix properties before optimization',
-            'data': {
-                'cov_min_eigenval': float(cov_min_eigenval),
-                'cov_max_eigenval': float(cov_max_eigenval),
-                'cov_is_psd': bool(cov_is_psd),
-                'cov_has_nan': bool(cov_has_nan_after),
-                'cov_has_inf': bool(cov_has_inf_after),
-                'cov_shape': list(bl_cov.shape) if hasattr(bl_cov, 'shape') else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-        
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'portfolio_optimizer.py:338',
-            'message': 'Expected returns properties before optimization',
-            'data': {
-                'returns_has_nan': bool(returns_has_nan),
-                'returns_has_inf': bool(returns_has_inf),
-                'returns_min': returns_min,
-                'returns_max': returns_max,
-                'returns_count': len(bl_returns) if hasattr(bl_returns, '__len__') else None
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-        
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'C',
-            'location': 'portfolio_optimizer.py:339',
-            'message': 'Input data quality (S and market_prior)',
-            'data': {
-                'S_min_eigenval': float(S_min_eigenval),
-                'S_has_nan': bool(S_has_nan),
-                'market_prior_has_nan': bool(market_prior_has_nan),
-                'tickers': tickers
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-        
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'D',
-            'location': 'portfolio_optimizer.py:340',
-            'message': 'Solver configuration',
-            'data': solver_info,
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception as log_err:
-        pass  # Don't fail on logging errors
-    # #endregion
-    
-    # Validate covariance matrix before optimization
-    # Ensure it's positive semi-definite
-    cov_eigenvals = np.linalg.eigvals(bl_cov)
-    min_eigenval = np.min(cov_eigenvals)
-    if min_eigenval < -1e-8:
-        # Add regularization to make it positive semi-definite
-        regularization = abs(min_eigenval) + 1e-8
-        bl_cov = bl_cov + np.eye(len(bl_cov)) * regularization
-        # #region agent log
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'E',
-                'location': 'portfolio_optimizer.py:1110',
-                'message': 'BL: Added regularization to covariance matrix',
-                'data': {
-                    'min_eigenval_before': float(min_eigenval),
-                    'regularization': float(regularization)
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
     
-    # Validate returns (after cleaning, should not have NaN/Inf)
-    # Get array for validation
-    returns_array = bl_returns.values if hasattr(bl_returns, 'values') else (np.asarray(bl_returns) if hasattr(bl_returns, '__array__') else bl_returns)
-    
-    if np.isnan(returns_array).any():
-        # #region agent log - Validation failed
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'F',
-                'location': 'portfolio_optimizer.py:1408',
-                'message': 'BL: Returns validation FAILED - still has NaN after cleaning',
-                'data': {
-                    'has_nan': bool(np.isnan(returns_array).any()),
-                    'nan_count': int(np.isnan(returns_array).sum())
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
-        # Final attempt: replace any remaining NaN with 0
-        returns_array = np.nan_to_num(returns_array, nan=0.0)
-        if hasattr(bl_returns, 'index'):
-            bl_returns = pd.Series(returns_array, index=bl_returns.index)
-        else:
-            bl_returns = returns_array
-    
-    if np.isinf(returns_array).any():
-        # #region agent log - Validation failed
+    # Ensure the covariance is positive definite: a Cholesky factorization is
+    # tried first and the diagonal is only loaded if it fails
+    bl_cov, _, bl_cov_loading = condition_covariance(bl_cov)
+    
+    if bl_cov_loading > 0:
+        tracing.count('optimizer.black_litterman.cov_loaded')
+    if tracing.enabled():
+        tracing.event(
+            'optimizer.black_litterman.inputs',
+            n_assets=len(tickers),
+            n_views=len(views),
+            risk_free_rate=float(risk_free_rate),
+            returns_min=min_return,
+            returns_max=max_return,
+            cov_diagonal_loading=float(bl_cov_loading),
+            cov_min_variance=float(np.min(np.diag(bl_cov))) if len(bl_cov) else None
+        )
+    compiled = constraints.compile(asset_names) if constraints is not None else None
+    if compiled is not None and not compiled.long_only:
+        # Constrained maximum Sharpe on the posterior (annual) moments
         try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'F',
-                'location': 'portfolio_optimizer.py:1430',
-                'message': 'BL: Returns validation FAILED - still has Inf after cleaning',
-                'data': {
-                    'has_inf': bool(np.isinf(returns_array).any()),
-                    'inf_count': int(np.isinf(returns_array).sum())
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
-        # Final attempt: replace any remaining Inf with finite values
-        returns_array = np.nan_to_num(returns_array, posinf=1e6, neginf=-1e6)
-        if hasattr(bl_returns, 'index'):
-            bl_returns = pd.Series(returns_array, index=bl_returns.index)
-        else:
-            bl_returns = returns_array
+            weights = max_sharpe_constrained(bl_returns_array, bl_cov, compiled, risk_free_rate)
+        except ValueError as e:
+            raise ValueError(f"Black-Litterman optimization failed: {e}")
+        annual_return = float(weights @ bl_returns_array)
+        annual_volatility = float(np.sqrt(weights @ bl_cov @ weights))
+        return {
+            'weights': {t: float(w) for t, w in zip(compiled.tickers, weights)},
+            'expected_return': annual_return,
+            'volatility': annual_volatility,
+            'sharpe_ratio': (annual_return - risk_free_rate) / annual_volatility if annual_volatility > 0 else 0.0
+        }
     
     # Optimize the portfolio for maximum Sharpe ratio
     ef = EfficientFrontier(bl_returns, bl_cov)
     
-    # #region agent log
-    try:
-        log_entry = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'portfolio_optimizer.py:1130',
-            'message': 'About to call max_sharpe',
-            'data': {
-                'ef_created': True,
-                'risk_free_rate': float(risk_free_rate),
-                'num_assets': len(tickers)
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception:
-        pass
-    # #endregion
-    
     try:
         weights = ef.max_sharpe(risk_free_rate=risk_free_rate)
         cleaned_weights = ef.clean_weights()
@@ -1620,29 +788,7 @@ def optimize_portfolio_black_litterman(tickers, start_date, end_date, risk_free_
             'sharpe_ratio': performance[2]
         }
     except Exception as solver_err:
-        # #region agent log - Solver error
-        try:
-            log_entry = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'E',
-                'location': 'portfolio_optimizer.py:1160',
-                'message': 'BL: Solver error caught',
-                'data': {
-                    'error_type': type(solver_err).__name__,
-                    'error_message': str(solver_err),
-                    'cov_min_eigenval': float(np.min(np.linalg.eigvals(bl_cov))),
-                    'cov_has_nan': bool(np.isnan(bl_cov).any()),
-                    'returns_has_nan': bool(bl_returns.isna().any() if hasattr(bl_returns, 'isna') else np.isnan(bl_returns).any())
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception:
-            pass
-        # #endregion
-        
+        tracing.event('optimizer.black_litterman.solver_error', error=f"{type(solver_err).__name__}: {solver_err}")
         # Provide helpful error message
         error_msg = (
             f"Portfolio optimization failed with solver error: {str(solver_err)}\n"
@@ -1657,3 +803,172 @@ def optimize_portfolio_black_litterman(tickers, start_date, end_date, risk_free_
         )
         raise ValueError(error_msg) from solver_err
 
+
+class FrontierResult:
+    """
+    Efficient frontier as aligned arrays (one row per frontier point).
+
+    Attributes:
+    tickers (list): Ticker symbols (columns of weights).
+    returns (np.ndarray): Annual expected returns.
+    volatilities (np.ndarray): Annual volatilities.
+    sharpe_ratios (np.ndarray): Annual Sharpe ratios.
+    weights (np.ndarray): (n_points, n_assets) portfolio weights.
+    """
+
+    def __init__(self, tickers, returns, volatilities, sharpe_ratios, weights):
+        self.tickers = list(tickers)
+        self.returns = returns
+        self.volatilities = volatilities
+        self.sharpe_ratios = sharpe_ratios
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.returns)
+
+    def max_sharpe_index(self):
+        """Index of the frontier point with the highest Sharpe ratio."""
+        return int(np.argmax(self.sharpe_ratios))
+
+    def to_frame(self):
+        """Frontier points as a DataFrame (Return, Volatility, Sharpe Ratio, then one weight column per ticker)."""
+        df = pd.DataFrame(self.weights, columns=self.tickers)
+        df.insert(0, 'Sharpe Ratio', self.sharpe_ratios)
+        df.insert(0, 'Volatility', self.volatilities)
+        df.insert(0, 'Return', self.returns)
+        return df
+
+
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
+def compute_efficient_frontier(tickers, start_date, end_date, n_points=100, risk_free_rate=0.04, cov_method=None):
+    """
+    Compute the long-only efficient frontier in one call.
+
+    Uses the shared estimation stage and the warm-started active-set solver in
+    utils/solvers.py; every point is an exact minimum-variance portfolio for
+    its target return.
+
+    Parameters:
+    tickers (list): List of stock ticker symbols.
+    start_date (str): Start date for historical data.
+    end_date (str): End date for historical data.
+    n_points (int): Number of frontier points.
+    risk_free_rate (float): Annual risk-free rate for the Sharpe ratios.
+    cov_method (str, optional): Covariance estimator ('sample', 'ledoit_wolf', 'oas',
+                                'ewma', 'pca'); defaults to COVARIANCE_METHOD.
+
+    Returns:
+    FrontierResult: Annualized frontier points, from minimum variance to maximum return.
+    """
+    estimates = get_moment_estimates(tickers, start_date, end_date, cov_method)
+    _, weights = efficient_frontier(estimates.mu, estimates.cov, n_points)
+
+    daily_returns = weights @ estimates.mu
+    daily_std = np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', weights, estimates.cov, weights), 0.0))
+    annual_returns = daily_returns * TRADING_DAYS_PER_YEAR
+    annual_volatilities = daily_std * np.sqrt(TRADING_DAYS_PER_YEAR)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(annual_volatilities > 0, (annual_returns - risk_free_rate) / annual_volatilities, 0.0)
+
+    return FrontierResult(estimates.tickers, annual_returns, annual_volatilities, sharpe, weights)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
+def compute_random_portfolios(tickers, start_date, end_date, n_portfolios=5000, risk_free_rate=0.04,
+                              cov_method=None, seed=42):
+    """
+    Simulate random long-only portfolios for plotting against the efficient frontier.
+
+    Parameters:
+    tickers (list): List of stock ticker symbols.
+    start_date (str): Start date for historical data.
+    end_date (str): End date for historical data.
+    n_portfolios (int): Number of Dirichlet-distributed random portfolios.
+    risk_free_rate (float): Annual risk-free rate for the Sharpe ratios.
+    cov_method (str, optional): Covariance estimator; defaults to COVARIANCE_METHOD.
+    seed (int): Seed, so reruns draw the same cloud.
+
+    Returns:
+    pd.DataFrame: Annual 'Return', 'Volatility' and 'Sharpe Ratio' per portfolio.
+    """
+    estimates = get_moment_estimates(tickers, start_date, end_date, cov_method)
+    daily_returns, daily_std, _ = simulate_random_portfolios(
+        estimates.mu, estimates.cov, n_portfolios, seed=seed
+    )
+    annual_returns = daily_returns * TRADING_DAYS_PER_YEAR
+    annual_volatilities = daily_std * np.sqrt(TRADING_DAYS_PER_YEAR)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(annual_volatilities > 0, (annual_returns - risk_free_rate) / annual_volatilities, 0.0)
+    return pd.DataFrame({'Return': annual_returns, 'Volatility': annual_volatilities, 'Sharpe Ratio': sharpe})
+
+
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
+def optimize_portfolio_resampled(tickers, start_date, end_date, risk_free_rate=0.04, n_resamples=None,
+                                 seed=42, cov_method=None, confidence=0.9, max_workers=None, constraints=None):
+    """
+    Optimize portfolio with resampled (bootstrap-averaged) maximum Sharpe weights.
+
+    The cleaned daily returns are bootstrapped n_resamples times, each resample
+    is solved for its long-only tangency portfolio and the weights are
+    averaged, which is far more stable than a single max-Sharpe solve.
+    Performance is reported on the full-sample estimates.
+
+    Parameters:
+    tickers (list): List of stock ticker symbols.
+    start_date (str): Start date for historical data.
+    end_date (str): End date for historical data.
+    risk_free_rate (float): Annual risk-free rate.
+    n_resamples (int, optional): Bootstrap resamples; defaults to RESAMPLE_COUNT.
+    seed (int): Seed for reproducible resampling.
+    cov_method (str, optional): Covariance estimator; defaults to COVARIANCE_METHOD.
+    confidence (float): Coverage of the reported weight intervals.
+    max_workers (int, optional): Worker processes; defaults to RESAMPLE_MAX_WORKERS.
+    constraints (PortfolioConstraints, optional): Allocation constraints applied to
+                                                  every resample. Bounds, group and
+                                                  turnover limits also hold for the
+                                                  average; position size and count
+                                                  limits only per resample.
+
+    Returns:
+    dict: Same layout as optimize_portfolio_mpt, plus 'weight_intervals'
+          ({ticker: (lower, upper)}), 'weight_std' and 'n_resamples'.
+    """
+    estimates = get_moment_estimates(tickers, start_date, end_date, cov_method)
+    available_tickers = estimates.tickers
+    mu = estimates.mu
+    S = estimates.cov
+
+    resampled = resampled_max_sharpe(
+        estimates.returns,
+        risk_free_rate / TRADING_DAYS_PER_YEAR,
+        n_resamples=n_resamples if n_resamples is not None else RESAMPLE_COUNT,
+        seed=seed,
+        max_workers=max_workers if max_workers is not None else RESAMPLE_MAX_WORKERS,
+        confidence=confidence,
+        cov_method=(cov_method or COVARIANCE_METHOD).strip().lower(),
+        halflife=COVARIANCE_EWMA_HALFLIFE,
+        n_factors=COVARIANCE_PCA_FACTORS,
+        constraints=constraints.compile(available_tickers) if constraints is not None else None
+    )
+    optimal_weights = resampled.weights
+
+    if np.any(np.isnan(optimal_weights)) or np.any(np.isinf(optimal_weights)):
+        raise ValueError("Resampled optimization produced NaN or Inf weights")
+
+    annual_return = float(optimal_weights @ mu) * TRADING_DAYS_PER_YEAR
+    annual_volatility = float(np.sqrt(optimal_weights @ S @ optimal_weights)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    if not np.isfinite(annual_volatility) or annual_volatility <= 0:
+        raise ValueError(f"Invalid annual_volatility: {annual_volatility}")
+    annual_sharpe = (annual_return - risk_free_rate) / annual_volatility
+
+    return {
+        'weights': {t: float(max(0.0, w)) for t, w in zip(available_tickers, optimal_weights)},
+        'expected_return': float(annual_return),
+        'volatility': float(annual_volatility),
+        'sharpe_ratio': float(annual_sharpe),
+        'weight_intervals': {
+            t: (float(lo), float(hi)) for t, lo, hi in zip(available_tickers, resampled.lower, resampled.upper)
+        },
+        'weight_std': {t: float(sd) for t, sd in zip(available_tickers, resampled.std)},
+        'n_resamples': len(resampled)
+    }
@@ -0,0 +1,208 @@
+"""
+Aligned price panel shared by the KPI, chart and optimizer code.
+
+A PricePanel is built once per (universe, date range) from the combined close
+prices and then treated as immutable: the price block is a read-only,
+C-contiguous float64 array, and derived views (returns, validity masks,
+cleaned returns) are computed on first use and memoized on the panel.
+Panels are shared across sessions and threads (st.cache_resource), so the
+memo is guarded by a lock and ticker selections are kept in a small LRU.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.caching import read_only
+
+
+# Selected sub-panels memoized per panel (each holds a copy of its columns)
+SELECT_CACHE_SIZE = 8
+
+
+class PricePanel:
+    """
+    Close prices for a set of tickers on a common date index.
+
+    Attributes:
+    values (np.ndarray): (n_dates, n_assets) read-only float64 prices, NaN where missing.
+    dates (pd.DatetimeIndex): Trading dates (rows).
+    tickers (pd.Index): Ticker symbols (columns).
+    """
+
+    def __init__(self, values, dates, tickers):
+        values = np.array(values, dtype=np.float64, order='C', copy=True)
+        if values.ndim != 2 or values.shape != (len(dates), len(tickers)):
+            raise ValueError(
+                f"Price block shape {values.shape} does not match "
+                f"{len(dates)} dates x {len(tickers)} tickers"
+            )
+        self.values = read_only(values)
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = pd.Index(tickers)
+        self._derived = {}
+        self._selections = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build a panel from a DataFrame with dates as rows and tickers as columns.
+
+        Non-numeric entries become NaN; rows are sorted by date.
+        """
+        df = df.sort_index()
+        values = df.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        return cls(values, df.index, df.columns)
+
+    def __getstate__(self):
+        # Derived views are cheap to rebuild and would bloat cached pickles
+        return {'values': np.array(self.values), 'dates': self.dates, 'tickers': self.tickers}
+
+    def __setstate__(self, state):
+        self.__init__(state['values'], state['dates'], state['tickers'])
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __repr__(self):
+        return f"PricePanel({len(self.dates)} dates x {len(self.tickers)} tickers)"
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def _memo(self, key, compute):
+        with self._lock:
+            if key in self._derived:
+                return self._derived[key]
+        # Computed outside the lock (derived views build on each other); a
+        # concurrent duplicate computation is harmless and the first one wins
+        value = compute()
+        with self._lock:
+            return self._derived.setdefault(key, value)
+
+    def fingerprint(self):
+        """Content hash of dates, tickers and prices (stable across processes)."""
+        def _compute():
+            h = hashlib.blake2b(digest_size=16)
+            h.update(np.ascontiguousarray(self.dates.asi8).tobytes())
+            h.update('\x1f'.join(map(str, self.tickers)).encode('utf-8'))
+            h.update(self.values.tobytes())
+            return h.hexdigest()
+        return self._memo('fingerprint', _compute)
+
+    def valid_mask(self):
+        """Boolean (n_dates, n_assets) array, True where a price is present and finite."""
+        return self._memo('valid_mask', lambda: read_only(np.isfinite(self.values)))
+
+    def valid_counts(self):
+        """Number of valid prices per ticker."""
+        return self._memo('valid_counts', lambda: read_only(self.valid_mask().sum(axis=0)))
+
+    def simple_returns(self):
+        """
+        Simple returns aligned with the price rows (first row NaN), as pct_change(fill_method=None).
+        Infinite values (from zero prices) are left in place.
+        """
+        def _compute():
+            returns = np.full_like(self.values, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns[1:] = self.values[1:] / self.values[:-1] - 1.0
+            return read_only(returns)
+        return self._memo('simple_returns', _compute)
+
+    def log_returns(self):
+        """Log returns aligned with the price rows (first row NaN)."""
+        def _compute():
+            returns = np.full_like(self.values, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns[1:] = np.log(self.values[1:] / self.values[:-1])
+            return read_only(returns)
+        return self._memo('log_returns', _compute)
+
+    def clean_returns(self):
+        """
+        Simple returns cleaned the way the optimizers expect: infinities become
+        NaN, then forward fill, backward fill and remaining NaN set to 0.
+        """
+        def _compute():
+            returns = np.where(np.isinf(self.simple_returns()), np.nan, self.simple_returns())
+            returns = pd.DataFrame(returns).ffill(axis=0).bfill(axis=0).fillna(0).to_numpy(dtype=np.float64)
+            return read_only(np.ascontiguousarray(returns))
+        return self._memo('clean_returns', _compute)
+
+    def causal_returns(self):
+        """
+        Simple returns without look-ahead, for walk-forward use: prices are
+        forward filled only, so a gap earns 0 and the move since the last price
+        lands on the day trading resumes. Rows before a ticker's first price
+        stay NaN (never back-filled); infinities become NaN.
+        """
+        def _compute():
+            prices = pd.DataFrame(self.values).ffill(axis=0).to_numpy(dtype=np.float64)
+            returns = np.full_like(prices, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns[1:] = prices[1:] / prices[:-1] - 1.0
+            returns[np.isinf(returns)] = np.nan
+            return read_only(returns)
+        return self._memo('causal_returns', _compute)
+
+    def to_frame(self, values=None):
+        """
+        Wrap the prices (or any array aligned with the panel) as a DataFrame.
+
+        Parameters:
+        values (np.ndarray, optional): (n_dates, n_assets) array; defaults to the prices.
+
+        Returns:
+        pd.DataFrame: Dates as rows, tickers as columns (no copy of the data).
+        """
+        values = self.values if values is None else values
+        return pd.DataFrame(values, index=self.dates, columns=self.tickers, copy=False)
+
+    def column(self, ticker):
+        """Return a ticker's valid prices as a Series (missing dates dropped)."""
+        j = self.tickers.get_loc(ticker)
+        mask = self.valid_mask()[:, j]
+        return pd.Series(self.values[mask, j], index=self.dates[mask], name=ticker)
+
+    def close_frame(self, ticker):
+        """Return a ticker's valid prices as a one-column 'Close' DataFrame for charting."""
+        if ticker not in self.tickers:
+            return pd.DataFrame(columns=['Close'])
+        return self.column(ticker).to_frame(name='Close')
+
+    def select(self, tickers):
+        """Return a panel restricted to (and ordered by) the given tickers."""
+        tickers = list(tickers)
+        if tickers == list(self.tickers):
+            return self
+        key = tuple(tickers)
+        with self._lock:
+            if key in self._selections:
+                self._selections.move_to_end(key)
+                return self._selections[key]
+
+        idx = self.tickers.get_indexer(tickers)
+        if (idx < 0).any():
+            missing = [t for t, i in zip(tickers, idx) if i < 0]
+            raise KeyError(f"Tickers not in panel: {missing}")
+        selected = PricePanel(self.values[:, idx], self.dates, tickers)
+        with self._lock:
+            selected = self._selections.setdefault(key, selected)
+            self._selections.move_to_end(key)
+            while len(self._selections) > SELECT_CACHE_SIZE:
+                self._selections.popitem(last=False)
+        return selected
+
+    def drop_empty_columns(self):
+        """Return a panel without tickers that have no valid price at all."""
+        def _compute():
+            keep = self.valid_counts() > 0
+            if keep.all():
+                return self
+            return PricePanel(self.values[:, keep], self.dates, self.tickers[keep])
+        return self._memo('drop_empty_columns', _compute)
@@ -0,0 +1,356 @@
+"""
+Persistent on-disk price store for downloaded ticker histories.
+
+Each ticker is kept as one columnar file (Parquet when pyarrow is installed,
+pickle otherwise) plus a small JSON sidecar recording the date range the file
+is known to cover. Files are replaced atomically, so every worker process on
+the host can share the same store directory safely.
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+from datetime import datetime
+from urllib.parse import quote
+
+import pandas as pd
+
+from config.settings import PRICE_STORE_ENABLED, PRICE_STORE_DIR
+
+# Parquet needs pyarrow; fall back to pickle so the store works without it
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+_DATA_SUFFIX = '.parquet' if PARQUET_AVAILABLE else '.pkl'
+
+_stats_lock = threading.Lock()
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'writes': 0,
+    'network_fetches': 0,
+    'network_seconds': 0.0,
+    'delta_rows': 0,
+    'seconds_saved': 0.0,
+}
+
+
+def is_enabled():
+    """Return True if the on-disk store is enabled in settings."""
+    return PRICE_STORE_ENABLED
+
+
+def _ticker_paths(ticker):
+    """Return (data_path, meta_path) for a ticker, with a filesystem-safe name."""
+    safe_name = quote(str(ticker).upper(), safe='')
+    base = os.path.join(PRICE_STORE_DIR, safe_name)
+    return base + _DATA_SUFFIX, base + '.json'
+
+
+def _atomic_write(path, write_func):
+    """Write a file via a temporary file in the same directory and os.replace it."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    os.close(fd)
+    try:
+        write_func(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _to_date_str(value):
+    """Normalize a date-like value to 'YYYY-MM-DD'."""
+    if isinstance(value, str):
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+    return value.strftime('%Y-%m-%d')
+
+
+def covered_end_for(end_date):
+    """
+    Cap a requested (exclusive) end date at today.
+
+    Bars before today are final, so coverage is never claimed for dates that
+    have not closed yet.
+    """
+    end_str = _to_date_str(end_date)
+    today_str = datetime.today().strftime('%Y-%m-%d')
+    return min(end_str, today_str)
+
+
+def load(ticker):
+    """
+    Load a stored history and its metadata.
+
+    Parameters:
+    ticker (str): Stock ticker symbol.
+
+    Returns:
+    tuple: (DataFrame, dict) or (None, None) if the ticker is not stored.
+    """
+    if not PRICE_STORE_ENABLED:
+        return None, None
+
+    data_path, meta_path = _ticker_paths(ticker)
+    # Metadata is read first and written last, so the data file is never older
+    # than the coverage it claims
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if PARQUET_AVAILABLE:
+            df = pd.read_parquet(data_path)
+        else:
+            df = pd.read_pickle(data_path)
+    except (OSError, ValueError):
+        return None, None
+    except Exception:
+        # Corrupt or partially written file - treat as not stored
+        return None, None
+
+    return df, meta
+
+
+def load_meta(ticker):
+    """
+    Load only the metadata sidecar of a stored history (the data file is not read).
+
+    Parameters:
+    ticker (str): Stock ticker symbol.
+
+    Returns:
+    dict or None: Metadata, or None if the ticker is not stored.
+    """
+    if not PRICE_STORE_ENABLED:
+        return None
+
+    data_path, meta_path = _ticker_paths(ticker)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # The sidecar is written last, but the data file may have been removed since
+    if not os.path.exists(data_path):
+        return None
+    return meta
+
+
+def save(ticker, df, covered_start, covered_end, fetch_seconds=0.0):
+    """
+    Persist a ticker history and the date range it covers.
+
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    df (pd.DataFrame): Full history to store.
+    covered_start (str): First date (inclusive) the history is complete for.
+    covered_end (str): Last date (exclusive) the history is complete for.
+    fetch_seconds (float): Network time spent producing this history.
+    """
+    if not PRICE_STORE_ENABLED or df is None or df.empty:
+        return
+
+    data_path, meta_path = _ticker_paths(ticker)
+    meta = {
+        'ticker': ticker,
+        'covered_start': _to_date_str(covered_start),
+        'covered_end': _to_date_str(covered_end),
+        'rows': int(len(df)),
+        'fetch_seconds': float(fetch_seconds),
+        'updated_at': int(time.time()),
+    }
+
+    try:
+        if PARQUET_AVAILABLE:
+            _atomic_write(data_path, lambda p: df.to_parquet(p))
+        else:
+            _atomic_write(data_path, lambda p: df.to_pickle(p))
+        _atomic_write(meta_path, lambda p: _write_json(p, meta))
+    except Exception as e:
+        # The store is an optimization - never fail a download because of it
+        print(f"Warning: Failed to write price store entry for {ticker}: {str(e)}")
+        return
+
+    with _stats_lock:
+        _stats['writes'] += 1
+
+
+def _write_json(path, payload):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+
+
+def _info_path(ticker):
+    safe_name = quote(str(ticker).upper(), safe='')
+    return os.path.join(PRICE_STORE_DIR, 'info', safe_name + '.json')
+
+
+def load_info(ticker, max_age):
+    """
+    Load projected ticker info stored less than max_age seconds ago.
+
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    max_age (float): Maximum age of the entry in seconds.
+
+    Returns:
+    dict or None: Stored info fields, or None if missing or expired.
+    """
+    if not PRICE_STORE_ENABLED:
+        return None
+    try:
+        with open(_info_path(ticker), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get('fetched_at', 0) > max_age:
+        return None
+    return entry.get('fields')
+
+
+def save_info(ticker, fields):
+    """
+    Persist projected ticker info fields.
+
+    Parameters:
+    ticker (str): Stock ticker symbol.
+    fields (dict): Field name to value (JSON-serializable).
+    """
+    if not PRICE_STORE_ENABLED:
+        return
+    entry = {'ticker': ticker, 'fetched_at': time.time(), 'fields': fields}
+    try:
+        _atomic_write(_info_path(ticker), lambda p: _write_json(p, entry))
+    except Exception as e:
+        print(f"Warning: Failed to write info store entry for {ticker}: {str(e)}")
+
+
+def covers(meta, start_date, end_date):
+    """Return True if the stored coverage contains [start_date, end_date)."""
+    if not meta:
+        return False
+    start_str = _to_date_str(start_date)
+    end_str = covered_end_for(end_date)
+    return meta['covered_start'] <= start_str and end_str <= meta['covered_end']
+
+
+def missing_ranges(stored, meta, start_date, end_date):
+    """
+    Compute the date ranges that must be downloaded to extend a stored history.
+
+    The tail range starts at the last stored bar (re-fetching it) rather than
+    at the coverage end, so a top-up request always returns at least one bar
+    and an empty download can be told apart from a failed one.
+
+    Parameters:
+    stored (pd.DataFrame): History currently in the store.
+    meta (dict): Metadata returned by load().
+    start_date (str): Requested start date.
+    end_date (str): Requested end date (exclusive).
+
+    Returns:
+    list: (start, end) date string pairs, at most one before and one after the stored range.
+    """
+    start_str = _to_date_str(start_date)
+    end_str = _to_date_str(end_date)
+    ranges = []
+
+    if start_str < meta['covered_start']:
+        ranges.append((start_str, meta['covered_start']))
+
+    if covered_end_for(end_str) > meta['covered_end']:
+        tail_start = meta['covered_end']
+        if stored is not None and not stored.empty:
+            tail_start = min(tail_start, stored.index.max().strftime('%Y-%m-%d'))
+        ranges.append((tail_start, end_str))
+
+    return ranges
+
+
+def slice_history(df, start_date, end_date):
+    """
+    Return the rows of a stored history in [start_date, end_date).
+
+    Handles both tz-aware (yfinance) and naive date indexes.
+    """
+    start_ts = pd.Timestamp(_to_date_str(start_date))
+    end_ts = pd.Timestamp(_to_date_str(end_date))
+    tz = getattr(df.index, 'tz', None)
+    if tz is not None:
+        start_ts = start_ts.tz_localize(tz)
+        end_ts = end_ts.tz_localize(tz)
+    mask = (df.index >= start_ts) & (df.index < end_ts)
+    return df.loc[mask]
+
+
+def merge_history(stored, fresh):
+    """Merge a freshly downloaded history into a stored one (fresh rows win)."""
+    if stored is None or stored.empty:
+        return fresh.sort_index()
+    if fresh is None or fresh.empty:
+        return stored
+    stored_tz = getattr(stored.index, 'tz', None)
+    fresh_tz = getattr(fresh.index, 'tz', None)
+    if stored_tz != fresh_tz:
+        # Bring the fresh bars onto the stored index convention before splicing
+        fresh = fresh.copy()
+        if stored_tz is None:
+            fresh.index = fresh.index.tz_localize(None)
+        elif fresh_tz is None:
+            fresh.index = fresh.index.tz_localize(stored_tz)
+        else:
+            fresh.index = fresh.index.tz_convert(stored_tz)
+    merged = pd.concat([stored, fresh])
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index()
+
+
+def record_hit(meta):
+    """Count a store hit and the network time it avoided."""
+    with _stats_lock:
+        _stats['hits'] += 1
+        _stats['seconds_saved'] += float(meta.get('fetch_seconds', 0.0)) if meta else 0.0
+
+
+def record_miss():
+    """Count a store miss."""
+    with _stats_lock:
+        _stats['misses'] += 1
+
+
+def record_fetch(seconds, rows=None):
+    """Count one network fetch, its duration and (for delta fetches) the rows it added."""
+    with _stats_lock:
+        _stats['network_fetches'] += 1
+        _stats['network_seconds'] += float(seconds)
+        if rows is not None:
+            _stats['delta_rows'] += int(rows)
+
+
+def get_store_stats():
+    """
+    Get hit/miss counters for the price store in this process.
+
+    Returns:
+    dict: Counters including hits, misses, network time spent and saved.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_store_stats():
+    """Reset all price store counters to zero."""
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0.0 if isinstance(_stats[key], float) else 0
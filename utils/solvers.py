@@ -0,0 +1,702 @@
+"""
+Dedicated portfolio solvers used by utils/portfolio_optimizer.
+
+These replace generic SLSQP calls where the problem has structure that a
+specialised method can exploit. All solvers are deterministic and work on
+plain numpy arrays (daily mean returns and covariance).
+"""
+import numpy as np
+from scipy import sparse
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.linalg import cho_solve
+from scipy.optimize import linprog, minimize
+from scipy.spatial.distance import squareform
+
+from utils import tracing
+from utils.covariance import DenseCovariance, FactorCovariance
+
+
+def _solve_equality_qp(cov, a, free, cholesky=None):
+    """
+    Minimize y' S y subject to a' y = 1 over the free coordinates (others zero).
+
+    Closed form: y_F = S_FF^-1 a_F / (a_F' S_FF^-1 a_F).
+    cholesky is an optional cho_factor of the full S, used when every
+    coordinate is free. Returns None if the restricted problem is degenerate.
+    """
+    sub_a = a[free]
+    try:
+        if cholesky is not None and len(free) == len(a):
+            x = cho_solve(cholesky, sub_a, check_finite=False)
+        else:
+            x = np.linalg.solve(cov[np.ix_(free, free)], sub_a)
+    except np.linalg.LinAlgError:
+        return None
+    denom = float(sub_a @ x)
+    if not np.isfinite(denom) or denom <= 0:
+        return None
+    y = np.zeros_like(a)
+    y[free] = x / denom
+    return y
+
+
+def max_sharpe_long_only(mean_returns, cov_matrix, risk_free_rate=0.0, tol=1e-12, max_iter=None,
+                         cholesky=None, x0=None):
+    """
+    Long-only maximum Sharpe (tangency) portfolio.
+
+    Uses the convex reformulation
+        minimize y' S y  subject to (mu - rf)' y = 1, y >= 0,
+    with weights w = y / sum(y). The analytic solution S^-1 (mu - rf) is tried
+    first; if any weight would be negative, a primal active-set method adds and
+    removes assets one at a time, solving each equality-constrained subproblem
+    in closed form. The result is exact up to floating point (no line search
+    or finite differences) and identical across runs.
+
+    Parameters:
+    mean_returns (array): Mean returns per asset (same period as the covariance).
+    cov_matrix (array): Covariance matrix of asset returns (positive definite).
+    risk_free_rate (float): Risk-free rate per period, in the units of mean_returns.
+    tol (float): Tolerance on the KKT multipliers and negative weights.
+    max_iter (int, optional): Iteration cap (defaults to 10 * n_assets + 100).
+    cholesky (tuple, optional): Cholesky factor of cov_matrix from
+        utils.covariance.condition_covariance, reused for the unconstrained solve.
+    x0 (array, optional): Warm-start weights (e.g. the previous rebalance's
+        solution); the active set starts from their support instead of the
+        single best asset.
+
+    Returns:
+    np.ndarray: Optimal weights (non-negative, summing to 1).
+
+    Raises:
+    ValueError: If no asset has a mean return above the risk-free rate, in which
+                case a long-only tangency portfolio does not exist.
+    """
+    mu = np.asarray(mean_returns, dtype=np.float64)
+    cov = np.asarray(cov_matrix, dtype=np.float64)
+    n = len(mu)
+    a = mu - risk_free_rate
+    if not np.any(a > 0):
+        raise ValueError("No asset has an expected return above the risk-free rate")
+
+    # Fast path: no bound binds
+    y = _solve_equality_qp(cov, a, np.arange(n), cholesky)
+    if y is not None and np.all(y >= -tol):
+        y = np.maximum(y, 0.0)
+        return y / y.sum()
+
+    # Feasible start: x0 scaled onto a' y = 1, else the single asset with the best Sharpe ratio
+    y = None
+    if x0 is not None:
+        x0 = np.maximum(np.asarray(x0, dtype=np.float64), 0.0)
+        excess = float(a @ x0) if x0.shape == (n,) else 0.0
+        if excess > 0 and np.isfinite(excess):
+            y = x0 / excess
+    if y is None:
+        stds = np.sqrt(np.maximum(np.diag(cov), 1e-300))
+        best = int(np.argmax(np.where(a > 0, a / stds, -np.inf)))
+        y = np.zeros(n)
+        y[best] = 1.0 / a[best]
+    free = y > 0
+
+    max_iter = max_iter if max_iter is not None else 10 * n + 100
+    for _ in range(max_iter):
+        z = _solve_equality_qp(cov, a, np.flatnonzero(free))
+        if z is None:
+            raise ValueError("Tangency subproblem is degenerate; check the covariance matrix")
+
+        blocking = free & (z < -tol)
+        if not blocking.any():
+            # Subproblem optimum is feasible; check the multipliers of the zero bounds
+            y = np.maximum(z, 0.0)
+            grad = cov @ y
+            nu = float(y @ grad)  # multiplier of a' y = 1 (since a' y = 1 and s' y = 0)
+            slack = grad - nu * a
+            slack[free] = 0.0
+            entering = int(np.argmin(slack))
+            if slack[entering] >= -tol * max(nu, 1e-300):
+                return y / y.sum()
+            free[entering] = True
+        else:
+            # Step toward z until the first free weight reaches zero, then drop it
+            idx = np.flatnonzero(blocking)
+            ratios = y[idx] / (y[idx] - z[idx])
+            k = int(np.argmin(ratios))
+            step = ratios[k]
+            y = y + step * (z - y)
+            y[idx[k]] = 0.0
+            dropped = idx[y[idx] <= 0]
+            free[dropped] = False
+            y[dropped] = 0.0
+
+    raise ValueError("Tangency solver did not converge")
+
+
+def risk_parity_weights(cov_matrix, budgets=None, tol=1e-10, max_sweeps=100, x0=None):
+    """
+    Long-only risk budgeting (equal risk contribution by default) portfolio.
+
+    Solves the strictly convex log-barrier problem
+        minimize 1/2 y' S y - sum_i b_i log(y_i),  y > 0,
+    whose solution normalized to w = y / sum(y) has risk contributions
+    w_i (S w)_i / (w' S w) equal to the budgets b_i. Cyclical coordinate
+    descent updates each y_i in closed form (the positive root of a quadratic)
+    and keeps S y up to date with one column update, so a sweep costs O(N^2).
+
+    With a factored covariance S = L L' + diag(d) (utils/covariance.FactorCovariance)
+    the solver tracks u = L' y instead of S y, so each coordinate update costs
+    O(k) and a sweep O(N k).
+
+    Parameters:
+    cov_matrix (array or covariance model): Covariance of asset returns
+        (positive definite), as a matrix or a DenseCovariance/FactorCovariance.
+    budgets (array, optional): Positive risk budgets (normalized to sum to 1); equal if None.
+    tol (float): Stop when every risk contribution fraction is within tol of its budget.
+    max_sweeps (int): Coordinate descent passes before switching to damped Newton
+                      steps on the same barrier problem (used when strongly
+                      correlated assets make coordinate descent crawl).
+    x0 (array, optional): Warm-start weights, e.g. the previous rebalance's
+                          solution; non-positive entries fall back to the
+                          inverse-volatility start.
+
+    Returns:
+    np.ndarray: Weights (positive, summing to 1).
+
+    Raises:
+    ValueError: If the budgets are invalid or the solver does not converge.
+    """
+    cov = cov_matrix if hasattr(cov_matrix, 'matvec') else DenseCovariance(cov_matrix)
+    n = cov.n_assets
+    if budgets is None:
+        b = np.full(n, 1.0 / n)
+    else:
+        b = np.asarray(budgets, dtype=np.float64)
+        if b.shape != (n,) or not np.all(np.isfinite(b)) or np.any(b <= 0):
+            raise ValueError("Risk budgets must be one positive value per asset")
+        b = b / b.sum()
+
+    diag = cov.diag()
+    if np.any(diag <= 0):
+        raise ValueError("Covariance matrix has non-positive variances")
+
+    # Start from inverse-volatility weights (or x0) scaled to the barrier's natural size
+    y = np.sqrt(b) / np.sqrt(diag)
+    if x0 is not None:
+        x0 = np.asarray(x0, dtype=np.float64)
+        if x0.shape == (n,) and np.all(np.isfinite(x0)):
+            y = np.where(x0 > 0, x0, y / y.sum())
+    y *= 1.0 / np.sqrt(y @ cov.matvec(y))
+    factored = isinstance(cov, FactorCovariance)
+    if factored:
+        loadings = cov.loadings
+        common_diag = diag - cov.specific
+        u = loadings.T @ y
+    else:
+        matrix = cov.dense()
+        cov_y = matrix @ y
+
+    for _ in range(max_sweeps):
+        for i in range(n):
+            # (S y)_i without the diagonal term
+            if factored:
+                off = float(loadings[i] @ u) - common_diag[i] * y[i]
+            else:
+                off = cov_y[i] - diag[i] * y[i]
+            new = (-off + np.sqrt(off * off + 4.0 * diag[i] * b[i])) / (2.0 * diag[i])
+            delta = new - y[i]
+            if delta != 0.0:
+                y[i] = new
+                if factored:
+                    u += loadings[i] * delta
+                else:
+                    cov_y += matrix[:, i] * delta
+
+        # Recompute exactly once per sweep so rounding cannot accumulate
+        if factored:
+            u = loadings.T @ y
+        cov_y_exact = cov.matvec(y)
+        if not factored:
+            cov_y = cov_y_exact
+        if _budget_error(y, cov_y_exact, b) < tol:
+            return y / y.sum()
+
+    return _risk_budget_newton(cov, b, y, tol)
+
+
+def _budget_error(y, cov_y, b):
+    contrib = y * cov_y
+    return float(np.max(np.abs(contrib / contrib.sum() - b)))
+
+
+def _risk_budget_newton(cov, b, y, tol, max_iter=200):
+    """
+    Damped Newton on 1/2 y' S y - b' log(y), warm-started from y.
+
+    The Hessian S + diag(b / y^2) is solved densely, or with the Woodbury
+    identity in O(N k^2) for a factored covariance.
+    """
+    factored = isinstance(cov, FactorCovariance)
+
+    def objective(v):
+        return 0.5 * float(v @ cov.matvec(v)) - float(b @ np.log(v))
+
+    value = objective(y)
+    for _ in range(max_iter):
+        cov_y = cov.matvec(y)
+        if _budget_error(y, cov_y, b) < tol:
+            return y / y.sum()
+        grad = cov_y - b / y
+        barrier = b / (y * y)
+        if factored:
+            # (D + L L')^-1 g with D = diag(specific + b / y^2)
+            d_inv = 1.0 / (cov.specific + barrier)
+            L = cov.loadings
+            small = np.eye(L.shape[1]) + L.T @ (L * d_inv[:, None])
+            step = d_inv * grad - d_inv * (L @ np.linalg.solve(small, L.T @ (d_inv * grad)))
+        else:
+            hessian = cov.dense() + np.diag(barrier)
+            step = np.linalg.solve(hessian, grad)
+
+        decrement = float(grad @ step)
+        t = 1.0
+        # Stay strictly positive, then backtrack (Armijo) on the barrier objective
+        negative = step > 0
+        if np.any(negative):
+            t = min(1.0, 0.99 * float(np.min(y[negative] / step[negative])))
+        while True:
+            candidate = y - t * step
+            candidate_value = objective(candidate)
+            if candidate_value <= value - 0.25 * t * decrement or t < 1e-12:
+                break
+            t *= 0.5
+        y, value = candidate, candidate_value
+
+    raise ValueError("Risk parity solver did not converge")
+
+
+def _solve_kkt(cov, A, b, free):
+    """
+    Minimize 1/2 x' S x subject to A x = b over the free coordinates (others zero).
+
+    Solves the KKT system [[S_FF, A_F'], [A_F, 0]] [x_F; nu] = [0; b] and
+    returns (x, nu), using least squares when A_F is rank deficient.
+    """
+    n_free = len(free)
+    m = A.shape[0]
+    A_F = A[:, free]
+    kkt = np.zeros((n_free + m, n_free + m))
+    kkt[:n_free, :n_free] = cov[np.ix_(free, free)]
+    kkt[:n_free, n_free:] = A_F.T
+    kkt[n_free:, :n_free] = A_F
+    rhs = np.concatenate([np.zeros(n_free), b])
+    try:
+        sol = np.linalg.solve(kkt, rhs)
+    except np.linalg.LinAlgError:
+        sol = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+    x = np.zeros(cov.shape[0])
+    x[free] = sol[:n_free]
+    return x, sol[n_free:]
+
+
+def min_variance_qp(cov_matrix, A, b, x0, tol=1e-12, max_iter=None):
+    """
+    Minimize x' S x subject to A x = b and x >= 0 with a primal active-set method.
+
+    Starting from a feasible point x0, assets are released from or fixed at
+    zero one at a time; each working set is solved exactly through its KKT
+    system. A good x0 (e.g. a neighbouring solution) typically converges in a
+    few iterations.
+
+    Parameters:
+    cov_matrix (array): Covariance matrix (positive definite).
+    A (array): (m, n) equality constraint matrix.
+    b (array): (m,) equality right-hand side.
+    x0 (array): Feasible starting point (A x0 = b, x0 >= 0).
+    tol (float): Tolerance on negative weights and bound multipliers.
+    max_iter (int, optional): Iteration cap (defaults to 10 * n + 100).
+
+    Returns:
+    tuple: (x, iterations).
+    """
+    cov = np.asarray(cov_matrix, dtype=np.float64)
+    A = np.atleast_2d(np.asarray(A, dtype=np.float64))
+    b = np.atleast_1d(np.asarray(b, dtype=np.float64))
+    n = cov.shape[0]
+    x = np.maximum(np.asarray(x0, dtype=np.float64), 0.0)
+    free = x > 0
+    scale = max(float(np.max(np.abs(np.diag(cov)))), 1e-300)
+
+    max_iter = max_iter if max_iter is not None else 10 * n + 100
+    for iteration in range(1, max_iter + 1):
+        z, nu = _solve_kkt(cov, A, b, np.flatnonzero(free))
+        blocking = free & (z < -tol)
+        if not blocking.any():
+            x = np.maximum(z, 0.0)
+            # Bound multipliers: S x + A' nu must be non-negative on the fixed set
+            slack = cov @ x + A.T @ nu
+            slack[free] = 0.0
+            entering = int(np.argmin(slack))
+            if slack[entering] >= -tol * scale:
+                return x, iteration
+            free[entering] = True
+        else:
+            idx = np.flatnonzero(blocking)
+            ratios = x[idx] / (x[idx] - z[idx])
+            k = int(np.argmin(ratios))
+            x = x + ratios[k] * (z - x)
+            x[idx[k]] = 0.0
+            dropped = idx[x[idx] <= 0]
+            free[dropped] = False
+            x[dropped] = 0.0
+
+    raise ValueError("Active-set QP did not converge")
+
+
+def efficient_frontier(mean_returns, cov_matrix, n_points=100):
+    """
+    Long-only minimum-variance frontier for a grid of target returns.
+
+    The grid runs from the global minimum-variance portfolio's return to the
+    highest asset return. Targets are solved in increasing order and each solve
+    is warm-started from its neighbour: the previous solution mixed with the
+    highest-return asset is feasible for the next target and shares almost all
+    of its active set, so most points take one or two KKT solves.
+
+    Parameters:
+    mean_returns (array): Mean returns per asset.
+    cov_matrix (array): Covariance matrix of asset returns (positive definite).
+    n_points (int): Number of frontier points.
+
+    Returns:
+    tuple: (target_returns (n_points,), weights (n_points, n_assets)).
+    """
+    mu = np.asarray(mean_returns, dtype=np.float64)
+    cov = np.ascontiguousarray(cov_matrix, dtype=np.float64)
+    n = len(mu)
+    ones = np.ones(n)
+
+    # Global minimum-variance portfolio (budget constraint only)
+    w_gmv, _ = min_variance_qp(cov, ones[None, :], np.array([1.0]), ones / n)
+    top = int(np.argmax(mu))
+    r_min, r_max = float(mu @ w_gmv), float(mu[top])
+    if r_max - r_min <= 1e-15:
+        return np.full(n_points, r_min), np.tile(w_gmv, (n_points, 1))
+
+    targets = np.linspace(r_min, r_max, n_points)
+    weights = np.empty((n_points, n))
+    weights[0] = w_gmv
+    A = np.vstack([ones, mu])
+    previous = w_gmv
+    for i in range(1, n_points):
+        # Mix the previous solution with the top asset to hit the new target exactly
+        r_prev = float(mu @ previous)
+        t = (targets[i] - r_prev) / (r_max - r_prev) if r_max > r_prev else 1.0
+        start = (1.0 - t) * previous
+        start[top] += t
+        previous, _ = min_variance_qp(cov, A, np.array([1.0, targets[i]]), start)
+        weights[i] = previous
+    return targets, weights
+
+
+def hrp_weights(cov_matrix):
+    """
+    Hierarchical Risk Parity weights (Lopez de Prado).
+
+    Assets are clustered by single linkage on the correlation distance
+    sqrt((1 - rho) / 2), ordered by the dendrogram so correlated assets sit
+    together, and weight is split top-down between the two halves of every
+    block in inverse proportion to their inverse-variance cluster variance.
+    Nothing is inverted or factorized, so singular or ill-conditioned
+    covariance matrices are fine and N = 500 takes milliseconds.
+
+    Parameters:
+    cov_matrix (array): Covariance matrix of asset returns.
+
+    Returns:
+    np.ndarray: Long-only weights summing to 1.
+    """
+    cov = np.asarray(cov_matrix, dtype=np.float64)
+    n = cov.shape[0]
+    if n == 1:
+        return np.ones(1)
+    variances = np.maximum(np.diag(cov), 1e-300)
+    std = np.sqrt(variances)
+    corr = np.clip(cov / np.outer(std, std), -1.0, 1.0)
+    dist = np.sqrt(0.5 * (1.0 - corr))
+    np.fill_diagonal(dist, 0.0)
+    order = leaves_list(linkage(squareform(dist, checks=False), method='single'))
+
+    inv_var = 1.0 / variances
+    weights = np.ones(n)
+    blocks = [order]
+    while blocks:
+        next_blocks = []
+        for block in blocks:
+            if len(block) < 2:
+                continue
+            half = len(block) // 2
+            left, right = block[:half], block[half:]
+            cluster_var = []
+            for items in (left, right):
+                w = inv_var[items] / inv_var[items].sum()
+                cluster_var.append(float(w @ cov[np.ix_(items, items)] @ w))
+            total = cluster_var[0] + cluster_var[1]
+            alpha = 0.5 if total <= 0 else 1.0 - cluster_var[0] / total
+            weights[left] *= alpha
+            weights[right] *= 1.0 - alpha
+            next_blocks.extend((left, right))
+        blocks = next_blocks
+    return weights / weights.sum()
+
+
+# SLSQP exit modes that stop at (numerically) the optimum without reporting
+# success: 8 = positive directional derivative in the line search
+_SLSQP_NEAR_OPTIMAL = (8,)
+
+
+def solve_constrained(objective, gradient, constraints, args=(), x0=None, max_iter=1000, restrict=None):
+    """
+    Minimize a smooth objective of the weights under compiled portfolio constraints.
+
+    SLSQP over the variables of a CompiledConstraints (utils/constraints.py):
+    the bounds are vectors and all inequality rows are one vectorized
+    constraint with a constant Jacobian. Minimum position size and cardinality
+    limits are enforced by excluding the offending positions and re-solving
+    (warm-started) until none remain. A solve that stops without reporting
+    success is accepted only if it ended in the line search at a feasible
+    point (SLSQP exit mode 8); this is recorded as a
+    'constraints.slsqp_unconverged' trace event.
+
+    Parameters:
+    objective (callable): f(weights, *args) -> float, weights of length n_assets.
+    gradient (callable): grad f(weights, *args) -> (n_assets,) array.
+    constraints (CompiledConstraints): Compiled constraints.
+    args (tuple): Extra arguments for objective and gradient.
+    x0 (array, optional): Starting weights; a feasible point is found if omitted.
+    max_iter (int): SLSQP iteration cap per solve.
+    restrict (callable, optional): restrict(active) -> (args, x0), called after each
+        exclusion with the boolean mask of assets still allowed, for objectives
+        whose targets depend on the universe (e.g. risk budgets renormalized
+        over the remaining assets). x0 (or None) warm-starts the re-solve.
+
+    Returns:
+    np.ndarray: Optimal weights (n_assets,).
+
+    Raises:
+    ValueError: If the constraints are infeasible or the solver does not converge.
+    """
+    n = constraints.n_assets
+    n_aux = constraints.n_vars - n
+
+    def f(z):
+        return objective(z[:n], *args)
+
+    def grad(z):
+        g = gradient(z[:n], *args)
+        return np.concatenate([g, np.zeros(n_aux)]) if n_aux else g
+
+    z0 = None
+    if x0 is not None:
+        z0 = np.asarray(x0, dtype=np.float64)
+        if len(z0) == n and n_aux:
+            z0 = np.concatenate([z0, np.abs(z0 - constraints.current)])
+
+    for _ in range(n + 1):
+        if z0 is None or not constraints.is_feasible(z0):
+            z0 = constraints.feasible_point()
+        result = minimize(f, z0, jac=grad, method='SLSQP', bounds=constraints.bounds(),
+                          constraints=constraints.slsqp_constraints(),
+                          options={'maxiter': max_iter, 'ftol': 1e-12})
+        if not result.success:
+            if result.status not in _SLSQP_NEAR_OPTIMAL or not constraints.is_feasible(result.x, tol=1e-6):
+                raise ValueError(f"Constrained optimization failed: {result.message}")
+            tracing.event('constraints.slsqp_unconverged', status=int(result.status),
+                          message=str(result.message), n_assets=n, iterations=int(result.nit))
+        z = result.x
+        excluded = constraints.violations(z) if constraints.discrete else []
+        if not len(excluded):
+            weights = np.maximum(z[:n], 0.0)
+            return weights / weights.sum()
+        constraints = constraints.exclude(excluded)
+        z0 = z.copy()
+        z0[excluded] = 0.0
+        if restrict is not None:
+            args, restricted_x0 = restrict(constraints.upper[:n] > 0.0)
+            if restricted_x0 is not None:
+                z0[:n] = restricted_x0
+                if n_aux:
+                    z0[n:] = np.abs(z0[:n] - constraints.current)
+    raise ValueError("Could not satisfy the position size and count limits")
+
+
+def _negative_sharpe(weights, mu, cov, risk_free_rate):
+    return -(weights @ mu - risk_free_rate) / np.sqrt(weights @ cov @ weights)
+
+
+def _negative_sharpe_grad(weights, mu, cov, risk_free_rate):
+    cov_w = cov @ weights
+    std = np.sqrt(weights @ cov_w)
+    return -mu / std + (weights @ mu - risk_free_rate) * cov_w / std ** 3
+
+
+def max_sharpe_constrained(mean_returns, cov_matrix, constraints, risk_free_rate=0.0, x0=None):
+    """
+    Maximum Sharpe ratio weights under compiled portfolio constraints.
+
+    Falls back to the active-set tangency solver when the constraints are
+    plain long-only ones.
+
+    Parameters:
+    mean_returns (array): Mean returns per asset.
+    cov_matrix (array): Covariance matrix (positive definite).
+    constraints (CompiledConstraints): Compiled constraints (utils/constraints.py).
+    risk_free_rate (float): Risk-free rate per period.
+    x0 (array, optional): Starting weights.
+
+    Returns:
+    np.ndarray: Optimal weights.
+    """
+    mu = np.asarray(mean_returns, dtype=np.float64)
+    cov = np.asarray(cov_matrix, dtype=np.float64)
+    if constraints.long_only and np.any(mu > risk_free_rate):
+        return max_sharpe_long_only(mu, cov, risk_free_rate, x0=x0)
+    return solve_constrained(_negative_sharpe, _negative_sharpe_grad, constraints,
+                             args=(mu, cov, risk_free_rate), x0=x0)
+
+
+def historical_cvar(portfolio_returns, confidence=0.95):
+    """
+    Historical value at risk and conditional value at risk (expected shortfall).
+
+    Both are reported as positive losses, in the units of the returns, and
+    match the Rockafellar-Uryasev definition minimized by min_cvar_lp.
+
+    Returns:
+    tuple: (VaR, CVaR).
+    """
+    losses = -np.asarray(portfolio_returns, dtype=np.float64)
+    var = float(np.quantile(losses, confidence))
+    cvar = var + float(np.mean(np.maximum(losses - var, 0.0))) / (1.0 - confidence)
+    return var, cvar
+
+
+def _cvar_primal(R, tail_weight, max_cvar, mu, constraints):
+    """
+    Primal CVaR LP over (z, zeta, u), z being the constraint variables.
+
+    Returns the optimal z, or raises ValueError.
+    """
+    n_obs, n_assets = R.shape
+    n_vars = n_assets if constraints is None else constraints.n_vars
+    n_aux = n_vars - n_assets
+    blocks = [[sparse.csr_matrix(-R)]]
+    if n_aux:
+        blocks[0].append(sparse.csr_matrix((n_obs, n_aux)))
+    blocks[0] += [-np.ones((n_obs, 1)), -sparse.identity(n_obs)]
+    b_ub = [np.zeros(n_obs)]
+    if constraints is not None and len(constraints.b_ub):
+        blocks.append([constraints.A_ub, sparse.csr_matrix((len(constraints.b_ub), 1 + n_obs))])
+        b_ub.append(constraints.b_ub)
+    cvar_row = np.concatenate([np.zeros(n_vars), [1.0], np.full(n_obs, tail_weight)])
+    if max_cvar is None:
+        c = cvar_row
+    else:
+        # The CVaR cap row: zeta + tail_weight * sum(u) <= max_cvar
+        blocks.append([sparse.csr_matrix(cvar_row[None, :])])
+        b_ub.append([float(max_cvar)])
+        c = np.concatenate([-mu, np.zeros(n_aux + 1 + n_obs)])
+    A_ub = sparse.vstack([sparse.hstack(row) for row in blocks], format='csr')
+
+    if constraints is None:
+        A_eq = sparse.csr_matrix(np.ones((1, n_vars)))
+        b_eq = np.array([1.0])
+        var_bounds = np.column_stack([np.zeros(n_vars), np.ones(n_vars)])
+    else:
+        A_eq, b_eq, var_bounds = constraints.A_eq, constraints.b_eq, constraints.bounds()
+    A_eq = sparse.hstack([A_eq, sparse.csr_matrix((A_eq.shape[0], 1 + n_obs))], format='csr')
+    bounds = np.vstack([var_bounds, [[-np.inf, np.inf]], np.column_stack([np.zeros(n_obs), np.full(n_obs, np.inf)])])
+
+    res = linprog(c, A_ub=A_ub, b_ub=np.concatenate(b_ub), A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs-ds')
+    if res.status == 2:
+        if max_cvar is None:
+            raise ValueError("Portfolio constraints are infeasible")
+        raise ValueError(f"No portfolio within the constraints has CVaR below {max_cvar}")
+    if not res.success:
+        raise ValueError(f"CVaR linear program failed: {res.message}")
+    return res.x[:n_vars]
+
+
+def min_cvar_lp(returns, confidence=0.95, max_cvar=None, mean_returns=None, constraints=None):
+    """
+    CVaR optimization on a scenario matrix as one linear program.
+
+    Rockafellar-Uryasev formulation over weights x, the VaR level zeta and one
+    shortfall u_t per scenario:
+
+        CVaR(x) = min  zeta + sum(u) / ((1 - confidence) T)
+                  s.t. u_t >= -r_t' x - zeta,  u_t >= 0,  sum(x) = 1,  x >= 0
+
+    Without max_cvar this CVaR is minimized; with max_cvar the expected return
+    is maximized subject to CVaR(x) <= max_cvar. All constraint matrices are
+    sparse and solved with HiGHS.
+
+    The long-only minimum-CVaR primal has one row per scenario, so its LP dual
+    is solved instead (scenario probabilities capped at 1 / ((1 - confidence) T),
+    one row per asset) with the interior point method; the optimal weights are
+    the multipliers of the asset rows. The capped or constrained problems are
+    solved in primal form with the dual simplex method, with the rows of the
+    compiled constraints appended.
+
+    Parameters:
+    returns (array): (n_scenarios, n_assets) scenario returns (e.g. daily).
+    confidence (float): CVaR confidence level (e.g. 0.95 = worst 5% of scenarios).
+    max_cvar (float, optional): CVaR cap, as a positive loss in return units.
+    mean_returns (array, optional): Expected returns for the max-return mode;
+                                    defaults to the scenario mean.
+    constraints (CompiledConstraints, optional): Portfolio constraints
+                                                 (utils/constraints.py); long-only if None.
+
+    Returns:
+    tuple: (weights, VaR, CVaR) of the optimal portfolio.
+
+    Raises:
+    ValueError: If the cap or constraints are infeasible or the LP fails.
+    """
+    R = np.ascontiguousarray(returns, dtype=np.float64)
+    n_obs, n_assets = R.shape
+    if not 0.0 < confidence < 1.0:
+        raise ValueError("confidence must be between 0 and 1")
+    tail_weight = 1.0 / ((1.0 - confidence) * n_obs)
+    if constraints is not None and constraints.long_only:
+        constraints = None
+
+    if max_cvar is None and constraints is None:
+        # Dual variables (q, s): max s  s.t.  R' q + s <= 0,  sum(q) = 1,  0 <= q <= tail_weight
+        c = np.zeros(n_obs + 1)
+        c[-1] = -1.0
+        A_ub = sparse.hstack([sparse.csr_matrix(R.T), np.ones((n_assets, 1))], format='csr')
+        A_eq = sparse.csr_matrix(np.append(np.ones(n_obs), 0.0)[None, :])
+        bounds = np.zeros((n_obs + 1, 2))
+        bounds[:n_obs, 1] = tail_weight
+        bounds[n_obs] = (-np.inf, np.inf)
+        res = linprog(c, A_ub=A_ub, b_ub=np.zeros(n_assets), A_eq=A_eq, b_eq=np.array([1.0]),
+                      bounds=bounds, method='highs-ipm')
+        if not res.success:
+            raise ValueError(f"CVaR linear program failed: {res.message}")
+        weights = -res.ineqlin.marginals
+    else:
+        mu = R.mean(axis=0) if mean_returns is None else np.asarray(mean_returns, dtype=np.float64)
+        for _ in range(n_assets + 1):
+            weights = _cvar_primal(R, tail_weight, max_cvar, mu, constraints)[:n_assets]
+            # Minimum position size and cardinality: exclude offenders and re-solve
+            excluded = constraints.violations(weights) if constraints is not None and constraints.discrete else []
+            if not len(excluded):
+                break
+            constraints = constraints.exclude(excluded)
+        else:
+            raise ValueError("Could not satisfy the position size and count limits")
+
+    weights = np.maximum(weights, 0.0)
+    weights /= weights.sum()
+    var, cvar = historical_cvar(R @ weights, confidence)
+    return weights, var, cvar
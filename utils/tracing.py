@@ -0,0 +1,273 @@
+"""
+Low-overhead tracing: spans, events and counters.
+
+Disabled (the default), every call is one flag check and span() returns a
+shared no-op context manager, so instrumented code pays nothing measurable.
+Enabled, records are appended to an in-memory queue and a background thread
+writes them as JSON lines to TRACE_PATH in batches, so the caller never does
+file I/O. Sampling is decided per top-level span: a sampled-out span drops
+its child spans and events too, which keeps recorded traces complete.
+
+Usage:
+    from utils import tracing
+
+    with tracing.span('mpt.solve', n_assets=n) as s:
+        ...
+        s.set(solver='active_set')
+    tracing.event('mpt.slsqp_fallback', reason=str(err))
+    tracing.count('estimates.cache_miss')
+
+Expensive diagnostics should be guarded with `if tracing.enabled():`.
+"""
+import atexit
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+
+from config.settings import (
+    TRACE_ENABLED, TRACE_PATH, TRACE_SAMPLE_RATE, TRACE_FLUSH_INTERVAL, TRACE_BUFFER_SIZE
+)
+
+
+class _NullSpan:
+    """Span used when tracing is off or the trace is sampled out."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, attrs):
+        self._tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self._root = self._tracer._enter()
+        self._start = time.perf_counter()
+        self._timestamp = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        record = {
+            'type': 'span',
+            'name': self.name,
+            'ts': int(self._timestamp * 1000),
+            'duration_ms': round(duration * 1000.0, 3),
+            'attrs': self.attrs
+        }
+        if exc_type is not None:
+            record['error'] = f"{exc_type.__name__}: {exc}"
+        self._tracer._exit(self._root)
+        self._tracer._emit(record)
+        return False
+
+    def set(self, **attrs):
+        """Attach attributes known only after the span started."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Buffered trace recorder.
+
+    Parameters:
+    path (str): JSON-lines output file.
+    enabled (bool): Record anything at all.
+    sample_rate (float): Fraction of top-level spans recorded (0 to 1).
+    flush_interval (float): Seconds between background writes.
+    buffer_size (int): Maximum queued records; further records are dropped
+                       (and counted) until the writer catches up.
+    """
+
+    def __init__(self, path, enabled=False, sample_rate=1.0, flush_interval=2.0, buffer_size=10000):
+        self.path = path
+        self.enabled = enabled
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self._queue = queue.SimpleQueue()
+        self._queued = 0
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = None
+        self._wake = threading.Event()
+        self._pid = os.getpid()
+
+    # -- sampling state (per thread) --------------------------------------
+
+    def _sampled(self):
+        return getattr(self._local, 'sampled', True)
+
+    def _enter(self):
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            self._local.sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        self._local.depth = depth + 1
+        return depth == 0
+
+    def _exit(self, root):
+        self._local.depth -= 1
+
+    # -- public API -------------------------------------------------------
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        if getattr(self._local, 'depth', 0) > 0 and not self._sampled():
+            return _NULL_SPAN
+        return _Span(self, name, attrs)
+
+    def event(self, name, **attrs):
+        if not self.enabled:
+            return
+        depth = getattr(self._local, 'depth', 0)
+        if depth > 0:
+            if not self._sampled():
+                return
+        elif self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self._emit({'type': 'event', 'name': name, 'ts': int(time.time() * 1000), 'attrs': attrs})
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def flush(self):
+        """Write everything queued so far (and a counters snapshot) synchronously."""
+        if not self.enabled:
+            return
+        counters = self.counters()
+        if counters:
+            self._queue.put({'type': 'counters', 'ts': int(time.time() * 1000), 'attrs': counters})
+            with self._lock:
+                self._queued += 1
+        self._drain()
+
+    # -- buffering and background writer ----------------------------------
+
+    def _emit(self, record):
+        # A sampled-out root span still has to unwind, but is not recorded
+        if record['type'] == 'span' and not self._sampled():
+            return
+        with self._lock:
+            if self._queued >= self.buffer_size:
+                self._counters['tracing.dropped'] = self._counters.get('tracing.dropped', 0) + 1
+                return
+            self._queued += 1
+        record['pid'] = self._pid
+        record['thread'] = threading.get_ident()
+        self._queue.put(record)
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._run, name='tracing-writer', daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+
+    def _drain(self):
+        lines = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                lines.append(json.dumps(record, default=str))
+            except (TypeError, ValueError):
+                continue
+        if not lines:
+            return
+        with self._lock:
+            self._queued = max(self._queued - len(lines), 0)
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            print(f"Warning: Could not write trace file {self.path}: {e}")
+
+
+_tracer = Tracer(
+    TRACE_PATH,
+    enabled=TRACE_ENABLED,
+    sample_rate=TRACE_SAMPLE_RATE,
+    flush_interval=TRACE_FLUSH_INTERVAL,
+    buffer_size=TRACE_BUFFER_SIZE
+)
+atexit.register(_tracer.flush)
+
+
+def enabled():
+    """True if tracing is on (use to guard expensive diagnostics)."""
+    return _tracer.enabled
+
+
+def span(name, **attrs):
+    """Context manager timing a block; attributes can be added with .set()."""
+    return _tracer.span(name, **attrs)
+
+
+def event(name, **attrs):
+    """Record a point-in-time event."""
+    _tracer.event(name, **attrs)
+
+
+def count(name, value=1):
+    """Increment an in-memory counter."""
+    _tracer.count(name, value)
+
+
+def get_counters():
+    """Current counter values."""
+    return _tracer.counters()
+
+
+def flush():
+    """Write all buffered records now."""
+    _tracer.flush()
+
+
+def traced(name):
+    """Decorator wrapping every call of a function in span(name)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -2,37 +2,39 @@
 Visualization functions for stock analysis
 """
 import matplotlib.pyplot as plt
-import yfinance as yf
 import pandas as pd
 import numpy as np
+from utils.indicators import rsi_series, bollinger_series, macd_series
 
 
-def plot_rsi(data, ticker):
+def plot_rsi(data, ticker, state=None):
     """
     Plot the Relative Strength Index (RSI) for a given stock.
 
     Parameters:
     data (DataFrame): The stock data.
     ticker (str): The stock ticker symbol.
+    state (ChartState, optional): Incrementally updated indicators for the
+                                  ticker; the trace is then read from its
+                                  buffers instead of recomputed from data.
 
     Returns:
     matplotlib.figure.Figure: The figure object.
     """
     window = 14
     
-    # Ensure we have Close column
-    if 'Close' not in data.columns:
-        raise ValueError(f"Missing 'Close' column in data for {ticker}")
-    
-    # Check if we have enough data
-    if len(data) < window:
-        raise ValueError(f"Not enough data points for RSI calculation. Need at least {window}, got {len(data)}")
-    
-    delta = data['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
+    if state is not None:
+        rsi = state.frame()['RSI']
+    else:
+        # Ensure we have Close column
+        if 'Close' not in data.columns:
+            raise ValueError(f"Missing 'Close' column in data for {ticker}")
+        
+        # Check if we have enough data
+        if len(data) < window:
+            raise ValueError(f"Not enough data points for RSI calculation. Need at least {window}, got {len(data)}")
+        
+        rsi = rsi_series(data['Close'], window=window)
     
     # Remove NaN values
     rsi = rsi.dropna()
@@ -53,32 +55,38 @@ def plot_rsi(data, ticker):
     return fig
 
 
-def plot_bollinger_bands(data, ticker):
+def plot_bollinger_bands(data, ticker, state=None):
     """
     Plot the Bollinger Bands for a given stock.
 
     Parameters:
     data (DataFrame): The stock data.
     ticker (str): The stock ticker symbol.
+    state (ChartState, optional): Incrementally updated indicators for the
+                                  ticker; the traces are then read from its
+                                  buffers instead of recomputed from data.
 
     Returns:
     matplotlib.figure.Figure: The figure object.
     """
     window = 20
     
-    # Ensure we have Close column
-    if 'Close' not in data.columns:
-        raise ValueError(f"Missing 'Close' column in data for {ticker}")
-    
-    # Check if we have enough data
-    if len(data) < window:
-        raise ValueError(f"Not enough data points for Bollinger Bands. Need at least {window}, got {len(data)}")
-    
-    # Create a copy to avoid modifying original
-    plot_data = data.copy()
-    plot_data['Middle Band'] = plot_data['Close'].rolling(window=window).mean()
-    plot_data['Upper Band'] = plot_data['Middle Band'] + 2 * plot_data['Close'].rolling(window=window).std()
-    plot_data['Lower Band'] = plot_data['Middle Band'] - 2 * plot_data['Close'].rolling(window=window).std()
+    if state is not None:
+        plot_data = state.frame()[['Close', 'Middle Band', 'Upper Band', 'Lower Band']]
+    else:
+        # Ensure we have Close column
+        if 'Close' not in data.columns:
+            raise ValueError(f"Missing 'Close' column in data for {ticker}")
+        
+        # Check if we have enough data
+        if len(data) < window:
+            raise ValueError(f"Not enough data points for Bollinger Bands. Need at least {window}, got {len(data)}")
+        
+        # Create a copy to avoid modifying original
+        plot_data = data.copy()
+        plot_data['Middle Band'], plot_data['Upper Band'], plot_data['Lower Band'] = bollinger_series(
+            plot_data['Close'], window=window
+        )
     
     # Remove NaN values
     plot_data = plot_data.dropna()
@@ -163,29 +171,33 @@ def plot_beta_comparison(betas):
     return fig
 
 
-def plot_macd(data, ticker):
+def plot_macd(data, ticker, state=None):
     """
     Plot the Moving Average Convergence Divergence (MACD) for a given stock.
 
     Parameters:
     data (DataFrame): The stock data.
     ticker (str): The stock ticker symbol.
+    state (ChartState, optional): Incrementally updated indicators for the
+                                  ticker; the traces are then read from its
+                                  buffers instead of recomputed from data.
 
     Returns:
     matplotlib.figure.Figure: The figure object.
     """
-    # Ensure we have Close column
-    if 'Close' not in data.columns:
-        raise ValueError(f"Missing 'Close' column in data for {ticker}")
-    
-    # Check if we have enough data
-    if len(data) < 26:
-        raise ValueError(f"Not enough data points for MACD. Need at least 26, got {len(data)}")
-    
-    ema_12 = data['Close'].ewm(span=12, adjust=False).mean()
-    ema_26 = data['Close'].ewm(span=26, adjust=False).mean()
-    macd = ema_12 - ema_26
-    signal = macd.ewm(span=9, adjust=False).mean()
+    if state is not None:
+        frame = state.frame()
+        macd, signal = frame['MACD'], frame['Signal Line']
+    else:
+        # Ensure we have Close column
+        if 'Close' not in data.columns:
+            raise ValueError(f"Missing 'Close' column in data for {ticker}")
+        
+        # Check if we have enough data
+        if len(data) < 26:
+            raise ValueError(f"Not enough data points for MACD. Need at least 26, got {len(data)}")
+        
+        macd, signal = macd_series(data['Close'])
     histogram = macd - signal
     
     # Remove NaN values
@@ -194,9 +206,9 @@ def plot_macd(data, ticker):
         raise ValueError("MACD calculation resulted in no valid data points")
     
     fig, ax = plt.subplots(figsize=(14, 7))
-    ax.plot(data.index[valid_idx], macd[valid_idx].values, label=f'{ticker} MACD', color='blue')
-    ax.plot(data.index[valid_idx], signal[valid_idx].values, label=f'{ticker} Signal Line', color='red')
-    ax.bar(data.index[valid_idx], histogram[valid_idx].values, label='Histogram', alpha=0.3, color='gray')
+    ax.plot(macd.index[valid_idx], macd[valid_idx].values, label=f'{ticker} MACD', color='blue')
+    ax.plot(macd.index[valid_idx], signal[valid_idx].values, label=f'{ticker} Signal Line', color='red')
+    ax.bar(macd.index[valid_idx], histogram[valid_idx].values, label='Histogram', alpha=0.3, color='gray')
     ax.axhline(0, color='black', linestyle='-', linewidth=0.5)
     ax.set_title(f'MACD and Signal Line of {ticker}')
     ax.set_xlabel('Date')